@@ -0,0 +1,174 @@
+"""音频模式基准测试: 原来的路径 vs 音频模式
+
+在临时目录中准备一批音频文件(有ffmpeg时生成真实的AAC音频,否则写入
+同样大小的合成数据),用本地HTTP服务器提供直链,分别用以下方式下载:
+    legacy          原来的"仅音频": bestaudio[ext=m4a] 按视频流程处理,
+                    再由附属文件通道用 FFmpegMetadata 重写一遍写入元数据
+    audio           音频模式,保留原来的容器,不启动ffmpeg
+    audio-metadata  音频模式,元数据在唯一一次ffmpeg(流复制)中写入
+    audio-loudnorm  音频模式,响度标准化(重新编码)并写入元数据
+报告总耗时(含附属文件完成)、吞吐量、文件可用时间和ffmpeg的耗时;
+需要ffmpeg的情况在没有ffmpeg时跳过并注明。
+
+用法:
+    python benchmarks/bench_audio.py
+    python benchmarks/bench_audio.py --items 12 --seconds 300 -o audio.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import functools
+import subprocess
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MB = 1024 * 1024
+# AAC 192kbps 每秒的字节数,没有ffmpeg时按这个大小写合成数据
+BYTES_PER_SECOND = 192 * 1000 // 8
+
+# 情况 -> (quality, 音频选项, 附属文件, 是否需要ffmpeg)
+CASES = {
+    'legacy': ('legacy', {}, ('metadata',), True),
+    'audio': ('audio', {}, (), False),
+    'audio-metadata': ('audio', {'metadata': True}, (), True),
+    'audio-loudnorm': ('audio', {'metadata': True, 'loudnorm': True}, (), True),
+}
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    # 通用提取器只读取开头一部分就断开连接,不输出 BrokenPipeError
+    def handle_error(self, request, client_address):
+        pass
+
+
+def make_media(directory, items, seconds, have_ffmpeg):
+    """生成 items 个音频文件,返回文件名列表"""
+    os.makedirs(directory)
+    first = os.path.join(directory, 'track-0.m4a')
+    if have_ffmpeg:
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+                        '-c:a', 'aac', '-b:a', '192k', '-y', first], check=True)
+    else:
+        with open(first, 'wb') as f:
+            f.write(os.urandom(seconds * BYTES_PER_SECOND))
+    names = ['track-0.m4a']
+    for i in range(1, items):
+        names.append(f'track-{i}.m4a')
+        shutil.copyfile(first, os.path.join(directory, names[-1]))
+    return names
+
+
+def legacy_core():
+    """原来的"仅音频": 格式为 bestaudio[ext=m4a]/bestaudio,按视频的流程做后处理"""
+    from downloader.core import DownloadManagerCore
+    from downloader.postprocess import plan_container, downloaded_files
+
+    class LegacyAudioCore(DownloadManagerCore):
+        def prepare(self, url, save_path, quality='best', proxy=None):
+            ydl = super().prepare(url, save_path, 'best', proxy)
+            ydl.params['format'] = 'bestaudio[ext=m4a]/bestaudio'
+            return ydl
+
+        def postprocess_specs(self, result, quality=None, artifacts=None):
+            return plan_container(downloaded_files(result)[0], 'mp4')
+
+    return LegacyAudioCore()
+
+
+def run_case(name, base_url, names, workdir, run_id):
+    from downloader.core import DownloadManagerCore
+
+    quality, options, artifacts, _ = CASES[name]
+    core = legacy_core() if quality == 'legacy' else DownloadManagerCore(audio_options=options)
+    save_path = os.path.join(workdir, f'{name}-{run_id}')
+    # 每次运行的链接不同,避免命中信息缓存和下载存档
+    urls = [f'{base_url}/{n}?run={run_id}-{name}' for n in names]
+    started = time.perf_counter()
+    ok = sum(1 for url in urls if core.download(url, save_path, quality, artifacts))
+    usable = time.perf_counter() - started
+    core.artifact_lane.wait()
+    elapsed = time.perf_counter() - started
+
+    summary = core.metrics.summary()
+    ffmpeg = sum(stat['total'] for phase, stat in summary['phases'].items()
+                 if phase.startswith('pp:') or phase.startswith('artifact:'))
+    downloaded = sum(entry.stat().st_size for entry in os.scandir(save_path)
+                     if entry.is_file() and not entry.name.endswith('.json'))
+    shutil.rmtree(save_path, ignore_errors=True)
+    return {
+        'case': name,
+        'items': len(urls),
+        'ok': ok,
+        'bytes': downloaded,
+        'usable': round(usable, 3),
+        'elapsed': round(elapsed, 3),
+        'throughput_mb_s': round(downloaded / MB / elapsed, 2) if elapsed else 0.0,
+        'ffmpeg_seconds': round(ffmpeg, 3),
+        'artifacts_failed': core.artifact_lane.stats()['failed'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='音频模式基准测试')
+    parser.add_argument('--items', type=int, default=8, help='下载的文件数')
+    parser.add_argument('--seconds', type=int, default=180, help='每个音频的时长(秒)')
+    parser.add_argument('--case', action='append', choices=list(CASES), help='只运行指定情况(可重复)')
+    parser.add_argument('-o', '--output', help='把结果写成JSON')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ytdl-audio-')
+    os.environ['HOME'] = os.environ['USERPROFILE'] = workdir
+    from downloader.log_setup import setup_logging
+    setup_logging(level=logging.CRITICAL)
+
+    have_ffmpeg = shutil.which('ffmpeg') is not None
+    media_dir = os.path.join(workdir, 'media')
+    names = make_media(media_dir, args.items, args.seconds, have_ffmpeg)
+    server = QuietServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=media_dir))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    results = []
+    skipped = []
+    try:
+        for name in args.case or CASES:
+            if CASES[name][3] and not have_ffmpeg:
+                skipped.append(name)
+                print(f"{name:<15} 跳过(没有ffmpeg)")
+                continue
+            result = run_case(name, base_url, names, workdir, int(time.time() * 1000))
+            results.append(result)
+            print(f"{name:<15} {result['ok']}/{result['items']} 可用 {result['usable']:>7.2f}s "
+                  f"全部完成 {result['elapsed']:>7.2f}s {result['throughput_mb_s']:>7.2f}MB/s "
+                  f"ffmpeg {result['ffmpeg_seconds']:>6.2f}s")
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = next((r for r in results if r['case'] == 'legacy'), None)
+    if baseline:
+        for result in results:
+            if result is not baseline and result['elapsed']:
+                print(f"{result['case']}: 耗时为原来的 {result['elapsed'] / baseline['elapsed'] * 100:.0f}%")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'ffmpeg': have_ffmpeg,
+                       'results': results, 'skipped': skipped}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""分片并发数基准测试: 固定并发 vs 自适应(FragmentTuner)
+
+本地媒体服务器模拟两种网络:
+    per-connection    每个连接限速,并发越多越快
+    connection-limit  每个连接限速,且同时最多 3 个连接,超出的分片请求返回503
+每种网络下依次下载一批 HLS 视频,对比原来固定的 8 个并发和自适应并发的
+总耗时、吞吐量(实际下载到的字节)、被拒绝的请求数和下载完整度(跳过了
+重试失败的分片时字节数不足)。
+自适应的状态写在临时目录中,每次运行都从头学习。
+
+用法:
+    python benchmarks/bench_fragments.py
+    python benchmarks/bench_fragments.py --items 12 --rate 524288 -o fragments.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from media_server import MediaServer
+
+MB = 1024 * 1024
+
+# 网络 -> MediaServer 的参数
+PROFILES = {
+    'per-connection': {'max_active': None},
+    'connection-limit': {'max_active': 3},
+}
+STRATEGIES = ('fixed-8', 'adaptive')
+
+
+def make_tuner(strategy, workdir):
+    from downloader.fragment_tuner import FragmentTuner
+
+    path = os.path.join(workdir, f'{strategy}-{time.time_ns()}.sqlite3')
+    if strategy == 'fixed-8':
+        return FragmentTuner(path, minimum=8, maximum=8, initial=8)
+    return FragmentTuner(path)
+
+
+def run_case(profile, strategy, args, workdir):
+    from downloader.core import SimpleDownloaderCore
+
+    save_path = os.path.join(workdir, f'{profile}-{strategy}')
+    params = {'segments': args.segments, 'segment_size': args.segment_size, 'rate': args.rate}
+    with MediaServer(**PROFILES[profile]) as server:
+        urls = [server.url('hls', f'{profile}-{strategy}-{time.time_ns()}-{i}', **params)
+                for i in range(args.items)]
+        core = SimpleDownloaderCore()
+        core.fragments = make_tuner(strategy, workdir)
+        history = []
+        started = time.perf_counter()
+        ok = 0
+        for url in urls:
+            host = server.base_url.split('//', 1)[1]
+            history.append(core.fragments.concurrency(host))
+            ok += bool(core.download(url, save_path))
+        elapsed = time.perf_counter() - started
+        stats = server.stats()
+    downloaded = sum(entry.stat().st_size for entry in os.scandir(save_path) if entry.is_file())
+    shutil.rmtree(save_path, ignore_errors=True)
+    expected = args.items * args.segments * args.segment_size
+    return {
+        'profile': profile,
+        'strategy': strategy,
+        'items': args.items,
+        'ok': ok,
+        'elapsed': round(elapsed, 3),
+        'throughput_mb_s': round(downloaded / MB / elapsed, 2),
+        'complete': round(downloaded / expected, 4),
+        'rejected': stats['rejected'],
+        'retries': core.metrics.summary()['retries'],
+        'concurrency': history,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分片并发数基准测试')
+    parser.add_argument('--items', type=int, default=8, help='每种情况下载的视频数')
+    parser.add_argument('--segments', type=int, default=40, help='每个视频的分片数')
+    parser.add_argument('--segment-size', type=int, default=256 * 1024, help='分片大小(字节)')
+    parser.add_argument('--rate', type=int, default=MB, help='每个连接的速度(字节/秒)')
+    parser.add_argument('--profile', action='append', choices=sorted(PROFILES), help='只运行指定网络(可重复)')
+    parser.add_argument('-o', '--output', help='把结果写成JSON')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ytdl-fragments-')
+    os.environ['HOME'] = os.environ['USERPROFILE'] = workdir
+
+    import logging
+    from downloader.log_setup import setup_logging
+    # 被拒绝的分片每次都会输出错误日志,这里不显示
+    setup_logging(level=logging.CRITICAL)
+
+    results = []
+    try:
+        for profile in args.profile or PROFILES:
+            for strategy in STRATEGIES:
+                result = run_case(profile, strategy, args, workdir)
+                results.append(result)
+                print(f"{profile:<17} {strategy:<9} {result['ok']}/{result['items']} "
+                      f"{result['elapsed']:>7.2f}s {result['throughput_mb_s']:>6.2f}MB/s "
+                      f"完整度 {result['complete'] * 100:5.1f}% 拒绝 {result['rejected']:>4} "
+                      f"重试 {result['retries']:>4} 并发 {result['concurrency']}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for profile in args.profile or PROFILES:
+        fixed, adaptive = (next(r for r in results if r['profile'] == profile and r['strategy'] == s)
+                           for s in STRATEGIES)
+        print(f"{profile}: 自适应的吞吐量为固定并发的 "
+              f"{adaptive['throughput_mb_s'] / fixed['throughput_mb_s'] * 100:.0f}%,"
+              f"完整度 {fixed['complete'] * 100:.1f}% -> {adaptive['complete'] * 100:.1f}%")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""进度事件的微基准测试
+
+模拟高吞吐下的进度回调,比较每个数据块直接发送与经 ProgressAggregator
+合并后发送的单次开销和实际发送次数。
+
+用法: python benchmarks/bench_progress.py [--jobs 8] [--events 200000]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloader.progress_aggregator import ProgressAggregator
+
+
+def make_events(jobs, events):
+    """生成模拟的 yt-dlp 进度回调参数"""
+    total = 100 * 1024 * 1024
+    per_job = events // jobs
+    result = []
+    for j in range(jobs):
+        url = f'http://127.0.0.1/video{j}'
+        for i in range(per_job):
+            result.append((url, {
+                'status': 'downloading',
+                'downloaded_bytes': total * i // per_job,
+                'total_bytes': total,
+                'speed': 20 * 1024 * 1024,
+            }))
+    return result
+
+
+def run_threads(events, jobs, handler):
+    """按任务分线程并发回调,模拟并发分片下载"""
+    by_url = {}
+    for url, d in events:
+        by_url.setdefault(url, []).append(d)
+
+    def worker(url, items):
+        for d in items:
+            handler(url, d)
+
+    threads = [threading.Thread(target=worker, args=(url, items)) for url, items in by_url.items()]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def to_update(d):
+    """与下载器中的进度计算相同"""
+    progress = d['downloaded_bytes'] / d['total_bytes'] * 100
+    status = f"正在下载... {d['speed'] / 1024 / 1024:.1f}MB/s"
+    return progress, status
+
+
+def bench_direct(events, jobs):
+    """每个数据块直接发送"""
+    delivered = [0]
+    lock = threading.Lock()
+
+    def handler(url, d):
+        progress, status = to_update(d)
+        with lock:  # 模拟跨线程信号投递
+            delivered[0] += 2
+
+    elapsed = run_threads(events, jobs, handler)
+    return elapsed, delivered[0]
+
+
+def bench_aggregated(events, jobs, interval):
+    """经 ProgressAggregator 合并后发送"""
+    delivered = [0]
+
+    def sink(updates):
+        delivered[0] += sum(len(fields) for _, fields in updates)
+
+    aggregator = ProgressAggregator(sink, interval=interval)
+
+    def handler(url, d):
+        progress, status = to_update(d)
+        aggregator.update(url, progress=progress, status=status)
+
+    elapsed = run_threads(events, jobs, handler)
+    aggregator.flush()
+    return elapsed, delivered[0]
+
+
+def bench_downloader(events, jobs):
+    """使用真实的下载器进度回调(需要yt-dlp)"""
+    try:
+        from downloader.core import SimpleDownloaderCore
+    except ImportError:
+        return None
+    downloader = SimpleDownloaderCore()
+    elapsed = run_threads(events, jobs, downloader._progress_hook)
+    downloader.aggregator.flush()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='进度事件微基准测试')
+    parser.add_argument('--jobs', type=int, default=8, help='并发任务数')
+    parser.add_argument('--events', type=int, default=200000, help='进度回调总次数')
+    parser.add_argument('--interval', type=float, default=0.1, help='合并发送间隔(秒)')
+    args = parser.parse_args()
+
+    events = make_events(args.jobs, args.events)
+    n = len(events)
+
+    elapsed, delivered = bench_direct(events, args.jobs)
+    print(f"直接发送:   {elapsed / n * 1e6:.2f} 微秒/次, 发送 {delivered} 次")
+
+    elapsed, delivered = bench_aggregated(events, args.jobs, args.interval)
+    print(f"合并发送:   {elapsed / n * 1e6:.2f} 微秒/次, 发送 {delivered} 次 "
+          f"(约 {delivered / max(elapsed, 1e-9):.0f} 次/秒)")
+
+    elapsed = bench_downloader(events, args.jobs)
+    if elapsed is not None:
+        print(f"下载器回调: {elapsed / n * 1e6:.2f} 微秒/次")
+
+
+if __name__ == '__main__':
+    main()
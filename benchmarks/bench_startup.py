@@ -0,0 +1,109 @@
+"""启动速度基准测试
+
+在独立的子进程中(离屏Qt、临时HOME)测量:
+    导入耗时      import gui.main_window
+    构造耗时      MainWindow()
+    首次绘制      从进程开始计时到主窗口第一次 Paint 事件
+并检查导入和构造主窗口之后 yt_dlp 是否已被导入(它应当在窗口显示后
+由后台线程预加载,不在启动路径上)。
+取多次运行的中位数;超过阈值或 yt_dlp 出现在启动路径上时退出码为1,
+可以放在CI中防止启动变慢。
+
+用法:
+    python benchmarks/bench_startup.py -n 5
+    python benchmarks/bench_startup.py --max-first-paint 800 -o startup.json
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程中执行的代码: 输出一行JSON后立即退出,不等待免责声明等对话框
+CHILD = r'''
+import os, sys, json, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+from PyQt5.QtCore import QObject, QEvent
+from PyQt5.QtWidgets import QApplication, QMessageBox
+app = QApplication(sys.argv[:1])
+# 免责声明在首次绘制之后弹出,这里不让它阻塞
+QMessageBox.exec_ = lambda self: QMessageBox.Yes
+t0 = time.perf_counter()
+import gui.main_window
+t1 = time.perf_counter()
+window = gui.main_window.MainWindow()
+t2 = time.perf_counter()
+ytdlp_loaded = 'yt_dlp' in sys.modules
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            now = time.perf_counter()
+            print(json.dumps({{
+                'import_ms': (t1 - t0) * 1000,
+                'construct_ms': (t2 - t1) * 1000,
+                'first_paint_ms': (now - started) * 1000,
+                'ytdlp_on_startup_path': ytdlp_loaded,
+            }}), flush=True)
+            os._exit(0)
+        return False
+
+first_paint = FirstPaint()
+window.installEventFilter(first_paint)
+window.show()
+app.exec_()
+'''
+
+
+def run_once(home):
+    env = dict(os.environ, HOME=home, USERPROFILE=home, QT_QPA_PLATFORM='offscreen')
+    output = subprocess.run([sys.executable, '-c', CHILD.format(root=ROOT)], env=env,
+                            capture_output=True, text=True, timeout=60, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动速度基准测试')
+    parser.add_argument('-n', '--runs', type=int, default=5, help='运行次数,取中位数')
+    parser.add_argument('--max-first-paint', type=float, metavar='MS', help='首次绘制耗时上限(毫秒)')
+    parser.add_argument('--max-import', type=float, metavar='MS', help='导入耗时上限(毫秒)')
+    parser.add_argument('-o', '--output', help='把结果写成JSON')
+    args = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix='ytdl-startup-')
+    try:
+        runs = [run_once(home) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+    result = {key: round(statistics.median(run[key] for run in runs), 1)
+              for key in ('import_ms', 'construct_ms', 'first_paint_ms')}
+    result['ytdlp_on_startup_path'] = any(run['ytdlp_on_startup_path'] for run in runs)
+    result['runs'] = len(runs)
+    print(f"导入 {result['import_ms']:.1f}ms  构造 {result['construct_ms']:.1f}ms  "
+          f"首次绘制 {result['first_paint_ms']:.1f}ms  "
+          f"yt_dlp在启动路径上: {'是' if result['ytdlp_on_startup_path'] else '否'}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    failures = []
+    if result['ytdlp_on_startup_path']:
+        failures.append('构造主窗口时已导入 yt_dlp')
+    if args.max_first_paint is not None and result['first_paint_ms'] > args.max_first_paint:
+        failures.append(f"首次绘制 {result['first_paint_ms']:.1f}ms 超过 {args.max_first_paint}ms")
+    if args.max_import is not None and result['import_ms'] > args.max_import:
+        failures.append(f"导入 {result['import_ms']:.1f}ms 超过 {args.max_import}ms")
+    for failure in failures:
+        print(f'退化: {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
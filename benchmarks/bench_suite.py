@@ -0,0 +1,237 @@
+"""离线基准测试套件
+
+启动本地媒体服务器(benchmarks/media_server.py),通过 yt-dlp 的通用提取器
+下载合成的直链 / HLS / DASH 媒体,分别驱动 SimpleDownloader、DownloadManager
+和 DownloadWorker,报告:
+    吞吐量          下载字节数 / 总耗时
+    每项额外开销    (总耗时 - 直接HTTP下载同样内容的耗时) / 项数
+    进度回调开销    每次 yt-dlp 进度回调的平均耗时
+    界面更新开销    DownloadWorker 的信号在界面线程更新表格模型的耗时
+场景参数固定(SCENARIOS),结果写成JSON,可以用 --compare 与之前的结果对比。
+为了不影响真实数据,运行时把 HOME 指向临时目录(缓存、存档、日志都在里面)。
+
+用法:
+    python benchmarks/bench_suite.py -o results.json
+    python benchmarks/bench_suite.py --scenario hls --driver worker
+    python benchmarks/bench_suite.py -o new.json --compare results.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import functools
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from media_server import MediaServer
+
+MB = 1024 * 1024
+
+# 固定的测试场景,修改会使结果无法与之前的对比
+SCENARIOS = {
+    'progressive-small': {'kind': 'progressive', 'count': 12, 'params': {'size': 2 * MB}},
+    'progressive-large': {'kind': 'progressive', 'count': 2, 'params': {'size': 64 * MB}},
+    'hls': {'kind': 'hls', 'count': 4, 'params': {'segments': 40, 'segment_size': 256 * 1024}},
+    'dash': {'kind': 'dash', 'count': 4, 'params': {'segments': 40, 'segment_size': 256 * 1024}},
+}
+DRIVERS = ('simple', 'manager', 'worker')
+
+
+class Timer:
+    """累计被包装函数的调用次数和耗时"""
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+
+    def wrap(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.total += time.perf_counter() - started
+                self.calls += 1
+        return wrapper
+
+    def result(self):
+        return {
+            'calls': self.calls,
+            'avg_us': round(self.total / self.calls * 1e6, 2) if self.calls else 0.0,
+            'total_ms': round(self.total * 1000, 2),
+        }
+
+
+def scenario_urls(server, name, run_id):
+    """场景的URL;每次运行的名称不同,避免命中信息缓存和下载存档"""
+    scenario = SCENARIOS[name]
+    return [server.url(scenario['kind'], f'{name}-{run_id}-{i}', **scenario['params'])
+            for i in range(scenario['count'])]
+
+
+def raw_fetch_seconds(urls):
+    """直接用HTTP下载同样内容的耗时,作为没有下载器开销时的基线"""
+    import yt_dlp
+
+    started = time.perf_counter()
+    with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+        for url in urls:
+            info = ydl.extract_info(url, download=False)
+            fragments = info.get('fragments') or []
+            base = info.get('fragment_base_url')
+            targets = [f.get('url') or base + f['path'] for f in fragments] or [info['url']]
+            for target in targets:
+                with urllib.request.urlopen(target) as response:
+                    while response.read(MB):
+                        pass
+    return time.perf_counter() - started
+
+
+def directory_bytes(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def drive_simple(urls, save_path):
+    """SimpleDownloader: 逐个同步下载"""
+    from downloader import SimpleDownloader
+
+    downloader = SimpleDownloader()
+    hook_timer = Timer()
+    downloader.core._progress_hook = hook_timer.wrap(downloader.core._progress_hook)
+    ok = sum(1 for url in urls if downloader.download(url, save_path))
+    return ok, {'progress_hook': hook_timer.result()}
+
+
+def drive_manager(urls, save_path):
+    """DownloadManager: 逐个同步下载(合成媒体不能做ffmpeg后处理,跳过后处理)"""
+    from downloader import DownloadManager
+
+    manager = DownloadManager()
+    manager.core.postprocess_specs = lambda *args: []
+    hook_timer = Timer()
+    manager.core._progress_hook = hook_timer.wrap(manager.core._progress_hook)
+    ok = sum(1 for url in urls if manager.download_video(url, save_path))
+    return ok, {'progress_hook': hook_timer.result()}
+
+
+def drive_worker(urls, save_path):
+    """DownloadWorker: 并发下载,信号在界面线程中更新表格模型"""
+    from PyQt5.QtWidgets import QApplication, QTableView
+    from downloader import DownloadWorker
+    from gui.download_model import DownloadTableModel
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    model = DownloadTableModel()
+    view = QTableView()
+    view.setModel(model)
+    model.add_urls(urls)
+
+    worker = DownloadWorker(urls, save_path)
+    hook_timer = Timer()
+    worker.downloader.core._progress_hook = hook_timer.wrap(worker.downloader.core._progress_hook)
+    gui_timer = Timer()
+    worker.progress_updated.connect(gui_timer.wrap(model.update_progress))
+    worker.status_updated.connect(gui_timer.wrap(model.update_status))
+    worker.stats_updated.connect(gui_timer.wrap(model.update_stats))
+    worker.finished.connect(app.quit)
+    worker.start()
+    app.exec_()
+    worker.wait()
+    return worker.success_count, {'progress_hook': hook_timer.result(), 'gui_update': gui_timer.result()}
+
+
+def run_case(server, scenario, driver, workdir):
+    """运行一个场景和驱动的组合"""
+    run_id = f'{driver}-{int(time.time() * 1000)}'
+    urls = scenario_urls(server, scenario, run_id)
+    save_path = os.path.join(workdir, run_id)
+    os.makedirs(save_path)
+
+    baseline = raw_fetch_seconds(urls)
+    started = time.perf_counter()
+    ok, costs = globals()[f'drive_{driver}'](urls, save_path)
+    elapsed = time.perf_counter() - started
+    downloaded = directory_bytes(save_path)
+    shutil.rmtree(save_path, ignore_errors=True)
+
+    return dict({
+        'scenario': scenario,
+        'driver': driver,
+        'items': len(urls),
+        'ok': ok,
+        'bytes': downloaded,
+        'elapsed': round(elapsed, 3),
+        'throughput_mb_s': round(downloaded / MB / elapsed, 2) if elapsed else 0.0,
+        'baseline_elapsed': round(baseline, 3),
+        'per_item_overhead_ms': round((elapsed - baseline) / len(urls) * 1000, 1),
+    }, **costs)
+
+
+def compare(results, previous_path):
+    """与之前的结果对比耗时"""
+    with open(previous_path, encoding='utf-8') as f:
+        previous = {(r['scenario'], r['driver']): r for r in json.load(f)['results']}
+    print(f"\n与 {previous_path} 对比:")
+    for result in results:
+        old = previous.get((result['scenario'], result['driver']))
+        if not old:
+            continue
+        change = (result['elapsed'] - old['elapsed']) / old['elapsed'] * 100 if old['elapsed'] else 0.0
+        print(f"  {result['scenario']:<18} {result['driver']:<8} "
+              f"{old['elapsed']:>8.2f}s -> {result['elapsed']:>8.2f}s ({change:+.1f}%)  "
+              f"每项开销 {old['per_item_overhead_ms']:.0f} -> {result['per_item_overhead_ms']:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线基准测试套件')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='只运行指定场景(可重复),默认全部')
+    parser.add_argument('--driver', action='append', choices=DRIVERS, help='只运行指定驱动(可重复),默认全部')
+    parser.add_argument('-o', '--output', help='把结果写成JSON')
+    parser.add_argument('--compare', metavar='PATH', help='与之前的结果JSON对比')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ytdl-bench-')
+    # 缓存、下载存档、任务记录、日志都写到临时目录
+    os.environ['HOME'] = os.environ['USERPROFILE'] = workdir
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    from downloader.log_setup import setup_logging
+    import logging
+    setup_logging(level=logging.WARNING)
+
+    results = []
+    try:
+        with MediaServer() as server:
+            for scenario in args.scenario or SCENARIOS:
+                for driver in args.driver or DRIVERS:
+                    result = run_case(server, scenario, driver, workdir)
+                    results.append(result)
+                    print(f"{scenario:<18} {driver:<8} {result['ok']}/{result['items']} "
+                          f"{result['elapsed']:>7.2f}s {result['throughput_mb_s']:>8.1f}MB/s "
+                          f"每项开销 {result['per_item_overhead_ms']:>7.1f}ms "
+                          f"进度回调 {result['progress_hook']['avg_us']:.1f}us"
+                          + (f" 界面更新 {result['gui_update']['avg_us']:.1f}us" if 'gui_update' in result else ''))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': sys.version.split()[0],
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
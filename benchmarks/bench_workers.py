@@ -0,0 +1,141 @@
+"""多进程工作队列基准测试: 吞吐量随工作进程数的变化
+
+启动本地媒体服务器(每个连接限速,模拟单个连接受限的CDN),把同一批直链
+放入新的SQLite任务队列,分别启动 1、2、4 个 `worker.py run` 进程下载,
+报告队列清空的时间、吞吐量和相对单进程的扩展效率(吞吐量 / (进程数 × 单进程吞吐量))。
+每个进程第一个任务前要导入 yt-dlp、加载提取器(约1秒CPU),CPU核数少于进程数时
+这部分会排队,所以另外报告稳定阶段(所有进程都完成第一个任务之后)的吞吐量和扩展效率。
+--kill 在运行中途强制结束一个工作进程,检查租约过期后任务被重新分配、全部完成。
+
+用法:
+    python benchmarks/bench_workers.py
+    python benchmarks/bench_workers.py --workers 1 2 4 8 --items 48 -o workers.json
+    python benchmarks/bench_workers.py --workers 4 --kill --lease 5
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from media_server import MediaServer
+
+MB = 1024 * 1024
+
+
+def steady_throughput(queue_path, size):
+    """所有工作进程都完成第一个任务之后的吞吐量(MB/s),任务太少无法计算时返回None"""
+    import sqlite3
+
+    conn = sqlite3.connect(queue_path)
+    try:
+        rows = conn.execute("SELECT worker, updated_at FROM queue WHERE state = 'finished'"
+                            " ORDER BY updated_at").fetchall()
+    finally:
+        conn.close()
+    first = {}
+    for worker, finished_at in rows:
+        first.setdefault(worker, finished_at)
+    start = max(first.values(), default=None)
+    later = [finished_at for _, finished_at in rows if finished_at > start] if start else []
+    if not later or later[-1] <= start:
+        return None
+    return round(len(later) * size / MB / (later[-1] - start), 2)
+
+
+def run_case(server, count, args, workdir):
+    from downloader.work_queue import SqliteWorkQueue
+
+    run_id = f'w{count}-{time.time_ns()}'
+    queue_path = os.path.join(workdir, f'{run_id}.sqlite3')
+    save_path = os.path.join(workdir, run_id)
+    queue = SqliteWorkQueue(queue_path, lease_seconds=args.lease)
+    urls = [server.url('progressive', f'{run_id}-{i}', size=args.size, rate=args.rate)
+            for i in range(args.items)]
+    queue.put_many(urls)
+
+    env = dict(os.environ, HOME=workdir, USERPROFILE=workdir)
+    command = [sys.executable, os.path.join(ROOT, 'worker.py'), '--queue', queue_path,
+               '--lease', str(args.lease), 'run', '-o', save_path, '--exit-when-empty']
+    started = time.perf_counter()
+    processes = [subprocess.Popen(command + ['--name', f'{run_id}-{i}'], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                 for i in range(count)]
+    killed = False
+    # 队列清空(全部完成或失败)的时间;工作进程在没有任务后稍晚退出,不计入
+    while queue.pending():
+        if args.kill and not killed and time.perf_counter() - started > args.kill_after:
+            processes[0].kill()
+            killed = True
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.wait()
+
+    stats = queue.stats()
+    queue.close()
+    steady = steady_throughput(queue_path, args.size)
+    downloaded = sum(entry.stat().st_size for entry in os.scandir(save_path)
+                     if entry.is_file() and not entry.name.endswith('.part'))
+    shutil.rmtree(save_path, ignore_errors=True)
+    return {
+        'workers': count,
+        'items': args.items,
+        'finished': stats['states'].get('finished', 0),
+        'failed': stats['states'].get('failed', 0),
+        'killed': killed,
+        'elapsed': round(elapsed, 3),
+        'throughput_mb_s': round(downloaded / MB / elapsed, 2),
+        'steady_mb_s': steady,
+        'per_worker': {w['worker'].rsplit('-', 1)[1]: w['done'] for w in stats['workers']},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程工作队列基准测试')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='工作进程数')
+    parser.add_argument('--items', type=int, default=24, help='任务数')
+    parser.add_argument('--size', type=int, default=4 * MB, help='每个文件的大小(字节)')
+    parser.add_argument('--rate', type=int, default=4 * MB, help='每个连接的速度(字节/秒)')
+    parser.add_argument('--lease', type=float, default=10, help='租约时长(秒)')
+    parser.add_argument('--kill', action='store_true', help='运行中途强制结束一个工作进程')
+    parser.add_argument('--kill-after', type=float, default=3.0, help='开始后多少秒结束工作进程')
+    parser.add_argument('-o', '--output', help='把结果写成JSON')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ytdl-workers-')
+    results = []
+    try:
+        with MediaServer() as server:
+            for count in args.workers:
+                result = run_case(server, count, args, workdir)
+                results.append(result)
+                base = results[0]
+                scale = count / base['workers']
+                result['efficiency'] = round(result['throughput_mb_s'] / (base['throughput_mb_s'] * scale), 3)
+                result['steady_efficiency'] = (round(result['steady_mb_s'] / (base['steady_mb_s'] * scale), 3)
+                                               if result['steady_mb_s'] and base['steady_mb_s'] else None)
+                steady = (f"稳定 {result['steady_mb_s']:>6.2f}MB/s 效率 {result['steady_efficiency'] * 100:5.1f}%"
+                          if result['steady_efficiency'] is not None else '稳定 -')
+                print(f"{count:>2} 个进程 完成 {result['finished']}/{result['items']} 失败 {result['failed']} "
+                      f"{result['elapsed']:>7.2f}s {result['throughput_mb_s']:>6.2f}MB/s "
+                      f"效率 {result['efficiency'] * 100:5.1f}% {steady}"
+                      f"{' (中途结束一个进程)' if result['killed'] else ''} 各进程完成 {result['per_worker']}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
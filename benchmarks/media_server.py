@@ -0,0 +1,232 @@
+"""基准测试用的本地媒体服务器
+
+生成确定性的合成媒体,通过 yt-dlp 的通用提取器(generic)即可下载:
+    /progressive/<名称>.mp4?size=<字节>                直链(支持Range)
+    /hls/<名称>.m3u8?segments=<分片数>&segment_size=<字节>   HLS
+    /dash/<名称>.mpd?segments=<分片数>&segment_size=<字节>   DASH
+所有路径都可以加 rate=<字节/秒> 限制单个连接的速度。
+max_active 限制同时传输的连接数,超出的请求返回503(模拟限流的CDN)。
+内容只是填充数据,不能播放,也不能做ffmpeg后处理。
+
+用法: python benchmarks/media_server.py [--port 8765]
+"""
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+CHUNK = 64 * 1024
+# 重复使用的填充数据,避免每个请求都生成
+_PATTERN = bytes(range(256)) * (CHUNK // 256)
+# MPEG-TS 包(188字节,0x47 同步字节)
+_TS_PACKET = b'\x47' + bytes(187)
+
+MPD_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" profiles="urn:mpeg:dash:profile:isoff-on-demand:2011"
+     minBufferTime="PT2S" mediaPresentationDuration="PT{duration}S">
+  <Period>
+    <AdaptationSet mimeType="video/mp4" segmentAlignment="true">
+      <Representation id="1" codecs="avc1.4d401f,mp4a.40.2" bandwidth="{bandwidth}" width="1280" height="720">
+        <SegmentTemplate timescale="1" duration="1" startNumber="0"
+                         initialization="{name}/init.mp4{query}" media="{name}/seg$Number$.m4s{query}"/>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+'''
+
+
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._handle(head=True)
+
+    def do_GET(self):
+        self._handle(head=False)
+
+    def _handle(self, head):
+        parsed = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        rate = float(query.get('rate', 0))
+        parts = parsed.path.strip('/').split('/')
+        self.server.requests += 1
+
+        if parts[0] == 'progressive' and len(parts) == 2:
+            size = int(query.get('size', 1024 * 1024))
+            content_type = 'audio/mp4' if parts[1].endswith('.m4a') else 'video/mp4'
+            return self._send_bytes(size, content_type, head, rate, ranged=True)
+
+        if parts[0] == 'hls' and len(parts) == 2 and parts[1].endswith('.m3u8'):
+            return self._send_text(self._m3u8(parts[1][:-5], query, parsed.query),
+                                   'application/vnd.apple.mpegurl', head)
+        if parts[0] == 'hls' and len(parts) == 3:
+            size = int(query.get('segment_size', 256 * 1024))
+            return self._send_bytes(size, 'video/mp2t', head, rate, pattern=_TS_PACKET)
+
+        if parts[0] == 'dash' and len(parts) == 2 and parts[1].endswith('.mpd'):
+            segments = int(query.get('segments', 20))
+            size = int(query.get('segment_size', 256 * 1024))
+            text = MPD_TEMPLATE.format(
+                name=parts[1][:-4], duration=segments, bandwidth=size * 8,
+                query='?' + parsed.query.replace('&', '&amp;') if parsed.query else '')
+            return self._send_text(text, 'application/dash+xml', head)
+        if parts[0] == 'dash' and len(parts) == 3:
+            size = 1024 if parts[2].startswith('init') else int(query.get('segment_size', 256 * 1024))
+            return self._send_bytes(size, 'video/mp4', head, rate)
+
+        self.send_error(404)
+
+    def _m3u8(self, name, query, raw_query):
+        segments = int(query.get('segments', 20))
+        suffix = f'?{raw_query}' if raw_query else ''
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:1',
+                 '#EXT-X-MEDIA-SEQUENCE:0', '#EXT-X-PLAYLIST-TYPE:VOD']
+        for i in range(segments):
+            lines += ['#EXTINF:1.0,', f'{name}/seg{i}.ts{suffix}']
+        lines.append('#EXT-X-ENDLIST')
+        return '\n'.join(lines) + '\n'
+
+    def _send_text(self, text, content_type, head):
+        data = text.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(data)
+
+    def _send_bytes(self, size, content_type, head, rate, ranged=False, pattern=_PATTERN):
+        server = self.server
+        with server.lock:
+            if server.max_active and server.active >= server.max_active:
+                server.rejected += 1
+                overloaded = True
+            else:
+                server.active += 1
+                overloaded = False
+        if overloaded:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        try:
+            self._send_range(size, content_type, head, rate, ranged, pattern)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _send_range(self, size, content_type, head, rate, ranged, pattern):
+        start, end = 0, size - 1
+        range_header = self.headers.get('Range')
+        if ranged and range_header and range_header.startswith('bytes='):
+            first, _, last = range_header[6:].partition('-')
+            start = int(first or 0)
+            end = min(int(last), size - 1) if last else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start + 1))
+        if ranged:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        if head:
+            return
+
+        block = pattern * max(1, CHUNK // len(pattern))
+        remaining = end - start + 1
+        started = time.monotonic()
+        sent = 0
+        try:
+            while remaining > 0:
+                data = block[:min(len(block), remaining)]
+                self.wfile.write(data)
+                remaining -= len(data)
+                sent += len(data)
+                if rate:
+                    # 按限速计算应该发送完的时间,提前了就等一会
+                    delay = sent / rate - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.server.bytes_sent += sent
+
+
+class MediaServer:
+    """在后台线程中运行的媒体服务器"""
+
+    def __init__(self, host='127.0.0.1', port=0, max_active=None):
+        self.httpd = ThreadingHTTPServer((host, port), MediaRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.requests = 0
+        self.httpd.bytes_sent = 0
+        self.httpd.lock = threading.Lock()
+        self.httpd.max_active = max_active
+        self.httpd.active = 0
+        self.httpd.rejected = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def url(self, kind, name, **params):
+        """生成媒体链接,kind 为 progressive/hls/dash"""
+        ext = {'progressive': 'mp4', 'hls': 'm3u8', 'dash': 'mpd'}[kind]
+        if kind == 'progressive' and params.pop('audio', False):
+            ext = 'm4a'
+        query = '&'.join(f'{k}={v}' for k, v in params.items())
+        return f'{self.base_url}/{kind}/{name}.{ext}' + (f'?{query}' if query else '')
+
+    def stats(self):
+        return {'requests': self.httpd.requests, 'bytes_sent': self.httpd.bytes_sent,
+                'rejected': self.httpd.rejected}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='基准测试用的本地媒体服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    server = MediaServer(args.host, args.port)
+    print(f'媒体服务器: {server.base_url}')
+    print('例如:', server.url('progressive', 'sample', size=8 * 1024 * 1024))
+    print('     ', server.url('hls', 'sample', segments=20))
+    print('     ', server.url('dash', 'sample', segments=20))
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
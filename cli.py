@@ -0,0 +1,172 @@
+"""无界面的批量下载入口,不依赖PyQt5
+
+从文件或标准输入读取URL(每行一个,# 开头为注释),并发下载,
+播放列表和频道链接会边展开边下载,
+进度和结果以 JSON Lines 格式输出到标准输出,日志输出到标准错误。
+
+用法:
+    python cli.py urls.txt -o ~/Downloads/YouTubeDownloader
+    cat urls.txt | python cli.py - -j 4
+    python cli.py urls.txt -f audio --audio-format m4a
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+
+from downloader.core import SimpleDownloaderCore
+from downloader.async_engine import AsyncDownloadEngine
+from downloader.log_setup import setup_logging
+from downloader.side_artifacts import ARTIFACTS
+
+
+class JsonLinesReporter:
+    """把下载事件按行输出为JSON,多线程安全"""
+
+    def __init__(self, stream=sys.stdout):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        fields['event'] = event
+        fields['time'] = round(time.time(), 3)
+        line = json.dumps(fields, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+    def on_progress(self, url, progress):
+        self.emit('progress', url=url, progress=round(progress, 1))
+
+    def on_status(self, url, status):
+        self.emit('status', url=url, status=status)
+
+    def on_error(self, url, error):
+        self.emit('error', url=url, error=error)
+
+    def on_stats(self, url, speed, total_bytes):
+        self.emit('stats', url=url, speed=speed, total_bytes=total_bytes)
+
+
+def read_urls(source):
+    """读取URL列表,source 为文件路径或 '-'(标准输入)"""
+    stream = sys.stdin if source == '-' else open(source, encoding='utf-8')
+    try:
+        urls = []
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                urls.append(line)
+        # 去重并保持顺序
+        return list(dict.fromkeys(urls))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def artifact_list(value):
+    """--artifacts 的参数: 逗号分隔的附属文件名"""
+    if value == 'none':
+        return ()
+    names = tuple(name.strip() for name in value.split(',') if name.strip())
+    unknown = [name for name in names if name not in ARTIFACTS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"未知的附属文件: {', '.join(unknown)}")
+    return names
+
+
+def parse_args(argv=None):
+    default_path = os.path.join(os.path.expanduser("~"), "Downloads", "YouTubeDownloader")
+    parser = argparse.ArgumentParser(description='YouTube视频批量下载(命令行)')
+    parser.add_argument('source', nargs='?', default='-', help="URL列表文件,'-' 表示标准输入(默认)")
+    parser.add_argument('-o', '--output', default=default_path, help='保存路径')
+    parser.add_argument('-f', '--format', default='best',
+                        help="yt-dlp 格式选择,默认 best;audio 表示音频模式(只下载最好的音频流)")
+    parser.add_argument('-j', '--jobs', type=int, default=3, help='同时下载的任务数')
+    parser.add_argument('--per-host', type=int, default=2, help='同一主机的最大并发数')
+    parser.add_argument('--postprocess-workers', type=int, default=None,
+                        help='后处理(ffmpeg)进程数,默认等于CPU核数')
+    parser.add_argument('--limit-rate', type=float, default=0,
+                        help='所有任务合计的最大下载速度(MB/s),0 表示不限速')
+    parser.add_argument('--metrics-textfile', metavar='PATH',
+                        help='把累计指标写成 Prometheus textfile(node_exporter textfile 收集器)')
+    parser.add_argument('--summary', metavar='PATH', help='把本批任务各阶段耗时等明细写成JSON')
+    parser.add_argument('--log-file', metavar='PATH', help='同时把日志写入文件')
+    parser.add_argument('--artifacts', type=artifact_list, default=None, metavar='LIST',
+                        help=f"视频完成后在后台生成的附属文件,逗号分隔: {','.join(ARTIFACTS)};"
+                             "none 表示不生成")
+    parser.add_argument('--staging', metavar='DIR',
+                        help='暂存目录(如本地SSD),下载和后处理在这里进行,完成后移到保存路径')
+    parser.add_argument('--audio-format', choices=('m4a', 'opus'), default=None,
+                        help='音频模式的输出容器(能流复制就不重新编码),默认保留原来的容器')
+    parser.add_argument('--loudnorm', action='store_true', help='音频模式: 响度标准化(需要重新编码)')
+    parser.add_argument('--audio-metadata', action='store_true',
+                        help='音频模式: 写入标题、作者等元数据(与转换容器在同一次ffmpeg中完成)')
+    parser.add_argument('--journal', metavar='PATH', help='任务记录数据库,用于跳过已完成任务和断点续传')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # 日志(JSON Lines)输出到标准错误,标准输出只有下载事件
+    setup_logging(log_file=args.log_file)
+    urls = read_urls(args.source)
+    reporter = JsonLinesReporter()
+
+    journal = None
+    if args.journal:
+        from downloader.job_journal import JobJournal
+        journal = JobJournal(path=args.journal)
+        journal.reset_interrupted()
+        for url in urls:
+            journal.add(url)
+
+    downloader = SimpleDownloaderCore(
+        journal=journal,
+        staging_dir=args.staging,
+        audio_options={'container': args.audio_format, 'loudnorm': args.loudnorm,
+                       'metadata': args.audio_metadata},
+        on_progress=reporter.on_progress,
+        on_status=reporter.on_status,
+        on_error=reporter.on_error,
+        on_stats=reporter.on_stats,
+    )
+
+    def on_job_done(job):
+        reporter.emit('result', url=job.url, ok=job.ok, state=job.state,
+                      elapsed=round(time.monotonic() - job.submitted_at, 3),
+                      time_to_file=round(job.time_to_file, 3) if job.time_to_file is not None else None,
+                      timings={k: round(v, 3) for k, v in job.timings.items()},
+                      postprocess=job.postprocess_report,
+                      throughput=round(job.throughput, 1) if job.throughput is not None else None)
+
+    downloader.bandwidth.set_rate(args.limit_rate * 1024 * 1024)
+
+    def on_playlist_entry(playlist_url, url):
+        reporter.emit('entry', playlist=playlist_url, url=url)
+        if journal is not None:
+            journal.add(url)
+
+    started = time.monotonic()
+    engine = AsyncDownloadEngine(downloader, args.output, args.format,
+                                 transfer_workers=args.jobs, per_host_limit=args.per_host,
+                                 postprocess_workers=args.postprocess_workers,
+                                 on_job_done=on_job_done,
+                                 on_playlist_entry=on_playlist_entry,
+                                 artifacts=args.artifacts)
+    success_count = asyncio.run(engine.run(urls))
+    total = engine.total()
+    if args.summary:
+        downloader.metrics.write_summary(args.summary)
+    if args.metrics_textfile:
+        downloader.metrics.write_textfile(args.metrics_textfile)
+    reporter.emit('summary', success=success_count, total=total,
+                  elapsed=round(time.monotonic() - started, 3), stages=engine.stats())
+    return 0 if success_count == total else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,40 @@
-from .simple_downloader import SimpleDownloader
-from .download_worker import DownloadWorker
+import importlib
+import threading
 
-__all__ = ['SimpleDownloader', 'DownloadWorker'] 
\ No newline at end of file
+# 按需导入: 只用到不依赖Qt的模块(如命令行)时不会加载PyQt5
+_EXPORTS = {
+    'SimpleDownloader': '.simple_downloader',
+    'DownloadManager': '.download_manager',
+    'DownloadWorker': '.download_worker',
+    'JobJournal': '.job_journal',
+    'DownloadArchive': '.download_archive',
+    'SimpleDownloaderCore': '.core',
+    'DownloadManagerCore': '.core',
+    'AsyncDownloadEngine': '.async_engine',
+    'SqliteWorkQueue': '.work_queue',
+    'RedisWorkQueue': '.work_queue',
+    'QueueWorker': '.queue_worker',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+
+
+def preload():
+    """在后台线程中提前导入 yt-dlp 和下载模块,返回线程
+
+    界面显示后调用,第一次开始下载时不必再等待导入和加载提取器
+    """
+    def run():
+        importlib.import_module('.download_worker', __name__)
+        from yt_dlp.extractor import gen_extractor_classes
+        gen_extractor_classes()
+
+    thread = threading.Thread(target=run, name='preload', daemon=True)
+    thread.start()
+    return thread
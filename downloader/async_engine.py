@@ -0,0 +1,576 @@
+import os
+import time
+import asyncio
+import logging
+import itertools
+import functools
+import contextlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlparse
+
+from .playlist import FLAT_OPTS, flat_extract, is_playlist_info, is_playlist_url, iter_playlist_entries
+from .postprocess import apply_postprocessors, postprocess_params
+from .retry_policy import RetryPolicy
+from .metrics import error_class
+
+# 任务状态
+PENDING = 'pending'
+RETRY_WAIT = 'retry_wait'
+EXTRACTING = 'extracting'
+TRANSFERRING = 'transferring'
+POSTPROCESSING = 'postprocessing'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+SKIPPED = 'skipped'
+
+
+class EngineJob:
+    """调度器中的一个下载任务"""
+
+    def __init__(self, url, priority=0, options=None, weight=1.0):
+        self.url = url
+        self.priority = priority
+        # 下载时分配带宽的权重
+        self.weight = weight
+        # 下载阶段的有效吞吐量(字节/秒)
+        self.throughput = None
+        self.options = options or {}
+        self.state = PENDING
+        self.cancelled = False
+        self.ok = False
+        self.error = None
+        self.ydl = None
+        self.info = None
+        self.result = None
+        # 交给后处理阶段的 (参数, 下载结果, 后处理列表)
+        self.postprocess = None
+        # 后处理统计(耗时、处理前后文件大小)
+        self.postprocess_report = None
+        # 从提交到视频文件可用的时间(秒)
+        self.time_to_file = None
+        self.submitted_at = time.monotonic()
+        # 已经延后重试的次数,以及等待重试的定时器
+        self.attempts = 0
+        self.retry_handle = None
+        # 各阶段耗时(秒)
+        self.timings = {}
+        self.done = asyncio.get_running_loop().create_future()
+
+    @property
+    def host(self):
+        try:
+            return (urlparse(self.url).hostname or '').lower()
+        except ValueError:
+            return ''
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED, CANCELLED, SKIPPED)
+
+
+class AsyncDownloadEngine:
+    """基于asyncio的下载调度器
+
+    任务依次经过 提取 → 下载 → 后处理 三个阶段,每个阶段有自己的优先级
+    队列和有限大小的执行器,阻塞的yt-dlp调用都在线程池中执行,不会为每个
+    任务单独开线程;ffmpeg转换等后处理在按CPU核数创建的进程池中执行,
+    与后续任务的下载同时进行。队列有容量上限,提交过快时 submit 会等待
+    (背压)。下载阶段按主机限制并发数。priority 越大越先执行。
+    播放列表和频道链接边平铺展开边提交,每个视频到提取阶段才提取信息。
+    视频文件就位后任务即完成,缩略图等附属文件在下载器的后台通道中生成。
+    失败的任务按 retry_policy 延后重试(指数退避),等待期间不占用任何
+    工作协程;403 熔断期间暂停开始新任务。
+
+    core 为 DownloaderCore 的实例,提供 prepare/extract/transfer/finish/fail
+    """
+
+    def __init__(self, core, save_path, quality='best', extract_workers=2,
+                 transfer_workers=3, postprocess_workers=None, per_host_limit=2,
+                 queue_size=100, expand_playlists=True, on_job_done=None,
+                 on_playlist_entry=None, retry_policy=None, artifacts=None):
+        self.core = core
+        self.save_path = save_path
+        self.quality = quality
+        self.extract_workers = max(1, int(extract_workers))
+        self.transfer_workers = max(1, int(transfer_workers))
+        self.postprocess_workers = max(1, int(postprocess_workers or os.cpu_count() or 1))
+        self.per_host_limit = max(1, int(per_host_limit))
+        self.queue_size = queue_size
+        self.expand_playlists = expand_playlists
+        self.on_job_done = on_job_done
+        # 展开播放列表时每个视频提交前调用 on_playlist_entry(播放列表链接, 视频链接)
+        self.on_playlist_entry = on_playlist_entry
+        # 延后重试和熔断
+        self.retry = retry_policy or RetryPolicy()
+        # 本批需要的附属文件,None 表示使用下载器的默认设置
+        self.artifacts = artifacts
+        self.logger = logging.getLogger('youtube_downloader.engine')
+
+        self.jobs = {}  # url -> EngineJob
+        self._seq = itertools.count()
+        self._tasks = []
+        # 重试时重新放入提取队列的协程
+        self._retry_tasks = set()
+        self._host_limits = {}
+        self._executors = {}
+        self._queues = {}
+        self._timings = {}
+        self._active = 0
+        self._idle = None
+        self._loop = None
+        # 取消全部任务时同时停止展开播放列表
+        self._stopping = False
+        # 展开失败的播放列表,没有产生任务,统计总数时单独计入
+        self.failed_playlists = []
+
+    async def start(self):
+        """创建队列、线程池和各阶段的工作协程"""
+        self._loop = asyncio.get_running_loop()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.core.metrics.reset_batch()
+        self._queues = {
+            EXTRACTING: asyncio.PriorityQueue(maxsize=self.queue_size),
+            TRANSFERRING: asyncio.PriorityQueue(maxsize=self.transfer_workers),
+            POSTPROCESSING: asyncio.PriorityQueue(maxsize=self.postprocess_workers * 2),
+        }
+        self._executors = {
+            EXTRACTING: ThreadPoolExecutor(self.extract_workers, thread_name_prefix='extract'),
+            TRANSFERRING: ThreadPoolExecutor(self.transfer_workers, thread_name_prefix='transfer'),
+            POSTPROCESSING: self._process_pool(),
+        }
+        for _ in range(self.extract_workers):
+            self._tasks.append(asyncio.create_task(self._stage_worker(EXTRACTING, self._extract)))
+        for _ in range(self.transfer_workers):
+            self._tasks.append(asyncio.create_task(self._stage_worker(TRANSFERRING, self._transfer)))
+        for _ in range(self.postprocess_workers):
+            self._tasks.append(asyncio.create_task(self._stage_worker(POSTPROCESSING, self._postprocess)))
+
+    def _process_pool(self):
+        """后处理进程池
+
+        用 spawn 启动子进程: fork 会复制Qt、日志线程、SQLite连接和持有中的锁,子进程可能死锁
+        """
+        return ProcessPoolExecutor(self.postprocess_workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _renew_process_pool(self, broken):
+        """后处理进程异常退出后进程池不能再用,换一个新的(多个任务同时发现时只换一次)"""
+        if self._executors.get(POSTPROCESSING) is not broken:
+            return
+        self.logger.error("后处理进程异常退出,重新创建进程池")
+        broken.shutdown(wait=False)
+        self._executors[POSTPROCESSING] = self._process_pool()
+
+    async def close(self):
+        """停止工作协程并关闭线程池"""
+        tasks = self._tasks + list(self._retry_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._retry_tasks = set()
+        for executor in self._executors.values():
+            executor.shutdown(wait=False)
+        self._stopping = False
+        # 本批次结束,关闭复用的YoutubeDL实例
+        self.core.session.close()
+
+    async def submit(self, url, priority=0, weight=1.0, **options):
+        """提交任务,队列已满时等待;同一URL未完成时返回已有任务
+
+        weight 为下载时按比例分配带宽的权重
+        """
+        job = self.jobs.get(url)
+        if job is not None and not job.finished:
+            return job
+
+        job = EngineJob(url, priority, options, weight)
+        self.jobs[url] = job
+        self._busy()
+        self.core.metrics.start_job(url)
+
+        if self._stopping:
+            # 已经取消全部任务: 新提交的任务直接标记为已取消
+            job.cancelled = True
+            self.core.on_status(url, '已取消')
+            self._complete(job, CANCELLED)
+            return job
+
+        if self.core.is_done(url):
+            self.core.on_status(url, '已完成,跳过')
+            self._complete(job, SKIPPED, ok=True)
+            return job
+
+        await self._queues[EXTRACTING].put((-priority, next(self._seq), job))
+        return job
+
+    async def submit_playlist(self, url, priority=0, weight=1.0, probe=False, **options):
+        """平铺展开播放列表/频道,边展开边提交其中的视频,返回提交的数量
+
+        提取队列满时展开随之暂停,内存中只有正在处理的任务。
+        probe 为 True 时仅凭URL无法确定是播放列表,平铺提取后不是列表就按普通任务提交
+        """
+        self._busy()
+        if not probe:
+            self.core.on_status(url, '正在展开播放列表...')
+
+        def produce():
+            count = 0
+            ydl = self.core.session.checkout(FLAT_OPTS)
+            try:
+                try:
+                    info, depth = flat_extract(ydl, url)
+                except Exception:
+                    if not probe:
+                        raise
+                    # 提取失败时按普通任务提交,由完整提取报告错误并按重试策略处理
+                    return None
+                if probe and not is_playlist_info(info):
+                    return None
+                for entry_url in iter_playlist_entries(ydl, url, depth, info):
+                    if self._stopping:
+                        break
+                    asyncio.run_coroutine_threadsafe(
+                        self._submit_entry(url, entry_url, priority, weight, options), self._loop).result()
+                    count += 1
+            finally:
+                self.core.release(ydl)
+            return count
+
+        try:
+            count = await self._loop.run_in_executor(None, produce)
+            if count is None:
+                await self.submit(url, priority, weight, **options)
+                return 1
+            self.logger.info(f"播放列表 {url} 共提交 {count} 个视频")
+            self.core.on_status(url, f'已展开 {count} 个视频')
+            return count
+        except Exception as e:
+            self.logger.error(f"展开播放列表失败: {url} {e}")
+            self.core.on_error(url, f"展开播放列表失败: {e}")
+            self.failed_playlists.append(url)
+            return 0
+        finally:
+            self._done()
+
+    async def _submit_entry(self, playlist_url, url, priority, weight, options):
+        if self.on_playlist_entry is not None:
+            try:
+                self.on_playlist_entry(playlist_url, url)
+            except Exception as e:
+                self.logger.error(f"播放列表回调出错: {e}")
+        await self.submit(url, priority, weight, **options)
+
+    def cancel(self, url):
+        """取消任务;排队中的任务直接丢弃,正在下载的任务在下次进度回调时中断"""
+        job = self.jobs.get(url)
+        if job is None or job.finished:
+            return
+        job.cancelled = True
+        if job.retry_handle is not None:
+            # 正在等待重试: 直接结束
+            job.retry_handle.cancel()
+            job.retry_handle = None
+            self.core.on_status(url, '已取消')
+            self._complete(job, CANCELLED)
+            return
+        self.core.cancel(url)
+
+    def cancel_all(self):
+        """取消所有未完成的任务,停止展开播放列表,之后提交的任务直接取消"""
+        self._stopping = True
+        for url in list(self.jobs):
+            self.cancel(url)
+
+    async def join(self):
+        """等待所有已提交的任务结束"""
+        await self._idle.wait()
+
+    async def run(self, urls, priority=0):
+        """执行一批任务,返回成功的数量(播放列表按其中的视频计数)"""
+        await self.start()
+        try:
+            for url in urls:
+                if self._stopping:
+                    # 取消后剩下的链接不再展开、提取,直接标记为已取消
+                    await self.submit(url, priority)
+                    continue
+                playlist = False
+                if self.expand_playlists:
+                    playlist = await self._loop.run_in_executor(None, is_playlist_url, url)
+                if playlist is False:
+                    await self.submit(url, priority)
+                else:
+                    await self.submit_playlist(url, priority, probe=playlist is None)
+            await self.join()
+            if self.core.artifact_lane.stats()['pending']:
+                self.logger.info("等待附属文件完成...")
+                await self._loop.run_in_executor(None, self.core.artifact_lane.wait)
+        finally:
+            await self.close()
+        return sum(1 for job in self.jobs.values() if job.ok)
+
+    def total(self):
+        """本批的总数: 播放列表按展开得到的视频计数,展开失败的播放列表计为一个失败"""
+        return len(self.jobs) + len(self.failed_playlists)
+
+    def stats(self):
+        """各阶段的队列长度、任务数量和耗时统计(秒)"""
+        states = {}
+        for job in self.jobs.values():
+            states[job.state] = states.get(job.state, 0) + 1
+        timings = {}
+        for stage, timing in self._timings.items():
+            timings[stage] = {
+                'count': timing['count'],
+                'avg': round(timing['total'] / timing['count'], 3) if timing['count'] else 0.0,
+                'max': round(timing['max'], 3),
+            }
+        return {
+            'queued': {stage: queue.qsize() for stage, queue in self._queues.items()},
+            'states': states,
+            'timings': timings,
+            'session': self.core.session.stats(),
+            'bandwidth': self.core.bandwidth.stats(),
+            'fragments': self.core.fragments.stats(),
+            'breakers': self.retry.stats(),
+            'artifacts': self.core.artifact_lane.stats(),
+        }
+
+    async def _run_blocking(self, stage, func, *args, **kwargs):
+        """在指定阶段的线程池(或进程池)中执行阻塞调用"""
+        return await self._loop.run_in_executor(
+            self._executors[stage], functools.partial(func, *args, **kwargs))
+
+    @contextlib.contextmanager
+    def _timed(self, job, stage):
+        """记录任务在某阶段的耗时,并累计到阶段统计"""
+        job.state = stage
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            job.timings[stage] = job.timings.get(stage, 0) + elapsed
+            timing = self._timings.setdefault(stage, {'count': 0, 'total': 0.0, 'max': 0.0})
+            timing['count'] += 1
+            timing['total'] += elapsed
+            timing['max'] = max(timing['max'], elapsed)
+            self.core.metrics.add_phase(job.url, stage, elapsed)
+
+    async def _stage_worker(self, stage, handler):
+        """从阶段队列中取任务处理,handler 返回下一个阶段(没有则为None)"""
+        queue = self._queues[stage]
+        while True:
+            _, _, job = await queue.get()
+            try:
+                if job.cancelled:
+                    await self._fail(job, None)
+                    continue
+                next_stage = await handler(job)
+            except Exception as e:
+                # 报告失败时出错(下载器回调、重试策略等): 任务标记为失败,工作协程继续,join 不会一直等待
+                self.logger.exception(f"{job.url} 在{stage}阶段出错: {e}")
+                self._abort(job, e)
+                continue
+            finally:
+                queue.task_done()
+
+            # 下一阶段队列满时在这里等待,前面的阶段不会远远跑在后面阶段的前面
+            if next_stage is not None:
+                await self._queues[next_stage].put((-job.priority, next(self._seq), job))
+
+    async def _extract(self, job):
+        """提取阶段"""
+        self.core.metrics.add_phase(job.url, 'queued', time.monotonic() - job.submitted_at)
+        if not await self._wait_breakers(job):
+            await self._fail(job, None)
+            return None
+        with self._timed(job, EXTRACTING):
+            try:
+                job.ydl = await self._run_blocking(
+                    EXTRACTING, self.core.prepare, job.url, self.save_path, self.quality, **job.options)
+                job.info = await self._run_blocking(EXTRACTING, self.core.extract, job.ydl, job.url)
+                await self._run_blocking(EXTRACTING, self.core.check_space, job.info, self.save_path)
+            except Exception as e:
+                await self._fail(job, e)
+                return None
+        return TRANSFERRING
+
+    async def _transfer(self, job):
+        """下载阶段;需要后处理的任务交给后处理阶段,下载槽位立即释放"""
+        async with self._host_limit(job.host):
+            with self._timed(job, TRANSFERRING):
+                try:
+                    with self.core.bandwidth.job(job.url, job.weight) as usage:
+                        job.result = await self._run_blocking(
+                            TRANSFERRING, self.core.transfer, job.ydl, job.url, job.info)
+                    job.throughput = usage['throughput']
+                    self.logger.info(f"{job.url} 有效吞吐量: {job.throughput / 1024 / 1024:.2f}MB/s")
+                    specs = self.core.postprocess_specs(job.result, self.quality, self.artifacts)
+                    if specs:
+                        job.postprocess = (postprocess_params(job.ydl),
+                                           job.ydl.sanitize_info(job.result), specs)
+                        job.info = job.result = None
+                        self._close_ydl(job)
+                        return POSTPROCESSING
+                    ok = await self._run_blocking(
+                        TRANSFERRING, self.core.finish, job.url, job.result, self.save_path)
+                    self._usable(job, ok)
+                except Exception as e:
+                    await self._fail(job, e)
+                    return None
+        self._close_ydl(job)
+        self._complete(job, DONE if ok else FAILED, ok=bool(ok))
+        return None
+
+    async def _postprocess(self, job):
+        """后处理阶段: 在进程池中执行ffmpeg转换等CPU密集的工作"""
+        params, result, specs = job.postprocess
+        job.postprocess = None
+        self.core.on_status(job.url, '正在处理...')
+        with self._timed(job, POSTPROCESSING):
+            executor = self._executors[POSTPROCESSING]
+            try:
+                job.result, job.postprocess_report = await self._run_blocking(
+                    POSTPROCESSING, apply_postprocessors, params, result, specs)
+                self.core.report_postprocess(job.url, job.postprocess_report)
+                ok = await self._loop.run_in_executor(
+                    None, self.core.finish, job.url, job.result, self.save_path)
+                self._usable(job, ok)
+            except BrokenProcessPool as e:
+                # 本任务(和同时在处理的任务)失败,之后的任务使用新的进程池
+                self._renew_process_pool(executor)
+                await self._fail(job, e)
+                return None
+            except Exception as e:
+                await self._fail(job, e)
+                return None
+        self._complete(job, DONE if ok else FAILED, ok=bool(ok))
+        return None
+
+    async def _wait_breakers(self, job):
+        """熔断期间暂停开始新任务;等待中被取消时返回False"""
+        remaining = self.retry.pause_remaining()
+        if remaining <= 0:
+            return True
+        self.core.on_status(job.url, f'访问受限,{remaining:.0f}秒后继续...')
+        with self.core.metrics.phase(job.url, 'paused'):
+            while remaining > 0 and not job.cancelled:
+                await asyncio.sleep(min(remaining, 1.0))
+                remaining = self.retry.pause_remaining()
+        return not job.cancelled
+
+    def _usable(self, job, ok):
+        """视频文件已就位: 记录可用时间,附属文件交给后台通道"""
+        if ok:
+            job.time_to_file = time.monotonic() - job.submitted_at
+            self.core.complete(job.url, job.result, self.artifacts, self.quality)
+
+    def _host_limit(self, host):
+        semaphore = self._host_limits.get(host)
+        if semaphore is None:
+            semaphore = self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return semaphore
+
+    async def _fail(self, job, error):
+        """交给下载器报告错误;error 为None表示任务在排队时被取消"""
+        self._close_ydl(job)
+        if error is None:
+            self.core.on_status(job.url, '已取消')
+            self._complete(job, CANCELLED)
+            return
+        job.error = error
+        if not job.cancelled:
+            delay = self.retry.on_failure(error, job.attempts)
+            if delay is not None:
+                self._defer(job, error, delay)
+                return
+        await self._loop.run_in_executor(
+            None, functools.partial(self.core.fail, job.url, error, **job.options))
+        self._complete(job, CANCELLED if job.cancelled else FAILED)
+
+    def _defer(self, job, error, delay):
+        """任务延后 delay 秒重试,期间不占用工作协程"""
+        job.attempts += 1
+        job.state = RETRY_WAIT
+        job.info = job.result = job.postprocess = None
+        # 缓存的直链可能已失效
+        self.core.info_cache.invalidate(job.url)
+        self.core.metrics.record_retry(job.url)
+        self.logger.warning(f"{job.url} 失败({error_class(error)}),{delay:.0f}秒后第 "
+                            f"{job.attempts} 次重试: {error}")
+        self.core.on_status(
+            job.url, f'失败,{delay:.0f}秒后重试 ({job.attempts}/{self.retry.max_retries(error)})')
+        job.retry_handle = self._loop.call_later(delay, self._resubmit, job, delay)
+
+    def _resubmit(self, job, delay):
+        """等待结束,重新放入提取队列"""
+        job.retry_handle = None
+        self.core.metrics.add_phase(job.url, 'retry_wait', delay)
+        job.state = PENDING
+        job.error = None
+        job.submitted_at = time.monotonic()
+        task = self._loop.create_task(
+            self._queues[EXTRACTING].put((-job.priority, next(self._seq), job)))
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    def _abort(self, job, error):
+        """处理任务时意外出错: 不再重试,直接标记为失败"""
+        if job.done.done():
+            return
+        if job.retry_handle is not None:
+            job.retry_handle.cancel()
+            job.retry_handle = None
+        job.error = error
+        try:
+            self._close_ydl(job)
+        except Exception:
+            job.ydl = None
+        try:
+            self._complete(job, FAILED)
+        except Exception as e:
+            self.logger.error(f"结束任务出错: {job.url} {e}")
+            if not job.done.done():
+                job.done.set_result(False)
+                self._done()
+
+    def _close_ydl(self, job):
+        """把任务用的YoutubeDL归还给会话"""
+        if job.ydl is not None:
+            self.core.release(job.ydl)
+            job.ydl = None
+
+    def _complete(self, job, state, ok=False):
+        job.state = state
+        if state == DONE:
+            self.retry.on_success()
+        job.ok = ok
+        self.core.metrics.finish_job(job.url, state, job.error if state == FAILED else None)
+        # 信息字典可能很大,结束后不再保留
+        job.info = None
+        job.result = None
+        job.postprocess = None
+        self.core.clear_cancel(job.url)
+        if not job.done.done():
+            job.done.set_result(ok)
+        if self.on_job_done is not None:
+            try:
+                self.on_job_done(job)
+            except Exception as e:
+                self.logger.error(f"任务完成回调出错: {e}")
+        self._done()
+
+    def _busy(self):
+        """有新的任务或播放列表展开开始,join 需要等待"""
+        self._active += 1
+        self._idle.clear()
+
+    def _done(self):
+        self._active -= 1
+        if self._active == 0:
+            self._idle.set()
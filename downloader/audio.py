@@ -0,0 +1,142 @@
+import os
+
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+from yt_dlp.utils import PostProcessingError, prepend_extension, replace_extension
+
+# 表示"仅音频"的清晰度,下载器按音频模式处理(不合并、不转换视频容器)
+AUDIO = 'audio'
+AUDIO_FORMAT = 'bestaudio/best'
+
+# 本身就是音频容器的扩展名
+AUDIO_EXTS = ('m4a', 'mp3', 'opus', 'ogg', 'oga', 'flac', 'wav', 'aac', 'mka')
+# 容器 -> 可以直接复制(不重新编码)的音频编码
+CONTAINER_CODECS = {
+    'm4a': ('mp4a', 'aac', 'alac'),
+    'opus': ('opus',),
+    'ogg': ('opus', 'vorbis', 'flac'),
+    'webm': ('opus', 'vorbis'),
+    'mp3': ('mp3',),
+    'flac': ('flac',),
+}
+# 编码 -> 保留原编码时使用的容器
+NATIVE_EXTS = {'mp4a': 'm4a', 'aac': 'm4a', 'alac': 'm4a', 'opus': 'opus', 'vorbis': 'ogg',
+               'mp3': 'mp3', 'flac': 'flac'}
+# 需要重新编码时(响度标准化、容器不支持原编码)使用的 (编码器, 编码)
+ENCODERS = {'m4a': ('aac', 'aac'), 'aac': ('aac', 'aac'), 'opus': ('libopus', 'opus'),
+            'ogg': ('libopus', 'opus'), 'oga': ('libopus', 'opus'), 'webm': ('libopus', 'opus'),
+            'mp3': ('libmp3lame', 'mp3'), 'flac': ('flac', 'flac'), 'wav': ('pcm_s16le', 'pcm_s16le'),
+            'mka': ('libopus', 'opus')}
+# 无损编码,不指定码率
+LOSSLESS = ('flac', 'pcm_s16le')
+LOUDNORM = 'loudnorm=I=-16:TP=-1.5:LRA=11'
+BITRATE = '192k'
+
+
+def is_audio(quality):
+    """是否为音频模式,DownloadManager 界面上的"仅音频"也算"""
+    return quality in (AUDIO, '仅音频')
+
+
+def _codec(value):
+    if not value or value == 'none':
+        return None
+    return value.split('.')[0].lower()
+
+
+def audio_specs(info, artifacts=(), container=None, loudnorm=False, metadata=False):
+    """音频模式的后处理: 已经是音频文件且不需要处理时返回空列表(不启动ffmpeg)
+
+    container 为 None 时保留原来的容器,否则转成指定容器(能流复制就不重新编码);
+    响度标准化和写入元数据与转换容器在同一次ffmpeg中完成。附属文件中的
+    metadata 也在这一次中写入,见 audio_artifacts
+    """
+    metadata = metadata or 'metadata' in artifacts
+    audio_only = info.get('vcodec') == 'none' or info.get('ext') in AUDIO_EXTS
+    if audio_only and container in (None, info.get('ext')) and not loudnorm and not metadata:
+        return []
+    return [{'key': 'AudioFinalize', 'container': container, 'loudnorm': loudnorm, 'metadata': metadata}]
+
+
+def audio_artifacts(artifacts):
+    """音频模式交给附属文件通道的附属文件
+
+    元数据已经在音频的那一次ffmpeg中写入(见 audio_specs);嵌入缩略图要再重写
+    一遍音频文件,改为在音频旁边保存缩略图文件
+    """
+    names = []
+    for name in artifacts:
+        if name == 'metadata':
+            continue
+        if name == 'embed_thumbnail':
+            name = 'thumbnail'
+        if name not in names:
+            names.append(name)
+    return tuple(names)
+
+
+class AudioFinalizePP(FFmpegPostProcessor):
+    """一次ffmpeg完成: 去掉视频流、转换容器(尽量流复制)、响度标准化、写入元数据"""
+
+    def __init__(self, downloader=None, container=None, loudnorm=False, metadata=False):
+        super().__init__(downloader)
+        self.container = container
+        self.loudnorm = loudnorm
+        self.metadata = metadata
+
+    def _target_ext(self, info, codec):
+        if self.container:
+            return self.container
+        if info.get('vcodec') in (None, 'none') and info['ext'] in AUDIO_EXTS + ('webm',):
+            return info['ext']
+        # 视频文件(没有单独的音频格式时下载的)按音频编码选容器
+        return NATIVE_EXTS.get(codec, 'mka')
+
+    def _metadata_opts(self, info):
+        fields = {
+            'title': info.get('track') or info.get('title'),
+            'artist': info.get('artist') or info.get('creator') or info.get('uploader') or info.get('channel'),
+            'album': info.get('album') or info.get('playlist_title'),
+            'date': (info.get('release_date') or info.get('upload_date') or '')[:4] or None,
+            'comment': info.get('webpage_url'),
+        }
+        opts = []
+        for key, value in fields.items():
+            if value:
+                opts += ['-metadata', f'{key}={value}']
+        return opts
+
+    @FFmpegPostProcessor._restrict_to(images=False)
+    def run(self, info):
+        path = info['filepath']
+        codec = _codec(info.get('acodec')) or self.get_audio_codec(path)
+        if codec is None:
+            raise PostProcessingError('文件中没有音频流')
+        ext = self._target_ext(info, codec)
+        # 不在 CONTAINER_CODECS 中的容器(aac、wav、mka 等)按原编码流复制
+        encode = self.loudnorm or (ext in CONTAINER_CODECS and codec not in CONTAINER_CODECS[ext])
+
+        opts = ['-vn', '-map', '0:a:0']
+        if self.loudnorm:
+            opts += ['-af', LOUDNORM]
+        if encode:
+            encoder, codec = ENCODERS.get(ext, ENCODERS['mka'])
+            opts += ['-c:a', encoder]
+            if codec not in LOSSLESS:
+                opts += ['-b:a', BITRATE]
+        else:
+            opts += ['-c:a', 'copy']
+        if self.metadata:
+            opts += self._metadata_opts(info)
+        if ext == 'm4a':
+            opts += ['-movflags', '+faststart']
+
+        output = replace_extension(path, ext, info['ext'])
+        tmp_path = prepend_extension(output, 'temp')
+        self.to_screen(f'{"重新编码" if encode else "流复制"}音频到 {ext}: "{output}"')
+        self.run_ffmpeg(path, tmp_path, opts)
+        os.replace(tmp_path, output)
+        if output != path:
+            os.remove(path)
+
+        info.update(filepath=output, ext=ext, vcodec='none', acodec=codec)
+        return [], info
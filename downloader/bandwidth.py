@@ -0,0 +1,146 @@
+import time
+import threading
+import contextlib
+
+# 等待令牌时每次最多睡眠的时间(秒),以便及时响应限速调整和取消
+MAX_SLEEP = 0.25
+
+
+class _JobBucket:
+    """单个任务的令牌桶和流量统计"""
+    __slots__ = ('weight', 'tokens', 'last', 'started', 'bytes', 'offsets')
+
+    def __init__(self, weight):
+        self.weight = weight
+        self.tokens = 0.0
+        self.last = self.started = time.monotonic()
+        self.bytes = 0
+        # 文件名 -> 上次回调时的已下载字节数
+        self.offsets = {}
+
+
+class BandwidthScheduler:
+    """进程内共享的带宽调度器(令牌桶)
+
+    所有正在下载的任务从同一个总速率中按权重分配带宽:
+    任务的速率 = 总速率 × 权重 / 所有下载中任务的权重之和。
+    在 yt-dlp 的进度回调中调用 throttle,超出份额时在回调里等待,
+    从而限制下载线程(包括并发分片线程)的读取速度。
+    rate 为 None 表示不限速,此时只统计流量。
+    """
+
+    def __init__(self, rate=None, burst=1.0):
+        # 总速率(字节/秒)
+        self.rate = rate
+        # 令牌桶容量(秒),允许短时间内超出份额的量
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._jobs = {}  # url -> _JobBucket
+
+    def set_rate(self, rate):
+        """运行时调整总速率,None 或 0 表示不限速"""
+        with self._lock:
+            self.rate = rate or None
+
+    def register(self, url, weight=1.0):
+        """任务开始下载"""
+        with self._lock:
+            self._jobs[url] = _JobBucket(max(float(weight), 0.01))
+
+    @contextlib.contextmanager
+    def job(self, url, weight=1.0):
+        """下载期间登记任务,退出后 usage['throughput'] 为有效吞吐量(字节/秒)"""
+        usage = {}
+        self.register(url, weight)
+        try:
+            yield usage
+        finally:
+            usage['throughput'] = self.unregister(url)
+
+    def set_weight(self, url, weight):
+        """调整任务的权重"""
+        with self._lock:
+            bucket = self._jobs.get(url)
+            if bucket is not None:
+                bucket.weight = max(float(weight), 0.01)
+
+    def unregister(self, url):
+        """任务结束下载,返回其有效吞吐量(字节/秒)"""
+        with self._lock:
+            bucket = self._jobs.pop(url, None)
+        return self._throughput(bucket) if bucket is not None else 0.0
+
+    def throughput(self, url):
+        """任务从开始下载到现在的有效吞吐量(字节/秒)"""
+        bucket = self._jobs.get(url)
+        return self._throughput(bucket) if bucket is not None else 0.0
+
+    def _throughput(self, bucket):
+        elapsed = time.monotonic() - bucket.started
+        return bucket.bytes / elapsed if elapsed > 0 else 0.0
+
+    def _share(self, bucket):
+        """任务当前分到的速率,调用方需持有锁"""
+        total_weight = sum(job.weight for job in self._jobs.values())
+        return self.rate * bucket.weight / total_weight
+
+    def throttle(self, url, d, check=None):
+        """在进度回调中调用: 记录新下载的字节,超出份额时等待
+
+        check 在等待期间被反复调用,可以抛出异常中断等待(如任务已取消)
+        """
+        if d.get('status') != 'downloading':
+            return
+        with self._lock:
+            bucket = self._jobs.get(url)
+            if bucket is None:
+                return
+            # downloaded_bytes 是单个文件的累计值,合并下载时会换文件
+            filename = d.get('filename')
+            downloaded = d.get('downloaded_bytes') or 0
+            nbytes = max(0, downloaded - bucket.offsets.get(filename, 0))
+            bucket.offsets[filename] = downloaded
+            bucket.bytes += nbytes
+            if self.rate is None:
+                return
+            bucket.tokens -= nbytes
+
+        while True:
+            with self._lock:
+                if self.rate is None or url not in self._jobs:
+                    return
+                share = self._share(bucket)
+                now = time.monotonic()
+                bucket.tokens = min(bucket.tokens + share * (now - bucket.last), share * self.burst)
+                bucket.last = now
+                if bucket.tokens >= 0:
+                    return
+                wait = -bucket.tokens / share
+            if check is not None:
+                check()
+            time.sleep(min(wait, MAX_SLEEP))
+
+    def stats(self):
+        """各下载中任务的权重、分到的速率和有效吞吐量"""
+        with self._lock:
+            return {
+                url: {
+                    'weight': bucket.weight,
+                    'rate': self._share(bucket) if self.rate else None,
+                    'throughput': self._throughput(bucket),
+                }
+                for url, bucket in self._jobs.items()
+            }
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_bandwidth_scheduler():
+    """进程内所有下载共用的带宽调度器"""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = BandwidthScheduler()
+        return _default_scheduler
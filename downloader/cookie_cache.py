@@ -0,0 +1,109 @@
+import os
+import sys
+import glob
+import logging
+import threading
+import weakref
+
+# 各平台下浏览器的用户数据目录
+BROWSER_DIRS = {
+    'chrome': {
+        'linux': '~/.config/google-chrome',
+        'darwin': '~/Library/Application Support/Google/Chrome',
+        'win32': os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Google', 'Chrome', 'User Data'),
+    },
+    'chromium': {
+        'linux': '~/.config/chromium',
+        'darwin': '~/Library/Application Support/Chromium',
+        'win32': os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Chromium', 'User Data'),
+    },
+}
+
+
+class BrowserCookieCache:
+    """浏览器Cookie的共享缓存
+
+    从浏览器读取Cookie需要复制并解密整个Cookie数据库,耗时几百毫秒,
+    还会和正在运行的浏览器争用文件。这里只读取一次,之后只在数据库文件
+    的修改时间变化时重新读取;所有并发任务共用同一份Cookie,通过
+    apply 原地复制到各自 YoutubeDL 的 cookiejar 中
+    """
+
+    def __init__(self, browser='chrome', profile=None):
+        self.browser = browser
+        self.profile = profile
+        self.logger = logging.getLogger('youtube_downloader.cookie_cache')
+        self._lock = threading.Lock()
+        self._source = None
+        self._mtime = None
+        self._jar = None
+        self._version = 0
+        # 每个 YoutubeDL 上次复制的版本,未变化时不必再复制
+        self._applied = weakref.WeakKeyDictionary()
+
+    def _source_path(self):
+        """浏览器Cookie数据库的路径,找不到时返回None"""
+        if self._source and os.path.exists(self._source):
+            return self._source
+        platform = 'win32' if sys.platform.startswith(('win', 'cygwin')) else sys.platform
+        platform = 'linux' if platform.startswith('linux') else platform
+        browser_dir = BROWSER_DIRS.get(self.browser, {}).get(platform)
+        if not browser_dir:
+            return None
+        # 新版Chrome的Cookie数据库在 <配置>/Network/Cookies
+        root = os.path.expanduser(browser_dir)
+        profiles = [os.path.join(root, self.profile)] if self.profile else glob.glob(os.path.join(root, '*'))
+        candidates = [path for profile in profiles
+                      for path in (os.path.join(profile, 'Cookies'), os.path.join(profile, 'Network', 'Cookies'))
+                      if os.path.isfile(path)]
+        self._source = max(candidates, key=os.path.getmtime) if candidates else None
+        return self._source
+
+    def _mtime_of(self, path):
+        try:
+            return os.path.getmtime(path) if path else None
+        except OSError:
+            return None
+
+    def jar(self):
+        """当前的Cookie,数据库有变化时重新读取"""
+        from yt_dlp.cookies import extract_cookies_from_browser
+
+        with self._lock:
+            mtime = self._mtime_of(self._source_path())
+            if self._jar is not None and mtime == self._mtime:
+                return self._jar, self._version
+            try:
+                self._jar = extract_cookies_from_browser(self.browser, self.profile)
+                self.logger.info(f"已从 {self.browser} 读取 {len(self._jar)} 个Cookie")
+            except Exception as e:
+                # 读取失败时不带Cookie下载,数据库变化后再重试
+                self.logger.warning(f"读取浏览器Cookie失败: {e}")
+                self._jar = []
+            self._mtime = mtime
+            self._version += 1
+            return self._jar, self._version
+
+    def apply(self, ydl):
+        """把Cookie复制到 ydl.cookiejar 中(原地修改,不替换对象)"""
+        jar, version = self.jar()
+        if self._applied.get(ydl) == version:
+            return
+        target = ydl.cookiejar
+        target.clear()
+        for cookie in jar:
+            target.set_cookie(cookie)
+        self._applied[ydl] = version
+
+
+_default_caches = {}
+_default_caches_lock = threading.Lock()
+
+
+def get_cookie_cache(browser='chrome', profile=None):
+    """所有下载任务共用的浏览器Cookie缓存"""
+    with _default_caches_lock:
+        cache = _default_caches.get((browser, profile))
+        if cache is None:
+            cache = _default_caches[(browser, profile)] = BrowserCookieCache(browser, profile)
+        return cache
@@ -0,0 +1,645 @@
+import os
+import time
+import logging
+import functools
+
+import yt_dlp
+
+from .info_cache import get_info_cache, extract_info_cached
+from .log_setup import DEFAULT_LOG_FILE, setup_logging, ytdlp_logger
+from .job_journal import QUEUED, DOWNLOADING, FINISHED, FAILED
+from .progress_aggregator import ProgressAggregator
+from .metrics import MetricsCollector, error_class
+from .ytdl_session import YoutubeDLSession
+from .bandwidth import get_bandwidth_scheduler
+from .cookie_cache import get_cookie_cache
+from .download_archive import get_download_archive
+from .fragment_tuner import get_fragment_tuner, media_host
+from .retry_policy import inline_retry_sleep
+from .side_artifacts import ArtifactLane
+from .audio import AUDIO_FORMAT, is_audio, audio_specs, audio_artifacts
+from .staging import work_dir, check_free_space, move_to_save_path, InsufficientSpaceError
+from .postprocess import (apply_postprocessors, postprocess_params, downloaded_info,
+                          final_files, plan_container)
+
+
+def _noop(*args):
+    pass
+
+
+class JobError(Exception):
+    """下载任务失败,错误信息可以直接展示给用户"""
+
+
+class DownloaderCore:
+    """不依赖Qt的下载器基类
+
+    进度、状态、错误通过普通回调函数通知,GUI 把回调接到 Qt 信号上,
+    命令行等无界面的场景可以直接使用
+    on_progress(url, 进度), on_status(url, 状态), on_error(url, 错误信息),
+    on_stats(url, 速度(字节/秒), 文件大小(字节))
+
+    一次下载分为几个阶段,调度器可以分别在不同的线程池中执行:
+    prepare(构造YoutubeDL) → extract(提取信息) → transfer(下载)
+    → postprocess(ffmpeg转换等) → finish(校验结果);任一阶段抛出的
+    异常交给 fail 处理。download 按顺序同步执行全部阶段。
+    """
+
+    # 视频文件就位后在后台补上的附属文件(见 side_artifacts.ARTIFACTS),可以按批次覆盖
+    artifacts = ()
+
+    def __init__(self, on_progress=None, on_status=None, on_error=None, on_stats=None,
+                 staging_dir=None, audio_options=None):
+        self.on_progress = on_progress or _noop
+        self.on_status = on_status or _noop
+        self.on_error = on_error or _noop
+        self.on_stats = on_stats or _noop
+
+        # 暂存目录(如本地SSD): 下载、合并、转换都在这里进行,完成后才移到保存目录;
+        # None 表示直接在保存目录中下载
+        self.staging_dir = staging_dir
+
+        # 音频模式的后处理选项(见 audio.audio_specs): container 输出容器(None 保留原容器),
+        # loudnorm 响度标准化, metadata 写入标题等元数据
+        self.audio_options = dict(audio_options or {})
+
+        # 视频信息缓存,重复的URL不必再次请求提取器
+        self.info_cache = get_info_cache()
+
+        # 下载存档,按视频ID记录已下载的视频和最终文件
+        self.archive = get_download_archive()
+
+        # 进度事件合并后以10Hz发送,避免每个数据块都发一次回调
+        self.aggregator = ProgressAggregator(self._emit_progress, interval=0.1)
+
+        # 所有任务共用的带宽调度器
+        self.bandwidth = get_bandwidth_scheduler()
+
+        # 各阶段耗时、流量、重试和错误统计
+        self.metrics = MetricsCollector()
+
+        # 复用的YoutubeDL实例,保留连接和提取器状态
+        self.session = YoutubeDLSession()
+
+        # 按主机自适应的分片并发数
+        self.fragments = get_fragment_tuner()
+
+        # 缩略图、信息JSON等附属文件的后台通道
+        self.artifact_lane = ArtifactLane(self.session, self.metrics)
+
+        # 已取消的任务,进度回调中检查并中断下载
+        self._cancelled = set()
+
+    def _emit_progress(self, updates):
+        """发送合并后的进度事件"""
+        for url, fields in updates:
+            if 'progress' in fields:
+                self.on_progress(url, fields['progress'])
+            if 'status' in fields:
+                self.on_status(url, fields['status'])
+            if 'speed' in fields or 'total_bytes' in fields:
+                self.on_stats(url, float(fields.get('speed', 0)), float(fields.get('total_bytes', 0)))
+
+    def cancel(self, url):
+        """取消任务,正在下载的任务会在下一次进度回调时中断"""
+        self._cancelled.add(url)
+
+    def clear_cancel(self, url):
+        """任务结束后清除取消标记,同一URL之后可以重新下载"""
+        self._cancelled.discard(url)
+
+    def _check_cancelled(self, url):
+        if url in self._cancelled:
+            raise yt_dlp.utils.DownloadCancelled(f"下载已取消: {url}")
+
+    def _track_transfer(self, url, d):
+        """记录流量指标,并按带宽调度器分到的速率限速(等待期间仍然响应取消)"""
+        self.metrics.record_progress(url, d)
+        self.bandwidth.throttle(url, d, check=lambda: self._check_cancelled(url))
+
+    def _postprocessor_hook(self, url, d):
+        """统计 yt-dlp 内部后处理(合并、移动文件等)的耗时"""
+        phase = f"pp:{d.get('postprocessor')}"
+        if d['status'] == 'started':
+            self.metrics.mark(url, phase)
+        elif d['status'] == 'finished':
+            self.metrics.end(url, phase)
+
+    def job_options(self, url):
+        """每个任务单独的 YoutubeDL 选项: 进度回调、后处理回调和日志(yt-dlp 的输出经日志队列写出)"""
+        return {
+            'progress_hooks': [functools.partial(self._progress_hook, url)],
+            'postprocessor_hooks': [functools.partial(self._postprocessor_hook, url)],
+            'logger': ytdlp_logger.for_job(url, on_retry=lambda: self.metrics.record_retry(url)),
+        }
+
+    def is_done(self, url):
+        """任务此前是否已经完成,已完成的任务可以直接跳过(不请求提取器)"""
+        return self.archive.contains(url)
+
+    def archive_result(self, url, result):
+        """把最终文件记入下载存档,返回文件路径;没有找到文件时返回空列表"""
+        files = final_files(result)
+        if files:
+            self.archive.add(url, result, files)
+        return files
+
+    def work_dir(self, save_path):
+        """下载过程中文件所在的目录(暂存目录或保存目录)"""
+        return work_dir(self.staging_dir, save_path)
+
+    def check_space(self, info, save_path):
+        """开始下载前按估计的文件大小检查剩余空间"""
+        try:
+            check_free_space(info, self.work_dir(save_path), save_path)
+        except InsufficientSpaceError as e:
+            self.logger.error(str(e))
+            raise JobError(str(e))
+
+    def finalize(self, result, save_path):
+        """使用暂存目录时,把最终文件移到保存目录(同一文件系统上为原子的 rename)"""
+        if self.staging_dir:
+            move_to_save_path(result, save_path)
+        return result
+
+    def complete(self, url, result, artifacts=None, quality=None):
+        """视频文件已经就位: 记录可用时间,附属文件交给后台通道"""
+        self.metrics.record_usable(url)
+        artifacts = self.artifacts if artifacts is None else artifacts
+        if is_audio(quality):
+            artifacts = audio_artifacts(artifacts)
+        if artifacts:
+            self.artifact_lane.submit(url, yt_dlp.YoutubeDL.sanitize_info(result), artifacts)
+
+    def release(self, ydl):
+        """任务结束后把 prepare 得到的 YoutubeDL 归还给会话"""
+        self.session.release(ydl)
+
+    def extract(self, ydl, url):
+        """提取视频信息(优先使用缓存)"""
+        self._check_cancelled(url)
+        self.on_status(url, '正在获取视频信息...')
+        info = extract_info_cached(ydl, url, self.info_cache)
+        if not info:
+            raise JobError('无法获取视频信息')
+        self.logger.info(f"视频标题: {info.get('title')}")
+        return info
+
+    def transfer(self, ydl, url, info):
+        """下载: 直接复用已提取的信息,避免 ydl.download 重新提取一遍"""
+        self._check_cancelled(url)
+        self.on_status(url, '开始下载...')
+        # 到第一个数据块为止的时间(含 sleep_interval 等待和建立连接)
+        self.metrics.mark(url, 'startup')
+        host = media_host(info)
+        if host is None:
+            return ydl.process_ie_result(info, download=True)
+
+        # 分片下载: 使用该主机当前的并发数,结束后根据吞吐量和重试调整
+        concurrency = self.fragments.concurrency(host)
+        ydl.params['concurrent_fragment_downloads'] = concurrency
+        before = self.metrics.job_stats(url)
+        started = time.monotonic()
+        try:
+            result = ydl.process_ie_result(info, download=True)
+        except yt_dlp.utils.DownloadCancelled:
+            raise
+        except Exception as e:
+            self.fragments.report(host, concurrency, 0, 0, error=error_class(e))
+            raise
+        elapsed = time.monotonic() - started
+        after = self.metrics.job_stats(url)
+        # 去掉启动等待(sleep_interval 等),只算实际下载的时间
+        startup = after['phases'].get('startup', 0.0) - before['phases'].get('startup', 0.0)
+        self.fragments.report(host, concurrency, after['bytes'] - before['bytes'],
+                              elapsed - startup, retries=after['retries'] - before['retries'])
+        return result
+
+    def postprocess_specs(self, result, quality=None, artifacts=None):
+        """下载完成后需要执行的后处理,格式同 YoutubeDL 的 postprocessors 选项
+
+        音频模式不做任何视频处理,只在需要时用一次ffmpeg转换容器、写入元数据
+        (包括附属文件中的 metadata)
+        """
+        if is_audio(quality):
+            artifacts = self.artifacts if artifacts is None else artifacts
+            return audio_specs(downloaded_info(result)[0], artifacts, **self.audio_options)
+        return []
+
+    def postprocess(self, ydl, url, result, quality=None, artifacts=None):
+        """在当前线程中执行后处理"""
+        specs = self.postprocess_specs(result, quality, artifacts)
+        if not specs:
+            return result
+        self.on_status(url, '正在处理...')
+        result, report = apply_postprocessors(
+            postprocess_params(ydl), ydl.sanitize_info(result), specs)
+        self.report_postprocess(url, report)
+        return result
+
+    def report_postprocess(self, url, report):
+        """记录后处理的耗时和处理前后占用的磁盘空间"""
+        steps = ', '.join(f"{step['key']} {step['elapsed']:.1f}秒" for step in report['steps'])
+        self.logger.info(
+            f"后处理完成: {url} 耗时 {report['elapsed']:.1f}秒 ({steps}), "
+            f"文件大小 {report['bytes_before'] / 1024 / 1024:.1f}MB -> "
+            f"{report['bytes_after'] / 1024 / 1024:.1f}MB")
+        for step in report['steps']:
+            self.metrics.add_phase(url, f"pp:{step['key']}", step['elapsed'])
+
+    def download(self, url, save_path, quality='best', artifacts=None, **options):
+        """同步执行全部阶段,返回是否成功
+
+        artifacts 为需要的附属文件,None 表示使用默认设置;附属文件在返回后由后台通道生成
+        """
+        self.metrics.start_job(url)
+        if self.is_done(url):
+            self.on_status(url, '已完成,跳过')
+            self.metrics.finish_job(url, 'skipped')
+            return True
+        ydl = None
+        try:
+            with self.metrics.phase(url, 'extracting'):
+                ydl = self.prepare(url, save_path, quality, **options)
+                info = self.extract(ydl, url)
+                self.check_space(info, save_path)
+            with self.metrics.phase(url, 'transferring'), self.bandwidth.job(url) as usage:
+                result = self.transfer(ydl, url, info)
+            self.logger.info(f"有效吞吐量: {usage['throughput'] / 1024 / 1024:.2f}MB/s")
+            with self.metrics.phase(url, 'postprocessing'):
+                result = self.postprocess(ydl, url, result, quality, artifacts)
+                ok = self.finish(url, result, save_path)
+            if ok:
+                self.complete(url, result, artifacts, quality)
+            self.metrics.finish_job(url, 'done' if ok else 'failed')
+            return ok
+        except Exception as e:
+            cancelled = isinstance(e, yt_dlp.utils.DownloadCancelled)
+            self.metrics.finish_job(url, 'cancelled' if cancelled else 'failed', None if cancelled else e)
+            return self.fail(url, e, **options)
+        finally:
+            if ydl is not None:
+                self.release(ydl)
+            self.clear_cancel(url)
+
+
+class SimpleDownloaderCore(DownloaderCore):
+    """SimpleDownloader 的下载逻辑"""
+
+    def __init__(self, journal=None, **callbacks):
+        super().__init__(**callbacks)
+
+        # 任务记录(可选),用于崩溃后恢复和断点续传
+        self.journal = journal
+
+        # 日志只配置一次,程序入口已经配置过时这里不做任何事
+        setup_logging()
+        self.logger = logging.getLogger('simple_downloader')
+
+    def _progress_hook(self, url, d):
+        """下载进度回调
+
+        url 由每个任务单独绑定,并发下载时进度不会串到其他任务上
+        """
+        self._check_cancelled(url)
+        self._track_transfer(url, d)
+
+        if self.journal is not None and d['status'] in ('downloading', 'finished'):
+            self.journal.record_progress(url, d)
+
+        if d['status'] == 'downloading':
+            try:
+                downloaded = d.get('downloaded_bytes', 0)
+                total = d.get('total_bytes', 0) or d.get('total_bytes_estimate', 0)
+
+                if total > 0:
+                    progress = (downloaded / total) * 100
+
+                    # 显示下载速度
+                    status = None
+                    speed = d.get('speed', 0)
+                    if speed:
+                        speed_mb = speed / 1024 / 1024
+                        status = f'正在下载... {speed_mb:.1f}MB/s'
+                    self.aggregator.update(url, progress=progress, status=status,
+                                           speed=speed, total_bytes=total)
+
+            except Exception as e:
+                self.logger.error(f"进度计算错误: {e}")
+
+        elif d['status'] == 'finished':
+            self.aggregator.flush(url)
+            self.on_status(url, '下载完成')
+
+        elif d['status'] == 'error':
+            self.aggregator.flush(url)
+            self.on_error(url, str(d.get('error', '未知错误')))
+
+    def is_done(self, url):
+        """下载存档或任务记录中已完成且文件仍在"""
+        return super().is_done(url) or (self.journal is not None and self.journal.is_finished(url))
+
+    def prepare(self, url, save_path, quality='best'):
+        """创建保存目录并构造 YoutubeDL"""
+        self.logger.info(f"开始下载: {url}")
+        if self.journal is not None:
+            self.journal.mark(url, DOWNLOADING)
+
+        # 确保保存路径存在
+        os.makedirs(save_path, exist_ok=True)
+
+        # 基本下载选项
+        ydl_opts = {
+            'format': AUDIO_FORMAT if is_audio(quality) else quality,
+            'outtmpl': os.path.join(self.work_dir(save_path), '%(title)s.%(ext)s'),
+            **self.job_options(url),
+            'quiet': True,
+            'no_warnings': True,
+            # 播放列表由调度器展开成单个视频,一个任务只下载一个视频
+            'noplaylist': True,
+            # 基本的重试选项
+            'retries': 3,
+            'fragment_retries': 3,
+            # 保留 .part 文件,重新开始时用HTTP Range续传
+            'continuedl': True,
+            'nopart': False,
+            # 基本的请求头
+            'http_headers': {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            },
+        }
+        return self.session.checkout(ydl_opts)
+
+    def finish(self, url, result, save_path):
+        """移到保存目录,验证文件并记入下载存档"""
+        files = self.archive_result(url, self.finalize(result, save_path))
+        if not files:
+            self.logger.error(f"文件未找到: {url}")
+            raise JobError("下载完成但文件未找到")
+        size = os.path.getsize(files[0])
+        self.logger.info(f"下载完成: {files[0]} ({size/1024/1024:.1f}MB)")
+        if self.journal is not None:
+            self.journal.mark(url, FINISHED, output_path=files[0])
+        return True
+
+    def fail(self, url, error):
+        """报告失败,返回False"""
+        self.aggregator.flush(url)
+        if isinstance(error, yt_dlp.utils.DownloadCancelled):
+            self.logger.info(f"下载已取消: {url}")
+            self.on_status(url, '已取消')
+            if self.journal is not None:
+                self.journal.mark(url, QUEUED)
+            return False
+
+        if isinstance(error, yt_dlp.utils.DownloadError):
+            # 缓存的直链可能已失效,下次重试时重新提取
+            self.info_cache.invalidate(url)
+            error_msg = str(error)
+            self.logger.error(f"下载错误: {error_msg}")
+            self.on_error(url, f"下载失败: {error_msg}")
+        else:
+            error_msg = str(error)
+            self.logger.error(f"发生错误: {error_msg}")
+            self.on_error(url, f"发生错误: {error_msg}")
+        if self.journal is not None:
+            self.journal.mark(url, FAILED, error=error_msg)
+        return False
+
+
+class DownloadManagerCore(DownloaderCore):
+    """DownloadManager 的下载逻辑"""
+
+    # 保存视频信息,写入元数据,嵌入缩略图
+    artifacts = ('infojson', 'embed_thumbnail', 'metadata')
+
+    def __init__(self, **callbacks):
+        super().__init__(**callbacks)
+        self.ydl_opts = None
+
+        # 共享的浏览器Cookie
+        self.cookies = get_cookie_cache('chrome')
+
+        # 日志只配置一次,程序入口已经配置过时这里不做任何事
+        setup_logging(log_file=DEFAULT_LOG_FILE)
+        self.logger = logging.getLogger('youtube_downloader')
+
+    def _progress_hook(self, url, d):
+        """下载进度回调"""
+        self._check_cancelled(url)
+        self._track_transfer(url, d)
+
+        if d['status'] == 'downloading':
+            try:
+                # 计算下载进度
+                if 'total_bytes' in d:
+                    progress = (d['downloaded_bytes'] / d['total_bytes']) * 100
+                elif 'total_bytes_estimate' in d:
+                    progress = (d['downloaded_bytes'] / d['total_bytes_estimate']) * 100
+                else:
+                    downloaded = d.get('downloaded_bytes', 0)
+                    total = d.get('total_bytes_estimate', 100)
+                    progress = (downloaded / total) * 100 if total > 0 else 0
+
+                # 更新状态信息
+                status = None
+                speed = d.get('speed', 0)
+                if speed:
+                    speed_mb = speed / 1024 / 1024  # 转换为MB/s
+                    status = f'正在下载... {speed_mb:.1f}MB/s'
+
+                # 合并后定时发送,不在每个数据块上发信号和写日志
+                total = d.get('total_bytes') or d.get('total_bytes_estimate')
+                self.aggregator.update(url, progress=progress, status=status,
+                                       speed=speed, total_bytes=total)
+
+            except Exception as e:
+                self.on_error(url, f"进度计算错误: {str(e)}")
+
+        elif d['status'] == 'finished':
+            filename = d.get('filename', '')
+            self.logger.info(f"文件下载完成: {filename}")
+            self.aggregator.flush(url)
+            self.on_status(url, '下载完成,正在处理...')
+
+        elif d['status'] == 'error':
+            error = d.get('error', '未知错误')
+            self.logger.error(f"下载错误: {error}")
+            self.aggregator.flush(url)
+            self.on_error(url, str(error))
+
+    def prepare(self, url, save_path, quality='best', proxy=None):
+        """检查保存目录并构造 YoutubeDL"""
+        self.logger.info(f"开始下载视频: {url}")
+
+        # 确保保存路径存在
+        save_path = os.path.abspath(save_path)
+        if not os.path.exists(save_path):
+            try:
+                os.makedirs(save_path)
+                self.logger.info(f"创建保存目录: {save_path}")
+            except Exception as e:
+                self.logger.error(f"创建目录失败: {str(e)}")
+                raise JobError(f"创建保存目录失败: {str(e)}")
+
+        # 检查路径权限
+        if not os.access(save_path, os.W_OK):
+            self.logger.error(f"没有写入权限: {save_path}")
+            raise JobError(f"没有写入权限: {save_path}")
+
+        # 简化质量选择
+        if quality in ['1080p', '720p', '480p', '360p']:
+            height = quality[:-1]  # 移除'p'
+            format_str = f'bestvideo[height<={height}][ext=mp4]+bestaudio[ext=m4a]/best[height<={height}]'
+        elif is_audio(quality):
+            # 最好的音频流,保留原来的容器,不合并、不转成mp4
+            format_str = AUDIO_FORMAT
+        else:  # 最高质量
+            format_str = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best'
+
+        # 设置下载选项
+        ydl_opts = {
+            'format': format_str,
+            'outtmpl': os.path.join(self.work_dir(save_path), '%(title)s.%(ext)s'),
+            **self.job_options(url),
+            # 音频模式不合并、不转成mp4
+            'merge_output_format': None if is_audio(quality) else 'mp4',
+            'quiet': False,
+            'no_warnings': False,
+            'verbose': True,  # 添加详细输出
+            'ignoreerrors': False,
+            'nocheckcertificate': True,
+            'noplaylist': True,
+            'extract_flat': False,
+            # 视频信息和缩略图不在这里写,见 artifacts
+            # 内部只做少量快速重试,再失败的任务由调度器延后重试(见 RetryPolicy),
+            # 不在下载线程里长时间等待
+            'extractor_retries': 2,
+            'retries': 3,
+            'fragment_retries': 5,
+            'retry_sleep_functions': {'http': inline_retry_sleep, 'fragment': inline_retry_sleep,
+                                      'extractor': inline_retry_sleep},
+            'skip_unavailable_fragments': True,
+            'rm_cachedir': True,
+            'no_color': True,  # 禁用颜色输出
+            # 添加请求头
+            'http_headers': {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.5',
+                'Accept-Encoding': 'gzip, deflate, br',
+                'Connection': 'keep-alive',
+                'Upgrade-Insecure-Requests': '1',
+                'Sec-Fetch-Dest': 'document',
+                'Sec-Fetch-Mode': 'navigate',
+                'Sec-Fetch-Site': 'none',
+                'Sec-Fetch-User': '?1',
+            },
+            # 分片并发数按主机自适应,见 FragmentTuner;缓冲区大小由yt-dlp按速度调整
+            'file_access_retries': 2,
+            'throttledratelimit': None,
+            'socket_timeout': 60,
+            # ffmpeg设置
+            'prefer_ffmpeg': True,
+            'ffmpeg_location': None,
+            # 合并/转换后删除中间文件,磁盘上只留最终的mp4
+            'keepvideo': False,
+            # 后处理不在下载线程中执行,见 postprocess_specs
+        }
+
+        # 如果提供了代理,添加代理设置
+        if proxy:
+            if proxy.startswith('http://') or proxy.startswith('https://'):
+                ydl_opts['proxy'] = proxy
+            else:
+                ydl_opts['proxy'] = f'http://{proxy}'
+            self.logger.info(f"使用代理: {ydl_opts['proxy']}")
+
+        self.ydl_opts = ydl_opts
+        ydl = self.session.checkout(ydl_opts)
+        # Chrome的Cookie只读取一次,所有任务共用(代替每个视频的 cookiesfrombrowser)
+        self.cookies.apply(ydl)
+        return ydl
+
+    def extract(self, ydl, url):
+        """提取视频信息"""
+        self.logger.info("获取视频信息...")
+        info = super().extract(ydl, url)
+        self.logger.info(f"视频格式: {ydl.params.get('format')}")
+        self.logger.debug(f"可用格式: {len(info.get('formats') or [])} 个")
+        return info
+
+    def postprocess_specs(self, result, quality=None, artifacts=None):
+        """转成mp4(能remux就不重新编码);元数据和缩略图在附属文件通道中处理"""
+        if is_audio(quality):
+            return super().postprocess_specs(result, quality, artifacts)
+        return plan_container(downloaded_info(result)[0], 'mp4')
+
+    def finish(self, url, result, save_path):
+        """把后处理得到的文件移到保存目录,验证并记入下载存档"""
+        files = self.archive_result(url, self.finalize(result, save_path))
+        if not files:
+            self.logger.error(f"文件未找到: {url}")
+            raise JobError("下载完成但文件未找到,可能是格式转换失败")
+        self.logger.info(f"文件已成功保存: {files[0]}")
+        file_size = os.path.getsize(files[0])
+        self.logger.info(f"文件大小: {file_size / 1024 / 1024:.2f}MB")
+        return True
+
+    def fail(self, url, error, proxy=None):
+        """把错误转换成用户能看懂的提示,返回False"""
+        self.aggregator.flush(url)
+        if isinstance(error, yt_dlp.utils.DownloadCancelled):
+            self.logger.info(f"下载已取消: {url}")
+            self.on_status(url, '已取消')
+        elif isinstance(error, JobError):
+            self.on_error(url, str(error))
+        elif isinstance(error, yt_dlp.utils.DownloadError):
+            # 缓存的直链可能已失效,下次重试时重新提取
+            self.info_cache.invalidate(url)
+            error_msg = str(error)
+            self.logger.error(f"下载错误: {error_msg}")
+            # 与调度器的重试和熔断使用同样的错误分类
+            cls = error_class(error)
+            if cls == 'http_403':
+                if proxy:
+                    self.on_error(url, f"使用代理 {proxy} 访问被拒绝(403错误),请尝试:\n1. 检查代理是否可用\n2. 尝试使用其他代理\n3. 等待一段时间后重试")
+                else:
+                    self.on_error(url, "访问被拒绝(403错误),请尝试:\n1. 检查网络连接\n2. 使用代理\n3. 等待一段时间后重试")
+            elif cls == 'age_gate':
+                self.on_error(url, "需要年龄验证,请在Chrome浏览器中登录YouTube账号后重试")
+            elif 'This video is unavailable' in error_msg:
+                self.on_error(url, "视频不可用,可能已被删除或设为私有")
+            elif cls == 'unavailable':
+                self.on_error(url, "视频不可用,请检查链接是否正确")
+            else:
+                self.on_error(url, f"下载失败: {error_msg}")
+        else:
+            self.logger.error(f"发生错误: {str(error)}")
+            self.on_error(url, f"发生错误: {str(error)}")
+        return False
+
+    def download_video(self, url, save_path, quality='best', proxy=None, artifacts=None):
+        """下载单个视频"""
+        return self.download(url, save_path, quality, artifacts, proxy=proxy)
+
+    def get_available_formats(self, url):
+        """获取可用的视频格式"""
+        ydl = self.session.checkout({'quiet': True})
+        try:
+            info = extract_info_cached(ydl, url, self.info_cache)
+            formats = []
+            for f in info['formats']:
+                if 'height' in f and 'ext' in f:
+                    formats.append({
+                        'format_id': f['format_id'],
+                        'ext': f['ext'],
+                        'height': f['height'],
+                        'filesize': f.get('filesize', 'N/A')
+                    })
+            return formats
+        except Exception as e:
+            self.logger.error(f"获取格式失败: {str(e)}")
+            return []
+        finally:
+            self.release(ydl)
@@ -0,0 +1,85 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from .utils import app_data_dir, open_sqlite, canonical_id, info_id
+
+
+class DownloadArchive:
+    """下载存档: 按规范视频ID(提取器+视频ID)记录已下载的视频和最终文件
+
+    与yt-dlp的 --download-archive 使用相同的ID格式,但保存在带索引的
+    SQLite中,并记录后处理后的实际文件路径。判断是否已下载时只需要URL,
+    不必请求提取器,也不必按标题猜文件名或遍历保存目录
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(app_data_dir(), 'archive.sqlite3')
+        self.logger = logging.getLogger('youtube_downloader.download_archive')
+        self._lock = threading.Lock()
+        self._conn = open_sqlite(self.path)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS archive ('
+                ' video_id TEXT PRIMARY KEY,'
+                ' url TEXT,'
+                ' title TEXT,'
+                ' filepath TEXT NOT NULL,'
+                ' files TEXT NOT NULL,'
+                ' finished_at REAL NOT NULL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS archive_url ON archive (url)')
+
+    def _key(self, url):
+        """URL能识别出视频ID时按ID查询,否则按URL查询"""
+        video_id = canonical_id(url)
+        if video_id:
+            return 'video_id', video_id
+        return 'url', url
+
+    def get(self, url):
+        """查询某个URL的存档记录,不存在时返回None"""
+        column, value = self._key(url)
+        with self._lock:
+            cursor = self._conn.execute(f'SELECT * FROM archive WHERE {column} = ?', (value,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            record = dict(zip([c[0] for c in cursor.description], row))
+        record['files'] = json.loads(record['files'])
+        return record
+
+    def contains(self, url):
+        """是否已下载过,且最终文件仍然存在"""
+        record = self.get(url)
+        return bool(record and os.path.exists(record['filepath']))
+
+    def add(self, url, info, files):
+        """记录下载完成的视频,files 为最终文件路径(第一个为主文件)"""
+        video_id = info_id(info) or canonical_id(url) or url
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO archive (video_id, url, title, filepath, files, finished_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (video_id, url, info.get('title'), files[0],
+                 json.dumps(files, ensure_ascii=False), time.time()))
+
+    def remove(self, url):
+        """删除存档记录,之后可以重新下载"""
+        column, value = self._key(url)
+        with self._lock, self._conn:
+            self._conn.execute(f'DELETE FROM archive WHERE {column} = ?', (value,))
+
+
+_default_archive = None
+_default_archive_lock = threading.Lock()
+
+
+def get_download_archive():
+    """所有下载入口共用的存档实例"""
+    global _default_archive
+    with _default_archive_lock:
+        if _default_archive is None:
+            _default_archive = DownloadArchive()
+        return _default_archive
@@ -1,41 +1,61 @@
+import os
+import time
+import asyncio
 from PyQt5.QtCore import QThread, pyqtSignal
 from .simple_downloader import SimpleDownloader
+from .async_engine import AsyncDownloadEngine
+from .utils import app_data_dir
+
+# 数据目录中保留的批次明细(batches/<时间>.json)个数
+KEEP_BATCHES = 50
 
 class DownloadWorker(QThread):
     # 定义信号
     progress_updated = pyqtSignal(str, float)  # URL, 进度
     status_updated = pyqtSignal(str, str)  # URL, 状态
     error_occurred = pyqtSignal(str, str)  # URL, 错误信息
+    stats_updated = pyqtSignal(str, float, float)  # URL, 速度(字节/秒), 文件大小(字节)
+    entry_added = pyqtSignal(str, str)  # 播放列表URL, 展开得到的视频URL
     download_finished = pyqtSignal()  # 所有下载完成信号
     
-    def __init__(self, urls, save_path, quality='best'):
+    def __init__(self, urls, save_path, quality='best', max_workers=3, per_host_limit=2,
+                 journal=None, staging_dir=None, audio_options=None):
         super().__init__()
         self.urls = urls
         self.save_path = save_path
         self.quality = quality
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
         self.is_running = True
         
+        # 本轮下载结果,下载结束后供界面展示
+        self.success_count = 0
+        self.total_count = len(urls)
+        
+        # 任务记录(可选): 跳过已完成的任务,未完成的断点续传
+        self.journal = journal
+        
         # 创建下载器
-        self.downloader = SimpleDownloader()
+        # staging_dir 为暂存目录(可选),下载完成后才移到保存路径;audio_options 为音频模式的选项
+        self.downloader = SimpleDownloader(journal=journal, staging_dir=staging_dir,
+                                           audio_options=audio_options)
+        
+        # 直接转发下载器的信号,不再经过Python槽函数二次发送
+        self.downloader.progress_signal.connect(self.progress_updated)
+        self.downloader.status_signal.connect(self.status_updated)
+        self.downloader.error_signal.connect(self.error_occurred)
+        self.downloader.stats_signal.connect(self.stats_updated)
         
-        # 连接信号
-        self.downloader.progress_signal.connect(self._on_progress)
-        self.downloader.status_signal.connect(self._on_status)
-        self.downloader.error_signal.connect(self._on_error)
+        # 调度器在本线程的事件循环中运行
+        self.engine = None
+        self._loop = None
     
     def run(self):
         """开始下载任务"""
         try:
-            success_count = 0
-            total_count = len(self.urls)
-            
-            for url in self.urls:
-                if not self.is_running:
-                    break
-                
-                self.status_updated.emit(url, '准备下载...')
-                if self.downloader.download(url, self.save_path, self.quality):
-                    success_count += 1
+            self.success_count = success_count = asyncio.run(self._run_engine())
+            self.total_count = total_count = self.engine.total()
+            self.write_metrics()
             
             if success_count == total_count:
                 self.status_updated.emit('', f'全部下载完成 ({success_count}/{total_count})')
@@ -47,18 +67,43 @@ class DownloadWorker(QThread):
         except Exception as e:
             self.error_occurred.emit('general', str(e))
     
-    def stop(self):
-        """停止下载"""
-        self.is_running = False
-    
-    def _on_progress(self, url, progress):
-        """处理进度更新"""
-        self.progress_updated.emit(url, progress)
+    async def _run_engine(self):
+        """在事件循环中执行整批任务"""
+        self.engine = AsyncDownloadEngine(
+            self.downloader.core, self.save_path, self.quality,
+            transfer_workers=self.max_workers, per_host_limit=self.per_host_limit,
+            on_playlist_entry=self.entry_added.emit,
+        )
+        self._loop = asyncio.get_running_loop()
+        # 事件循环启动前就请求了停止: stop 当时无法通知调度器,这里补上
+        if not self.is_running:
+            self.engine.cancel_all()
+        try:
+            return await self.engine.run(self.urls)
+        finally:
+            self._loop = None
     
-    def _on_status(self, url, status):
-        """处理状态更新"""
-        self.status_updated.emit(url, status)
+    def write_metrics(self):
+        """把本批任务的指标写到数据目录: metrics.prom(累计)和 batches/<时间>.json(明细)
+
+        明细只保留最近 KEEP_BATCHES 批,界面中运行很多小批次时目录不会一直增长
+        """
+        metrics = self.downloader.core.metrics
+        try:
+            metrics.write_textfile(os.path.join(app_data_dir(), 'metrics.prom'))
+            batches = os.path.join(app_data_dir(), 'batches')
+            batch_name = time.strftime('%Y%m%d-%H%M%S') + '.json'
+            metrics.write_summary(os.path.join(batches, batch_name))
+            # 文件名以时间开头,按名字排序就是按时间排序
+            names = sorted(name for name in os.listdir(batches) if name.endswith('.json'))
+            for name in names[:-KEEP_BATCHES]:
+                os.remove(os.path.join(batches, name))
+        except OSError as e:
+            self.downloader.core.logger.warning(f"写入指标失败: {e}")
     
-    def _on_error(self, url, error):
-        """处理错误"""
-        self.error_occurred.emit(url, error) 
\ No newline at end of file
+    def stop(self):
+        """停止下载;调度器还没启动时先记下,启动后立即取消"""
+        self.is_running = False
+        loop, engine = self._loop, self.engine
+        if loop is not None and engine is not None:
+            loop.call_soon_threadsafe(engine.cancel_all)
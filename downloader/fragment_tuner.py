@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import logging
+import threading
+from urllib.parse import urlparse
+
+from .utils import app_data_dir, open_sqlite
+
+# 按分片下载、受 concurrent_fragment_downloads 影响的协议
+FRAGMENTED_PROTOCOLS = ('m3u8_native', 'http_dash_segments', 'http_dash_segments_generator')
+
+# 下载量太小或用时太短的任务,吞吐量主要取决于延迟,不用来调整
+MIN_SAMPLE_BYTES = 2 * 1024 * 1024
+MIN_SAMPLE_SECONDS = 0.5
+
+# 吞吐量至少提高这么多才认为增加并发有效
+GAIN = 1.1
+
+# 每隔多少个无错误的任务,放宽一次出错后设置的上限并重新试探
+PROBE_INTERVAL = 8
+
+
+def media_host(info):
+    """分片下载的媒体主机,不是分片下载时返回None
+
+    CDN 的镜像主机名各不相同(如 rr3---sn-xxx.googlevideo.com),
+    按最后两级域名归为同一主机;IP地址带上端口
+    """
+    for f in info.get('requested_formats') or [info]:
+        if f.get('protocol') not in FRAGMENTED_PROTOCOLS and not f.get('fragments'):
+            continue
+        url = f.get('fragment_base_url') or f.get('manifest_url') or f.get('url')
+        if not url:
+            continue
+        parsed = urlparse(url)
+        host = parsed.hostname or ''
+        if any(c.isalpha() for c in host):
+            return '.'.join(host.split('.')[-2:])
+        return f'{host}:{parsed.port}' if parsed.port else host
+    return None
+
+
+class FragmentTuner:
+    """按主机自适应调整分片并发数(concurrent_fragment_downloads)
+
+    每个任务结束后根据去掉启动等待后的吞吐量和重试次数调整下一个任务的并发数:
+    开始时每次翻倍(慢启动),吞吐量不再明显提高时回到吞吐量最高的并发数并停在
+    那里,每 PROBE_INTERVAL 个无错误的任务再加1试探一次;出现重试、403等错误时
+    减半,并把上限设为出错时的并发数减1,之后每 PROBE_INTERVAL 个无错误的任务
+    放宽一次上限。
+    yt-dlp 在开始下载一个文件时就确定了分片线程数,所以调整发生在任务之间。
+    各主机的状态保存在SQLite中,下次启动直接从上次的设置开始
+    """
+
+    def __init__(self, path=None, minimum=1, maximum=16, initial=4):
+        self.path = path or os.path.join(app_data_dir(), 'fragment_tuner.sqlite3')
+        self.minimum = minimum
+        self.maximum = maximum
+        self.initial = max(minimum, min(initial, maximum))
+        self.logger = logging.getLogger('youtube_downloader.fragment_tuner')
+        self._lock = threading.Lock()
+        self._hosts = {}  # 主机 -> 状态
+        self._conn = open_sqlite(self.path)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS hosts ('
+                ' host TEXT PRIMARY KEY,'
+                ' state TEXT NOT NULL,'
+                ' updated_at REAL NOT NULL)')
+
+    def _state(self, host):
+        """主机的状态,调用方需持有锁"""
+        state = self._hosts.get(host)
+        if state is None:
+            row = self._conn.execute('SELECT state FROM hosts WHERE host = ?', (host,)).fetchone()
+            state = json.loads(row[0]) if row else {}
+            state.setdefault('concurrency', self.initial)
+            state.setdefault('limit', self.maximum)
+            state.setdefault('slow_start', True)
+            state.setdefault('settled', False)
+            state.setdefault('clean', 0)
+            # 并发数 -> 吞吐量(字节/秒,指数滑动平均);JSON的键是字符串
+            state['rates'] = {int(k): v for k, v in state.get('rates', {}).items()}
+            self._hosts[host] = state
+        state['concurrency'] = max(self.minimum, min(state['concurrency'], state['limit'], self.maximum))
+        return state
+
+    def concurrency(self, host):
+        """下一个任务使用的分片并发数"""
+        with self._lock:
+            return self._state(host)['concurrency']
+
+    def report(self, host, concurrency, nbytes, elapsed, retries=0, error=None):
+        """任务结束后报告结果: 下载字节数、下载耗时(秒)、重试次数和错误分类"""
+        with self._lock:
+            state = self._state(host)
+            previous = state['concurrency']
+            if error is not None or retries:
+                # 乘性减小,出错的并发数以上暂时不再尝试
+                state['limit'] = max(self.minimum, concurrency - 1)
+                state['concurrency'] = max(self.minimum, concurrency // 2)
+                state['slow_start'] = False
+                state['settled'] = False
+                state['clean'] = 0
+                reason = f"错误 {error}" if error is not None else f"重试 {retries} 次"
+            elif nbytes < MIN_SAMPLE_BYTES or elapsed < MIN_SAMPLE_SECONDS:
+                return
+            else:
+                rate = nbytes / elapsed
+                rates = state['rates']
+                rates[concurrency] = rate if concurrency not in rates else 0.5 * rates[concurrency] + 0.5 * rate
+                lower = max((c for c in rates if c < concurrency), default=None)
+                state['clean'] += 1
+                if state['clean'] % PROBE_INTERVAL == 0 and state['limit'] < self.maximum:
+                    state['limit'] += 1
+                if lower is not None and rates[concurrency] < rates[lower] * GAIN:
+                    # 增加并发没有带来提升: 回到吞吐量最高的并发数并停在那里
+                    state['slow_start'] = False
+                    state['settled'] = True
+                    state['concurrency'] = max(rates, key=rates.get)
+                elif state['settled'] and state['clean'] % PROBE_INTERVAL:
+                    state['concurrency'] = concurrency
+                else:
+                    # 慢启动阶段翻倍,之后加性增加;稳定后每隔一段时间试探一次
+                    state['settled'] = False
+                    state['concurrency'] = concurrency * 2 if state['slow_start'] else concurrency + 1
+                reason = f"吞吐量 {rate / 1024 / 1024:.2f}MB/s"
+            state['concurrency'] = max(self.minimum, min(state['concurrency'], state['limit'], self.maximum))
+            if state['concurrency'] != previous:
+                self.logger.info(f"{host} 分片并发数 {previous} -> {state['concurrency']} ({reason})")
+            with self._conn:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO hosts (host, state, updated_at) VALUES (?, ?, ?)',
+                    (host, json.dumps(state), time.time()))
+
+    def stats(self):
+        """各主机当前的并发数、上限和各并发数下的吞吐量"""
+        with self._lock:
+            return {
+                host: {
+                    'concurrency': state['concurrency'],
+                    'limit': state['limit'],
+                    'rates': {c: round(rate, 1) for c, rate in sorted(state['rates'].items())},
+                }
+                for host, state in self._hosts.items()
+            }
+
+    def reset(self, host=None):
+        """清除某个主机(默认全部)学到的设置"""
+        with self._lock, self._conn:
+            if host is None:
+                self._hosts = {}
+                self._conn.execute('DELETE FROM hosts')
+            else:
+                self._hosts.pop(host, None)
+                self._conn.execute('DELETE FROM hosts WHERE host = ?', (host,))
+
+
+_default_tuner = None
+_default_tuner_lock = threading.Lock()
+
+
+def get_fragment_tuner():
+    """进程内所有下载共用的分片并发调整器"""
+    global _default_tuner
+    with _default_tuner_lock:
+        if _default_tuner is None:
+            _default_tuner = FragmentTuner()
+        return _default_tuner
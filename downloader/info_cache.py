@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import zlib
+import logging
+import threading
+
+from .utils import app_data_dir, open_sqlite, canonical_id, info_id
+
+# 缓存中不需要的字段: 字幕/热度图体积大且下载时用不到,下载结果每次都会重新计算
+TRIM_KEYS = ('automatic_captions', 'subtitles', 'heatmap', 'requested_formats',
+             'requested_downloads', 'requested_subtitles', 'filepath', '__files_to_move')
+
+
+class InfoCache:
+    """按规范视频ID缓存已提取的视频信息(SQLite存储,带TTL和LRU淘汰)
+
+    视频直链一般几个小时后失效,所以TTL默认只有1小时
+    """
+
+    def __init__(self, path=None, ttl=3600, max_bytes=64 * 1024 * 1024):
+        self.path = path or os.path.join(app_data_dir(), 'info_cache.sqlite3')
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger('youtube_downloader.info_cache')
+        self._lock = threading.Lock()
+        self._conn = open_sqlite(self.path)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS info ('
+                ' key TEXT PRIMARY KEY,'
+                ' data BLOB NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS info_accessed ON info (accessed_at)')
+
+    def get(self, url):
+        """查询缓存,未命中或已过期时返回None"""
+        key = canonical_id(url)
+        if not key:
+            return None
+
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT data, created_at FROM info WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            data, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute('DELETE FROM info WHERE key = ?', (key,))
+                return None
+            self._conn.execute('UPDATE info SET accessed_at = ? WHERE key = ?', (now, key))
+
+        self.logger.debug(f"命中信息缓存: {key}")
+        return json.loads(zlib.decompress(data))
+
+    def put(self, ydl, info):
+        """写入缓存,info 为 extract_info 返回的视频信息"""
+        key = info_id(info)
+        if not key or info.get('_type', 'video') != 'video':
+            return
+
+        trimmed = {k: v for k, v in ydl.sanitize_info(info).items() if k not in TRIM_KEYS}
+        data = zlib.compress(json.dumps(trimmed, ensure_ascii=False).encode('utf-8'))
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO info (key, data, size, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)', (key, data, len(data), now, now))
+            self._evict()
+
+    def invalidate(self, url):
+        """删除某个URL的缓存(如直链已失效)"""
+        key = canonical_id(url)
+        if key:
+            with self._lock, self._conn:
+                self._conn.execute('DELETE FROM info WHERE key = ?', (key,))
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM info')
+
+    def _evict(self):
+        """超出容量时按最近访问时间淘汰,调用方需持有锁"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM info').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute('SELECT key, size FROM info ORDER BY accessed_at').fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM info WHERE key = ?', (key,))
+            total -= size
+
+
+def extract_info_cached(ydl, url, cache=None):
+    """先查缓存,未命中时再调用提取器,并把结果写回缓存"""
+    if cache is not None:
+        info = cache.get(url)
+        if info:
+            return info
+
+    info = ydl.extract_info(url, download=False)
+    if info and cache is not None:
+        try:
+            cache.put(ydl, info)
+        except Exception as e:
+            logging.getLogger('youtube_downloader.info_cache').warning(f"写入信息缓存失败: {e}")
+    return info
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_info_cache():
+    """所有下载入口共用的缓存实例"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = InfoCache()
+        return _default_cache
@@ -0,0 +1,117 @@
+import os
+import time
+import logging
+import threading
+
+from .utils import app_data_dir, open_sqlite
+
+# 任务状态
+QUEUED = 'queued'
+DOWNLOADING = 'downloading'
+FINISHED = 'finished'
+FAILED = 'failed'
+
+
+class JobJournal:
+    """持久化的下载任务记录
+
+    每个URL记录状态、输出文件和 .part 进度,程序崩溃或关闭后重启时
+    可以跳过已完成的任务,未完成的任务借助 .part 文件断点续传
+    """
+
+    def __init__(self, path=None, progress_interval=1.0):
+        self.path = path or os.path.join(app_data_dir(), 'jobs.sqlite3')
+        # 进度写入的最小间隔(秒),避免每个数据块都写一次数据库
+        self.progress_interval = progress_interval
+        self.logger = logging.getLogger('youtube_downloader.job_journal')
+        self._lock = threading.Lock()
+        self._last_write = {}
+        self._conn = open_sqlite(self.path)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' url TEXT PRIMARY KEY,'
+                ' position INTEGER NOT NULL,'
+                ' state TEXT NOT NULL,'
+                ' output_path TEXT,'
+                ' part_path TEXT,'
+                ' downloaded_bytes INTEGER NOT NULL DEFAULT 0,'
+                ' total_bytes INTEGER NOT NULL DEFAULT 0,'
+                ' error TEXT,'
+                ' updated_at REAL NOT NULL)')
+
+    def add(self, url):
+        """加入队列,已存在的任务保持原状态"""
+        with self._lock, self._conn:
+            position = self._conn.execute(
+                'SELECT COALESCE(MAX(position), 0) + 1 FROM jobs').fetchone()[0]
+            self._conn.execute(
+                'INSERT OR IGNORE INTO jobs (url, position, state, updated_at) VALUES (?, ?, ?, ?)',
+                (url, position, QUEUED, time.time()))
+
+    def remove(self, url):
+        """从队列中删除"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM jobs WHERE url = ?', (url,))
+        self._last_write.pop(url, None)
+
+    def get(self, url):
+        """查询单个任务,不存在时返回None"""
+        with self._lock:
+            cursor = self._conn.execute('SELECT * FROM jobs WHERE url = ?', (url,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([c[0] for c in cursor.description], row))
+
+    def jobs(self, include_finished=True):
+        """按加入顺序列出所有任务"""
+        sql = 'SELECT * FROM jobs'
+        if not include_finished:
+            sql += f" WHERE state != '{FINISHED}'"
+        with self._lock:
+            cursor = self._conn.execute(sql + ' ORDER BY position')
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def is_finished(self, url):
+        """任务已完成且输出文件仍然存在"""
+        job = self.get(url)
+        return bool(job and job['state'] == FINISHED
+                    and job['output_path'] and os.path.exists(job['output_path']))
+
+    def mark(self, url, state, output_path=None, error=None):
+        """更新任务状态"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE jobs SET state = ?, output_path = COALESCE(?, output_path),'
+                ' error = ?, updated_at = ? WHERE url = ?',
+                (state, output_path, error, time.time(), url))
+        if state != DOWNLOADING:
+            self._last_write.pop(url, None)
+
+    def record_progress(self, url, d):
+        """记录 yt-dlp 进度回调中的 .part 文件和已下载字节数(按间隔节流)"""
+        now = time.monotonic()
+        if d.get('status') == 'downloading' and now - self._last_write.get(url, 0) < self.progress_interval:
+            return
+        self._last_write[url] = now
+
+        total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE jobs SET part_path = COALESCE(?, part_path), output_path = COALESCE(?, output_path),'
+                ' downloaded_bytes = ?, total_bytes = ?, updated_at = ? WHERE url = ?',
+                (d.get('tmpfilename'), d.get('filename'), int(d.get('downloaded_bytes') or 0),
+                 int(total), time.time(), url))
+
+    def reset_interrupted(self):
+        """把上次运行中断的任务放回队列,返回其中可以断点续传的数量"""
+        resumable = 0
+        for job in self.jobs(include_finished=False):
+            if job['state'] != DOWNLOADING:
+                continue
+            if job['part_path'] and os.path.exists(job['part_path']):
+                resumable += 1
+            self.mark(job['url'], QUEUED)
+        return resumable
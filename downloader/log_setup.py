@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+
+# 下载器使用的顶层日志记录器,子记录器(youtube_downloader.engine 等)自动包含在内
+LOGGERS = ('youtube_downloader', 'simple_downloader')
+
+# LogRecord 自带的属性,其余属性(extra 传入的字段)会写进JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# 默认的日志文件
+DEFAULT_LOG_FILE = os.path.join(os.path.expanduser("~"), "Downloads", "youtube_downloader.log")
+
+_lock = threading.Lock()
+_listener = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+
+    def format(self, record):
+        data = {
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """限制高频日志: 同一来源每秒最多 rate 条,超出的丢弃
+
+    来源默认是产生日志的代码位置,也可以通过 extra={'sample_key': ...} 指定;
+    WARNING 及以上的日志不受限制。被丢弃的条数记在下一条放行日志的
+    suppressed 字段中
+    """
+
+    def __init__(self, rate=5.0, burst=10):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets = {}  # 来源 -> [令牌, 上次时间, 丢弃条数]
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = getattr(record, 'sample_key', None) or (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class YtDlpLogger:
+    """传给 YoutubeDL 的 logger 参数,把 yt-dlp 的输出转到日志队列
+
+    [download] 进度行每个数据块都会输出一次,按行首标签限流。
+    for_job 得到绑定到某个任务的实例: 日志带上url,遇到重试时调用 on_retry
+    """
+
+    def __init__(self, name='youtube_downloader.ytdlp', url=None, on_retry=None):
+        self.logger = logging.getLogger(name)
+        self.url = url
+        self.on_retry = on_retry
+
+    def for_job(self, url, on_retry=None):
+        return YtDlpLogger(self.logger.name, url, on_retry)
+
+    def _log(self, level, msg):
+        sample_key = msg.split(' ', 1)[0] if msg.startswith('[') else None
+        extra = {'sample_key': sample_key}
+        if self.url is not None:
+            extra['url'] = self.url
+        self.logger.log(level, msg, extra=extra)
+        # 分片的重试经 to_screen 以调试级别输出,所以不看级别
+        if self.on_retry is not None and '. Retrying' in msg:
+            self.on_retry()
+
+    def debug(self, msg):
+        self._log(logging.DEBUG, msg)
+
+    def info(self, msg):
+        self._log(logging.INFO, msg)
+
+    def warning(self, msg):
+        self._log(logging.WARNING, msg)
+
+    def error(self, msg):
+        self._log(logging.ERROR, msg)
+
+
+ytdlp_logger = YtDlpLogger()
+
+
+def setup_logging(log_file=None, level=logging.DEBUG, console=True, rate=5.0):
+    """配置日志(只在第一次调用时生效)
+
+    下载线程只把日志放进队列,格式化和写文件在 QueueListener 的后台线程中
+    进行;输出为JSON Lines。log_file 为None时只输出到控制台(标准错误)
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        formatter = JsonLinesFormatter()
+        handlers = []
+        if console:
+            handlers.append(logging.StreamHandler())
+        if log_file:
+            os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+            handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(RateLimitFilter(rate=rate))
+        for name in LOGGERS:
+            logger = logging.getLogger(name)
+            logger.setLevel(level)
+            logger.addHandler(queue_handler)
+            logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(
+            queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
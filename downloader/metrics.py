@@ -0,0 +1,303 @@
+import os
+import re
+import json
+import time
+import threading
+import contextlib
+
+# 阶段耗时直方图的分桶上限(秒)
+BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _error_chain(error):
+    """依次产生异常链中的异常(yt-dlp 的 DownloadError 把原始异常放在 exc_info 中)"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        exc_info = getattr(error, 'exc_info', None)
+        error = (exc_info[1] if exc_info else None) or getattr(error, 'cause', None) or error.__cause__
+
+
+def http_status(error):
+    """异常链中HTTP错误的状态码,没有时按错误信息中的 "HTTP Error xxx" 判断,都没有时返回None"""
+    for e in _error_chain(error):
+        status = getattr(e, 'status', None) or getattr(e, 'code', None)
+        if isinstance(status, int):
+            return status
+    # 只认HTTP状态码,视频ID、字节数、链接中的数字不算
+    match = re.search(r'HTTP Error (\d{3})\b', str(error))
+    return int(match.group(1)) if match else None
+
+
+def expected_error(error):
+    """异常链中 yt-dlp 认为是预期内的提取错误(不支持的链接、私享视频、格式不可用等),没有时返回None"""
+    for e in _error_chain(error):
+        if getattr(e, 'expected', False):
+            return e
+    return None
+
+
+def error_class(error):
+    """把异常归类,便于统计: 403 / 年龄验证 / 视频不可用 / 其他4xx / 预期内的提取错误 / 异常类名"""
+    if error is None:
+        return None
+    message = str(error)
+    status = http_status(error)
+    if status == 403:
+        return 'http_403'
+    if 'Sign in to confirm your age' in message:
+        return 'age_gate'
+    if 'unavailable' in message:
+        return 'unavailable'
+    # 超时(408)和限流(429)之外的4xx说明请求本身有问题,如 http_404
+    if status is not None and 400 <= status < 500 and status not in (408, 429):
+        return f'http_{status}'
+    expected = expected_error(error)
+    if expected is not None:
+        return type(expected).__name__
+    return type(error).__name__
+
+
+class JobMetrics:
+    """单个任务的指标"""
+    __slots__ = ('url', 'started_at', 'finished_at', 'state', 'error_class', 'phases',
+                 'bytes', 'files', 'peak_speed', 'retries', 'usable_at', '_marks')
+
+    def __init__(self, url):
+        self.url = url
+        self.started_at = time.time()
+        self.finished_at = None
+        self.state = None
+        self.error_class = None
+        # 阶段 -> 耗时(秒),同一阶段多次出现时累加
+        self.phases = {}
+        self.bytes = 0
+        # 文件名 -> 已下载字节数(合并下载时有多个文件)
+        self.files = {}
+        self.peak_speed = 0.0
+        self.retries = 0
+        # 视频文件就位(可以使用)的时间,附属文件可能还在后台生成
+        self.usable_at = None
+        # 进行中的阶段的开始时间
+        self._marks = {}
+
+    @property
+    def avg_speed(self):
+        """下载阶段的平均速度(字节/秒)"""
+        elapsed = self.phases.get('transferring')
+        return self.bytes / elapsed if elapsed else 0.0
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'state': self.state,
+            'error_class': self.error_class,
+            'started_at': round(self.started_at, 3),
+            'elapsed': round((self.finished_at or time.time()) - self.started_at, 3),
+            'phases': {phase: round(elapsed, 3) for phase, elapsed in self.phases.items()},
+            'bytes': self.bytes,
+            'avg_speed': round(self.avg_speed, 1),
+            'peak_speed': round(self.peak_speed, 1),
+            'retries': self.retries,
+            'time_to_file': round(self.usable_at - self.started_at, 3) if self.usable_at else None,
+        }
+
+
+class MetricsCollector:
+    """收集每个任务各阶段的耗时、流量、重试和错误
+
+    阶段包括 queued(排队)、extracting、startup(开始下载到收到第一个数据块,
+    含 sleep_interval 等待)、transferring、postprocessing,以及每个后处理
+    pp:<名称>(合并、转换、嵌入缩略图等),延后重试时还有 retry_wait(等待重试)
+    和 paused(熔断暂停)。累计值可以导出为 Prometheus
+    textfile,每批任务的明细可以导出为JSON
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}  # url -> JobMetrics,当前批次
+        # 累计值,导出给 Prometheus,不随批次清空
+        self._phase_totals = {}  # 阶段 -> [次数, 总耗时, 最大值, 各分桶计数]
+        self._states = {}
+        self._errors = {}
+        self._bytes = 0
+        self._retries = 0
+
+    def _job(self, url):
+        job = self._jobs.get(url)
+        if job is None:
+            job = self._jobs[url] = JobMetrics(url)
+        return job
+
+    def start_job(self, url):
+        """任务开始(重新提交的任务重新计数)"""
+        with self._lock:
+            self._jobs[url] = JobMetrics(url)
+
+    def add_phase(self, url, phase, elapsed):
+        """记录某个阶段的耗时"""
+        with self._lock:
+            job = self._job(url)
+            job.phases[phase] = job.phases.get(phase, 0.0) + elapsed
+            totals = self._phase_totals.get(phase)
+            if totals is None:
+                totals = self._phase_totals[phase] = [0, 0.0, 0.0, [0] * len(BUCKETS)]
+            totals[0] += 1
+            totals[1] += elapsed
+            totals[2] = max(totals[2], elapsed)
+            for i, bound in enumerate(BUCKETS):
+                if elapsed <= bound:
+                    totals[3][i] += 1
+
+    @contextlib.contextmanager
+    def phase(self, url, phase):
+        """统计 with 块的耗时"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_phase(url, phase, time.monotonic() - started)
+
+    def mark(self, url, phase):
+        """标记阶段开始,end 时记录耗时"""
+        with self._lock:
+            self._job(url)._marks[phase] = time.monotonic()
+
+    def end(self, url, phase):
+        """结束 mark 开始的阶段,没有对应的开始时忽略"""
+        with self._lock:
+            started = self._job(url)._marks.pop(phase, None)
+        if started is not None:
+            self.add_phase(url, phase, time.monotonic() - started)
+
+    def record_progress(self, url, d):
+        """在进度回调中调用: 记录字节数和峰值速度"""
+        if d.get('status') != 'downloading':
+            return
+        with self._lock:
+            job = self._job(url)
+            started = job._marks.pop('startup', None)
+            downloaded = d.get('downloaded_bytes') or 0
+            previous = job.files.get(d.get('filename'), 0)
+            if downloaded > previous:
+                job.files[d.get('filename')] = downloaded
+                job.bytes += downloaded - previous
+                self._bytes += downloaded - previous
+            job.peak_speed = max(job.peak_speed, d.get('speed') or 0.0)
+        if started is not None:
+            self.add_phase(url, 'startup', time.monotonic() - started)
+
+    def record_retry(self, url):
+        """记录一次重试"""
+        with self._lock:
+            self._job(url).retries += 1
+            self._retries += 1
+
+    def record_usable(self, url):
+        """视频文件已经就位"""
+        with self._lock:
+            self._job(url).usable_at = time.time()
+
+    def job_stats(self, url):
+        """任务当前的下载字节数、重试次数和各阶段耗时"""
+        with self._lock:
+            job = self._job(url)
+            return {'bytes': job.bytes, 'retries': job.retries, 'phases': dict(job.phases)}
+
+    def finish_job(self, url, state, error=None):
+        """任务结束"""
+        with self._lock:
+            job = self._job(url)
+            job.state = state
+            job.error_class = error_class(error)
+            job.finished_at = time.time()
+            self._states[state] = self._states.get(state, 0) + 1
+            if job.error_class:
+                self._errors[job.error_class] = self._errors.get(job.error_class, 0) + 1
+
+    def summary(self):
+        """当前批次的汇总和每个任务的明细"""
+        with self._lock:
+            jobs = [job.to_dict() for job in self._jobs.values()]
+        phases = {}
+        for job in jobs:
+            for phase, elapsed in job['phases'].items():
+                stat = phases.setdefault(phase, {'count': 0, 'total': 0.0, 'max': 0.0})
+                stat['count'] += 1
+                stat['total'] += elapsed
+                stat['max'] = max(stat['max'], elapsed)
+        for stat in phases.values():
+            stat['avg'] = round(stat['total'] / stat['count'], 3)
+            stat['total'] = round(stat['total'], 3)
+        states, errors = {}, {}
+        for job in jobs:
+            states[job['state']] = states.get(job['state'], 0) + 1
+            if job['error_class']:
+                errors[job['error_class']] = errors.get(job['error_class'], 0) + 1
+        usable = [job['time_to_file'] for job in jobs if job['time_to_file'] is not None]
+        return {
+            'jobs': len(jobs),
+            # 从任务开始到视频文件可用的时间(秒)
+            'time_to_file': {
+                'avg': round(sum(usable) / len(usable), 3),
+                'max': max(usable),
+            } if usable else None,
+            'states': states,
+            'errors': errors,
+            'bytes': sum(job['bytes'] for job in jobs),
+            'retries': sum(job['retries'] for job in jobs),
+            # 按总耗时从大到小,第一个就是瓶颈
+            'phases': dict(sorted(phases.items(), key=lambda item: -item[1]['total'])),
+            'items': jobs,
+        }
+
+    def reset_batch(self):
+        """开始新的一批任务,清空明细(累计值保留)"""
+        with self._lock:
+            self._jobs = {}
+
+    def write_summary(self, path):
+        """把当前批次的汇总写成JSON文件"""
+        _atomic_write(path, json.dumps(self.summary(), ensure_ascii=False, indent=2))
+
+    def prometheus_text(self):
+        """累计值,Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            lines.append('# HELP ytdl_phase_seconds 任务各阶段耗时')
+            lines.append('# TYPE ytdl_phase_seconds histogram')
+            for phase, (count, total, _, buckets) in sorted(self._phase_totals.items()):
+                for bound, bucket_count in zip(BUCKETS, buckets):
+                    lines.append(f'ytdl_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {bucket_count}')
+                lines.append(f'ytdl_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {count}')
+                lines.append(f'ytdl_phase_seconds_sum{{phase="{phase}"}} {total:.6f}')
+                lines.append(f'ytdl_phase_seconds_count{{phase="{phase}"}} {count}')
+            lines.append('# TYPE ytdl_phase_seconds_max gauge')
+            for phase, (_, _, maximum, _) in sorted(self._phase_totals.items()):
+                lines.append(f'ytdl_phase_seconds_max{{phase="{phase}"}} {maximum:.6f}')
+            lines.append('# TYPE ytdl_jobs_total counter')
+            for state, count in sorted(self._states.items()):
+                lines.append(f'ytdl_jobs_total{{state="{state}"}} {count}')
+            lines.append('# TYPE ytdl_errors_total counter')
+            for cls, count in sorted(self._errors.items()):
+                lines.append(f'ytdl_errors_total{{class="{cls}"}} {count}')
+            lines.append('# TYPE ytdl_downloaded_bytes_total counter')
+            lines.append(f'ytdl_downloaded_bytes_total {self._bytes}')
+            lines.append('# TYPE ytdl_retries_total counter')
+            lines.append(f'ytdl_retries_total {self._retries}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """写 Prometheus textfile(供 node_exporter 的 textfile 收集器读取)"""
+        _atomic_write(path, self.prometheus_text())
+
+
+def _atomic_write(path, text):
+    """先写临时文件再替换,读取方不会看到写了一半的文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
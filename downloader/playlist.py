@@ -0,0 +1,85 @@
+import functools
+
+# 展开播放列表只需要每个视频的链接,不提取视频信息
+FLAT_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': 'in_playlist',
+    'lazy_playlist': True,
+}
+
+# 提取器只能说"可能是视频也可能是列表"(is_single_video 返回 None)时,按下面的名单判断:
+#   youtube:tab 匹配的播放列表(playlist?list=)、频道(@handle、/channel/)及其标签页,
+#   以及带 list= 的 watch 链接,都按播放列表展开
+PLAYLIST_EXTRACTORS = ('YoutubeTab',)
+# 通用提取器匹配任何链接,多半是直链或普通网页,不为它多发一次请求
+SINGLE_EXTRACTORS = ('Generic',)
+
+
+@functools.lru_cache(maxsize=4096)
+def is_playlist_url(url):
+    """不发请求,仅根据URL判断是否为播放列表/频道
+
+    返回 True/False;仅凭URL无法判断时返回 None,由调用方平铺提取后再看(见 flat_extract)
+    """
+    from yt_dlp.extractor import gen_extractor_classes
+
+    for ie in gen_extractor_classes():
+        if not ie.suitable(url):
+            continue
+        if ie.ie_key() in PLAYLIST_EXTRACTORS:
+            return True
+        if ie.ie_key() in SINGLE_EXTRACTORS:
+            return False
+        is_single_video = getattr(ie, 'is_single_video', None)
+        if is_single_video is None:
+            return False
+        single = is_single_video(url)
+        return None if single is None else not single
+    return False
+
+
+def flat_extract(ydl, url, depth=3):
+    """平铺提取链接的信息,返回 (info, 剩余可展开的层数)
+
+    频道首页等链接会先重定向到实际的列表,最多跟随 depth 次
+    """
+    info = ydl.extract_info(url, download=False, process=False)
+    while info and info.get('_type') in ('url', 'url_transparent') and depth > 0:
+        depth -= 1
+        info = ydl.extract_info(info['url'], download=False, process=False)
+    return info, depth
+
+
+def is_playlist_info(info):
+    """平铺提取的结果是否为播放列表"""
+    return bool(info) and info.get('_type') in ('playlist', 'multi_video')
+
+
+def iter_playlist_entries(ydl, url, depth=3, info=None):
+    """逐个产生播放列表/频道中视频的链接
+
+    使用平铺提取(extract_flat),每个视频只得到链接,完整信息留到真正
+    下载时再提取;entries 按页懒加载,调用方取多少就请求多少。
+    ydl 需要按 FLAT_OPTS 配置。嵌套的播放列表(如频道的各个标签页)
+    最多展开 depth 层。info 为已经用 flat_extract 提取过的结果(可选)
+    """
+    if info is None:
+        info, depth = flat_extract(ydl, url, depth)
+    if not info:
+        return
+
+    if not is_playlist_info(info):
+        yield info.get('webpage_url') or url
+        return
+
+    for entry in info.get('entries') or ():
+        if not entry:
+            continue
+        entry_url = entry.get('url') or entry.get('webpage_url')
+        if entry.get('_type') == 'playlist' or (entry_url and is_playlist_url(entry_url)):
+            if depth > 0 and entry_url:
+                yield from iter_playlist_entries(ydl, entry_url, depth - 1)
+            continue
+        if entry_url:
+            yield entry_url
@@ -0,0 +1,127 @@
+import os
+import time
+
+# 后处理进程需要的 YoutubeDL 参数(进度回调等不能跨进程传递)
+POSTPROCESS_PARAMS = ('ffmpeg_location', 'prefer_ffmpeg', 'keepvideo', 'overwrites',
+                      'postprocessor_args', 'quiet', 'no_warnings', 'verbose', 'no_color')
+
+# 可以直接封装进 mp4 容器的编码(不需要重新编码)
+MP4_VIDEO_CODECS = ('avc1', 'avc3', 'h264', 'hev1', 'hvc1', 'h265', 'hevc', 'av01', 'mp4v')
+MP4_AUDIO_CODECS = ('mp4a', 'aac', 'mp3', 'ac-3', 'ec-3', 'alac')
+
+
+def postprocess_params(ydl):
+    """从下载用的 YoutubeDL 中取出后处理需要的参数"""
+    return {key: ydl.params[key] for key in POSTPROCESS_PARAMS if key in ydl.params}
+
+
+def downloaded_files(result):
+    """process_ie_result 返回的结果中每个实际下载的文件对应的信息"""
+    return result.get('requested_downloads') or [result]
+
+
+def downloaded_info(result):
+    """每个实际下载的文件的完整信息
+
+    yt-dlp 的 requested_downloads 中只保留与视频信息不同的字段(文件路径等),
+    后处理需要的扩展名、编码、标题等要与视频信息合并回来
+    """
+    entries = result.get('requested_downloads')
+    if not entries:
+        return [result]
+    base = {k: v for k, v in result.items() if k != 'requested_downloads'}
+    return [dict(base, **entry) for entry in entries]
+
+
+def final_files(result):
+    """下载和后处理完成后实际存在的文件路径"""
+    paths = (info.get('filepath') for info in downloaded_files(result))
+    return [path for path in dict.fromkeys(paths) if path and os.path.exists(path)]
+
+
+def _codec(value):
+    """'avc1.64001F' -> 'avc1';未知时返回None"""
+    if not value or value == 'none':
+        return None
+    return value.split('.')[0].lower()
+
+
+def plan_container(info, target_ext='mp4'):
+    """根据信息字典中的编码决定如何得到目标容器格式
+
+    已经是目标格式时不处理;编码与目标容器兼容时只做流复制(remux);
+    编码不兼容时才重新编码;编码未知时先尝试remux,失败再重新编码
+    """
+    if info.get('ext') == target_ext or info.get('vcodec') == 'none':
+        return []
+
+    remux = {'key': 'FFmpegVideoRemuxer', 'preferedformat': target_ext}
+    convert = {'key': 'FFmpegVideoConvertor', 'preferedformat': target_ext}
+    if target_ext != 'mp4':
+        return [dict(remux, fallback=convert)]
+
+    vcodec, acodec = _codec(info.get('vcodec')), _codec(info.get('acodec'))
+    if vcodec is None or (acodec is None and info.get('acodec') != 'none'):
+        return [dict(remux, fallback=convert)]
+    if vcodec in MP4_VIDEO_CODECS and (acodec is None or acodec in MP4_AUDIO_CODECS):
+        return [remux]
+    return [convert]
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+def _get_postprocessor(key):
+    """yt-dlp 的后处理类,或本项目自己的(目前只有音频模式的 AudioFinalize)"""
+    if key == 'AudioFinalize':
+        from .audio import AudioFinalizePP
+        return AudioFinalizePP
+    from yt_dlp.postprocessor import get_postprocessor
+    return get_postprocessor(key)
+
+
+def _run_spec(ydl, spec, info):
+    from yt_dlp.utils import PostProcessingError
+
+    options = {k: v for k, v in spec.items() if k not in ('key', 'when', 'fallback')}
+    pp = _get_postprocessor(spec['key'])(ydl, **options)
+    try:
+        return spec['key'], ydl.run_pp(pp, info)
+    except PostProcessingError:
+        if not spec.get('fallback'):
+            raise
+        return _run_spec(ydl, spec['fallback'], info)
+
+
+def apply_postprocessors(params, result, specs):
+    """依次执行后处理,返回 (更新后的结果, 统计)
+
+    可以在独立进程中执行,参数和返回值都只包含可序列化的数据;
+    specs 与 YoutubeDL 的 postprocessors 选项格式相同,可以带 'fallback'
+    指定失败时改用的后处理。统计包含每一步的耗时和处理前后的文件大小
+    """
+    import yt_dlp
+
+    started = time.monotonic()
+    report = {'steps': [], 'bytes_before': 0, 'bytes_after': 0}
+    with yt_dlp.YoutubeDL(params) as ydl:
+        processed = []
+        for info in downloaded_info(result):
+            report['bytes_before'] += _file_size(info.get('filepath'))
+            for spec in specs:
+                step_started = time.monotonic()
+                key, info = _run_spec(ydl, spec, info)
+                report['steps'].append({'key': key, 'elapsed': round(time.monotonic() - step_started, 3)})
+            report['bytes_after'] += _file_size(info.get('filepath'))
+            processed.append(info)
+
+        if result.get('requested_downloads'):
+            result['requested_downloads'] = processed
+        else:
+            result = processed[0]
+        report['elapsed'] = round(time.monotonic() - started, 3)
+        return ydl.sanitize_info(result), report
@@ -0,0 +1,60 @@
+import time
+import threading
+
+
+class ProgressAggregator:
+    """合并高频进度事件,按固定频率批量发送
+
+    每个任务只保留各字段(进度、状态、速度等)的最新值,后台线程每
+    interval 秒调用一次 sink(updates),updates 为 [(url, fields), ...],
+    fields 只包含本周期内有变化的字段。没有待发送的事件时后台线程
+    自动退出,下次 update 时再启动。
+    """
+
+    def __init__(self, sink, interval=0.1):
+        self.sink = sink
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        # 发送期间持有,后台发送和 flush(url) 不会交错: flush 返回时之前取出的事件都已发出
+        self._emit_lock = threading.Lock()
+        self._thread = None
+
+    def update(self, url, **fields):
+        """记录最新的字段值(值为None的字段忽略),不会立即发送"""
+        with self._lock:
+            entry = self._pending.get(url)
+            if entry is None:
+                entry = self._pending[url] = {}
+            for key, value in fields.items():
+                if value is not None:
+                    entry[key] = value
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='progress-flush', daemon=True)
+                self._thread.start()
+
+    def flush(self, url=None):
+        """立即发送待处理的事件;指定url时只发送该任务的事件
+
+        完成、出错等状态变化应先调用 flush(url) 再直接发送,保证顺序: 后台线程
+        正在发送时 flush 会等它发完,旧的进度不会出现在完成事件之后
+        """
+        with self._emit_lock:
+            with self._lock:
+                if url is None:
+                    pending, self._pending = self._pending, {}
+                else:
+                    entry = self._pending.pop(url, None)
+                    pending = {url: entry} if entry else {}
+            if pending:
+                self.sink(list(pending.items()))
+
+    def _run(self):
+        """后台定时发送,一个周期内没有新事件时退出"""
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+            self.flush()
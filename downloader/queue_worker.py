@@ -0,0 +1,167 @@
+import time
+import logging
+import threading
+
+from .core import SimpleDownloaderCore
+from .postprocess import final_files
+from .retry_policy import RetryPolicy
+from .work_queue import worker_name
+
+
+class QueueWorkerCore(SimpleDownloaderCore):
+    """记下每个任务的失败原因和最终文件,工作进程据此向队列报告结果"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.errors = {}
+        self.outputs = {}
+
+    def finish(self, url, result, save_path):
+        ok = super().finish(url, result, save_path)
+        files = final_files(result)
+        if files:
+            self.outputs[url] = files[0]
+        return ok
+
+    def fail(self, url, error):
+        self.errors[url] = error
+        return super().fail(url, error)
+
+
+class QueueWorker:
+    """从共享队列(见 work_queue)领取任务的下载进程
+
+    每个进程开 jobs 个线程,各自领取一个任务,用 SimpleDownloaderCore 同步
+    下载;心跳线程定时为正在下载的任务续租。失败的任务按 RetryPolicy 的
+    退避时间放回队列,由任意一个进程重试;续租时发现任务已被重新分配
+    (本进程曾经失联)就中断下载,不再提交结果
+    """
+
+    def __init__(self, queue, save_path, quality='best', jobs=1, name=None, core=None,
+                 retry_policy=None, heartbeat_interval=None, poll_interval=2.0,
+                 exit_when_empty=False, on_result=None):
+        self.queue = queue
+        self.save_path = save_path
+        self.quality = quality
+        self.jobs = max(1, int(jobs))
+        self.name = name or worker_name()
+        self.core = core or QueueWorkerCore()
+        self.retry = retry_policy or RetryPolicy()
+        # 默认在租约时长的三分之一时续租,错过一两次心跳也不会丢失任务
+        self.heartbeat_interval = heartbeat_interval or queue.lease_seconds / 3
+        self.poll_interval = poll_interval
+        # 队列中没有排队和下载中的任务时退出(批处理),否则一直等待新任务
+        self.exit_when_empty = exit_when_empty
+        # on_result(租约, 是否成功, 耗时)
+        self.on_result = on_result
+        self.logger = logging.getLogger('youtube_downloader.queue_worker')
+        self._lock = threading.Lock()
+        self._leases = {}  # token -> 正在下载的租约
+        self._lost = set()  # 已被重新分配的租约
+        self._released = set()  # 停止时放回队列的租约
+        self._stopping = threading.Event()
+        self.done = 0
+        self.failed = 0
+
+    def run(self):
+        """领取并下载任务,直到 stop 或(exit_when_empty 时)队列为空;返回成功的数量"""
+        self.logger.info(f"工作进程 {self.name} 启动,{self.jobs} 个下载线程")
+        self.queue.heartbeat(self.name)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name='heartbeat', daemon=True)
+        heartbeat.start()
+        threads = [threading.Thread(target=self._claim_loop, name=f'queue-{i}') for i in range(self.jobs)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        finally:
+            self._stopping.set()
+            heartbeat.join()
+            self.core.artifact_lane.wait()
+            self.core.session.close()
+        self.logger.info(f"工作进程 {self.name} 退出: 完成 {self.done}, 失败 {self.failed}")
+        return self.done
+
+    def stop(self):
+        """不再领取新任务,中断正在下载的任务并放回队列(.part 文件保留,可以续传)"""
+        self._stopping.set()
+        with self._lock:
+            leases = list(self._leases.values())
+            self._released.update(lease.token for lease in leases)
+        for lease in leases:
+            self.core.cancel(lease.url)
+
+    def _claim_loop(self):
+        while not self._stopping.is_set():
+            pause = self.retry.pause_remaining()
+            if pause > 0:
+                self._stopping.wait(min(pause, self.poll_interval))
+                continue
+            lease = self.queue.claim(self.name)
+            if lease is None:
+                if self.exit_when_empty and not self.queue.pending():
+                    return
+                self._stopping.wait(self.poll_interval)
+                continue
+            self._process(lease)
+
+    def _process(self, lease):
+        if self._stopping.is_set():
+            # 领取时刚好在停止
+            self.queue.release(lease, self.name)
+            return
+        with self._lock:
+            self._leases[lease.token] = lease
+        started = time.monotonic()
+        quality = lease.options.get('quality', self.quality)
+        try:
+            ok = self.core.download(lease.url, lease.options.get('save_path', self.save_path), quality)
+        finally:
+            with self._lock:
+                del self._leases[lease.token]
+                lost = lease.token in self._lost
+                released = lease.token in self._released
+                self._lost.discard(lease.token)
+                self._released.discard(lease.token)
+        error = self.core.errors.pop(lease.url, None)
+        output_path = self.core.outputs.pop(lease.url, None)
+
+        if lost:
+            self.logger.warning(f"任务已被重新分配,不提交结果: {lease.url}")
+            return
+        if released:
+            self.queue.release(lease, self.name)
+            return
+        if ok:
+            self.retry.on_success()
+            if self.queue.complete(lease, self.name, output_path):
+                with self._lock:
+                    self.done += 1
+        else:
+            delay = self.retry.on_failure(error, lease.attempts - 1) if error is not None else None
+            if delay is not None:
+                self.logger.warning(f"{lease.url} 失败,{delay:.0f}秒后重新排队(第 {lease.attempts} 次)")
+            self.queue.fail(lease, self.name, str(error) if error is not None else None, delay)
+            if delay is None:
+                with self._lock:
+                    self.failed += 1
+        if self.on_result is not None:
+            self.on_result(lease, ok, time.monotonic() - started)
+
+    def _heartbeat_loop(self):
+        while not self._stopping.wait(self.heartbeat_interval):
+            with self._lock:
+                leases = list(self._leases.values())
+            try:
+                lost = self.queue.heartbeat(self.name, leases)
+            except Exception as e:
+                # 数据库暂时不可用: 下次再试,租约在过期前仍然有效
+                self.logger.warning(f"续租失败: {e}")
+                continue
+            for lease in lost:
+                self.logger.warning(f"租约已失效,中断下载: {lease.url}")
+                with self._lock:
+                    self._lost.add(lease.token)
+                self.core.cancel(lease.url)
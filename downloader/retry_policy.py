@@ -0,0 +1,156 @@
+import time
+import random
+import logging
+import threading
+
+from .metrics import error_class
+
+# 熔断时的处理方式: 暂停所有新任务 / 该类错误不再重试
+PAUSE = 'pause'
+SKIP = 'skip'
+
+# 错误分类 -> 重试和熔断设置
+#   retries     任务失败后最多延后重试的次数
+#   threshold   连续失败多少次后熔断(None 表示不熔断)
+#   cooldown    熔断持续的秒数,恢复后再次失败时加倍
+#   action      熔断期间的处理方式
+POLICIES = {
+    # 403 多半是访问太频繁被限制,熔断时暂停所有新任务,等一段时间再继续
+    'http_403': {'retries': 3, 'threshold': 3, 'cooldown': 60, 'action': PAUSE},
+    # 年龄验证需要登录,重试一次(期间浏览器可能已登录,Cookie会重新读取);连续出现说明没有登录,不再重试
+    'age_gate': {'retries': 1, 'threshold': 2, 'cooldown': 600, 'action': SKIP},
+    # YouTube 限流时也会提示视频不可用,重试一次;连续出现时不再重试
+    'unavailable': {'retries': 1, 'threshold': 3, 'cooldown': 300, 'action': SKIP},
+    # 其他下载错误(网络中断、超时、408/429等)
+    'DownloadError': {'retries': 3, 'threshold': None},
+}
+# 未列出的错误重试也不会成功: 其他4xx(如 http_404)、预期内的提取错误(UnsupportedError、
+# 私享视频、格式不可用等 ExtractorError)、文件未找到、后处理失败等
+DEFAULT_POLICY = {'retries': 0, 'threshold': None}
+
+
+def inline_retry_sleep(n):
+    """yt-dlp 内部重试(retry_sleep_functions)的等待时间: 0.5秒起每次加倍,最多4秒
+
+    模块级函数,YoutubeDL 选项的 repr 不变,复用实例时选项能匹配上
+    """
+    return min(0.5 * 2 ** n, 4.0)
+
+
+class CircuitBreaker:
+    """熔断器: 连续失败 threshold 次后打开 cooldown 秒
+
+    打开期间到期后进入半开状态,此时再失败立即重新打开并把时长加倍(最多
+    max_cooldown),成功则关闭并恢复原来的时长
+    """
+
+    def __init__(self, threshold, cooldown, max_cooldown=3600, clock=time.monotonic):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+
+    def remaining(self):
+        """打开状态剩余的秒数,未打开时为0"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - self.clock())
+
+    def record_failure(self):
+        """记录一次失败,返回熔断器是否因此打开"""
+        self.failures += 1
+        if self.opened_at is not None and self.remaining() == 0:
+            # 半开状态下又失败了
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+        elif self.opened_at is not None or self.failures < self.threshold:
+            return False
+        self.opened_at = self.clock()
+        self.trips += 1
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.cooldown = self.base_cooldown
+
+
+class RetryPolicy:
+    """失败任务的延后重试(指数退避加随机抖动)和按错误分类的熔断
+
+    调度器在任务失败时调用 on_failure 得到重试前等待的时间,等待期间其他
+    任务照常进行;开始新任务前调用 pause_remaining,403 熔断期间暂停
+    """
+
+    def __init__(self, policies=None, base_delay=5.0, max_delay=300.0, clock=time.monotonic):
+        self.policies = dict(POLICIES, **(policies or {}))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.logger = logging.getLogger('youtube_downloader.retry')
+        self._lock = threading.Lock()
+        self._breakers = {
+            cls: CircuitBreaker(policy['threshold'], policy['cooldown'], clock=clock)
+            for cls, policy in self.policies.items() if policy.get('threshold')
+        }
+
+    def policy(self, error):
+        return self.policies.get(error_class(error), DEFAULT_POLICY)
+
+    def max_retries(self, error):
+        return self.policy(error)['retries']
+
+    def on_failure(self, error, attempts):
+        """记录失败;返回重试前等待的秒数,不再重试时返回None
+
+        attempts 为任务已经重试过的次数
+        """
+        cls = error_class(error)
+        policy = self.policies.get(cls, DEFAULT_POLICY)
+        with self._lock:
+            breaker = self._breakers.get(cls)
+            if breaker is not None and breaker.record_failure():
+                self.logger.warning(f"{cls} 连续失败 {breaker.failures} 次,熔断 {breaker.cooldown:.0f} 秒"
+                                    f"({'暂停新任务' if policy['action'] == PAUSE else '不再重试'})")
+            if attempts >= policy['retries']:
+                return None
+            if breaker is not None and policy['action'] == SKIP and breaker.remaining() > 0:
+                return None
+            delay = min(self.max_delay, self.base_delay * 2 ** attempts)
+            # 一半固定一半随机,同时失败的任务不会同时重试
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            if breaker is not None and policy['action'] == PAUSE:
+                delay = max(delay, breaker.remaining())
+            return delay
+
+    def on_success(self):
+        """任务成功: 连续失败计数清零,关闭需要暂停的熔断器(说明访问已经恢复)
+
+        不再重试的熔断器保持到时间结束,其他视频成功不能说明问题已经解决
+        """
+        with self._lock:
+            for cls, breaker in self._breakers.items():
+                if self.policies[cls]['action'] == PAUSE:
+                    breaker.record_success()
+                else:
+                    breaker.failures = 0
+
+    def pause_remaining(self):
+        """需要暂停新任务的剩余秒数"""
+        with self._lock:
+            return max((breaker.remaining() for cls, breaker in self._breakers.items()
+                        if self.policies[cls]['action'] == PAUSE), default=0.0)
+
+    def stats(self):
+        """各熔断器的连续失败次数、熔断次数和剩余时间"""
+        with self._lock:
+            return {
+                cls: {
+                    'failures': breaker.failures,
+                    'trips': breaker.trips,
+                    'open': round(breaker.remaining(), 1),
+                }
+                for cls, breaker in self._breakers.items()
+            }
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .postprocess import apply_postprocessors, postprocess_params, downloaded_info
+
+# 可选的附属文件:
+#   infojson         视频信息 <文件名>.info.json
+#   thumbnail        缩略图文件
+#   embed_thumbnail  把缩略图嵌入视频文件(不保留缩略图文件,除非同时选了 thumbnail)
+#   metadata         把标题、作者等写入视频文件
+ARTIFACTS = ('infojson', 'thumbnail', 'embed_thumbnail', 'metadata')
+
+# 附属文件通道使用的 YoutubeDL 选项: 只走 process_info 中写缩略图的部分,不下载视频
+ARTIFACT_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'writethumbnail': True,
+    'skip_download': True,
+}
+
+# 嵌入缩略图时用 mutagen 直接修改文件的格式(其他格式由ffmpeg写到临时文件再替换)
+MUTAGEN_EXTS = ('m4a', 'mp4', 'm4v', 'mov', 'ogg', 'opus', 'flac')
+
+
+class ArtifactLane:
+    """低优先级的附属文件通道
+
+    缩略图、信息JSON、元数据不在主任务的关键路径上: 视频文件就位后任务
+    立即报告完成,附属文件交给这里的小线程池(默认1个线程)按提交顺序
+    补上。每个附属文件失败只记日志,不影响视频本身。
+    写入元数据、嵌入缩略图时保存目录中的视频始终是完整的,见 _rewrite
+    """
+
+    def __init__(self, session, metrics, max_workers=1):
+        self.session = session
+        self.metrics = metrics
+        self.max_workers = max_workers
+        self.logger = logging.getLogger('youtube_downloader.artifacts')
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        self._idle = threading.Event()
+        self._idle.set()
+        self.done = {}  # 附属文件 -> 完成数
+        self.failed = {}  # 附属文件 -> 失败数
+
+    def submit(self, url, info, artifacts):
+        """提交一个视频的附属文件,info 为处理完成后的(可序列化的)信息字典"""
+        artifacts = [name for name in ARTIFACTS if name in artifacts]
+        if not artifacts:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='artifacts')
+            self._pending += 1
+            self._idle.clear()
+        self._executor.submit(self._run, url, info, artifacts)
+
+    def wait(self, timeout=None):
+        """等待已提交的附属文件全部完成,返回是否全部完成"""
+        return self._idle.wait(timeout)
+
+    def stats(self):
+        """排队中的视频数和各附属文件的完成、失败数"""
+        with self._lock:
+            return {'pending': self._pending, 'done': dict(self.done), 'failed': dict(self.failed)}
+
+    def _run(self, url, info, artifacts):
+        target = downloaded_info(info)[0]
+        # 缩略图按视频的文件名保存在视频旁边
+        outtmpl = os.path.splitext(target['filepath'])[0].replace('%', '%%') + '.%(ext)s'
+        ydl = self.session.checkout(dict(ARTIFACT_OPTS, outtmpl=outtmpl))
+        try:
+            if 'infojson' in artifacts:
+                self._step(url, 'infojson', self._write_info_json, ydl, info, target['filepath'])
+            has_thumbnail = False
+            if 'thumbnail' in artifacts or 'embed_thumbnail' in artifacts:
+                has_thumbnail = self._step(url, 'thumbnail', self._write_thumbnail, ydl, target)
+
+            # 元数据和嵌入缩略图都要重写一遍视频文件,合在一起处理
+            specs = []
+            if 'metadata' in artifacts:
+                specs.append({'key': 'FFmpegMetadata', 'add_metadata': True})
+            if 'embed_thumbnail' in artifacts and has_thumbnail:
+                specs.append({'key': 'EmbedThumbnail', 'already_have_thumbnail': 'thumbnail' in artifacts})
+            if specs:
+                name = '+'.join(n for n in ('metadata', 'embed_thumbnail') if n in artifacts)
+                self._step(url, name, self._rewrite, postprocess_params(ydl), target, specs)
+        finally:
+            self.session.release(ydl)
+            with self._lock:
+                self._pending -= 1
+                if not self._pending:
+                    self._idle.set()
+
+    def _step(self, url, name, func, *args):
+        """执行一个附属文件的生成,记录耗时或失败,返回是否成功"""
+        started = time.monotonic()
+        try:
+            func(*args)
+        except Exception as e:
+            with self._lock:
+                self.failed[name] = self.failed.get(name, 0) + 1
+            self.logger.warning(f"附属文件 {name} 失败: {url} {e}")
+            return False
+        with self._lock:
+            self.done[name] = self.done.get(name, 0) + 1
+        self.metrics.add_phase(url, f'artifact:{name}', time.monotonic() - started)
+        return True
+
+    def _rewrite(self, params, info, specs):
+        """执行会改写视频文件的后处理
+
+        ffmpeg 写到临时文件再替换原文件,直接在原文件上执行。mutagen 会直接修改
+        文件,这时在同目录的硬链接上执行: 前面的ffmpeg已经写出新文件时不用复制,
+        否则先复制一份,完成后整体替换原文件
+        """
+        in_place = [spec for spec in specs
+                    if spec['key'] == 'EmbedThumbnail' and info.get('ext') in MUTAGEN_EXTS]
+        if not in_place:
+            apply_postprocessors(params, info, specs)
+            return
+
+        final = info['filepath']
+        tmp_dir = tempfile.mkdtemp(prefix='.artifacts-', dir=os.path.dirname(os.path.abspath(final)))
+        try:
+            staged = os.path.join(tmp_dir, os.path.basename(final))
+            try:
+                os.link(final, staged)
+            except OSError:
+                shutil.copyfile(final, staged)
+            staged_info = dict(info, filepath=staged)
+            rewrites = [spec for spec in specs if spec not in in_place]
+            if rewrites:
+                staged_info, _ = apply_postprocessors(params, staged_info, rewrites)
+            if os.path.samefile(staged_info['filepath'], final):
+                # 还是原文件的硬链接
+                os.remove(staged_info['filepath'])
+                shutil.copyfile(final, staged_info['filepath'])
+            result, _ = apply_postprocessors(params, staged_info, in_place)
+            os.replace(result['filepath'], final)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _write_thumbnail(self, ydl, info):
+        """下载缩略图到视频文件旁边,并在 info['thumbnails'] 中记下路径
+
+        ydl 按 ARTIFACT_OPTS 配置,process_info 只写缩略图,不下载视频
+        """
+        ydl.process_info(info)
+        if not any(t.get('filepath') for t in info.get('thumbnails') or ()):
+            raise RuntimeError('没有可用的缩略图')
+
+    def _write_info_json(self, ydl, info, filepath):
+        path = os.path.splitext(filepath)[0] + '.info.json'
+        tmp_path = f'{path}.part'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(ydl.sanitize_info(info), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
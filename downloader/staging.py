@@ -0,0 +1,99 @@
+import os
+import shutil
+import hashlib
+import logging
+
+from .postprocess import downloaded_files
+
+# 合并(视频+音频 → 输出)和转换容器时,原文件和新文件同时存在,暂存目录按2倍估算
+WORK_FACTOR = 2
+# 估算之外额外预留的空间(字节)
+MARGIN = 64 * 1024 * 1024
+
+logger = logging.getLogger('youtube_downloader.staging')
+
+
+class InsufficientSpaceError(Exception):
+    """磁盘剩余空间不足以完成下载"""
+
+
+def work_dir(staging_root, save_path):
+    """下载过程中文件所在的目录
+
+    没有配置暂存目录时就是保存目录;否则为暂存目录下按保存路径区分的子目录,
+    不同批次保存到不同目录时,同名文件不会互相覆盖
+    """
+    if not staging_root:
+        return save_path
+    digest = hashlib.sha1(os.path.abspath(save_path).encode('utf-8')).hexdigest()[:12]
+    path = os.path.join(staging_root, digest)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def estimate_size(info):
+    """根据选中格式的 filesize/filesize_approx 估算下载大小,未知时返回None"""
+    sizes = [f.get('filesize') or f.get('filesize_approx') for f in info.get('requested_formats') or [info]]
+    if not sizes or not all(sizes):
+        return None
+    return int(sum(sizes))
+
+
+def _same_filesystem(a, b):
+    try:
+        return os.stat(a).st_dev == os.stat(b).st_dev
+    except OSError:
+        return False
+
+
+def check_free_space(info, directory, save_path):
+    """开始下载前检查剩余空间,不足时抛出 InsufficientSpaceError
+
+    directory 为下载时使用的目录(暂存目录或保存目录);保存目录在另一个
+    文件系统上时,还要能放下最终文件。大小未知时不检查
+    """
+    size = estimate_size(info)
+    if size is None:
+        return
+    needed = {directory: size * WORK_FACTOR + MARGIN}
+    if not _same_filesystem(directory, save_path):
+        needed[save_path] = size + MARGIN
+    for path, amount in needed.items():
+        free = shutil.disk_usage(path).free
+        if free < amount:
+            raise InsufficientSpaceError(
+                f"磁盘空间不足: {path} 剩余 {free / 1024 / 1024:.0f}MB,"
+                f"需要约 {amount / 1024 / 1024:.0f}MB")
+
+
+def move_file(source, destination):
+    """把文件移到目标位置
+
+    同一文件系统上直接 rename(原子操作);否则复制一遍到目标目录的临时文件,
+    再 rename 成最终文件名,目标目录中不会出现写了一半的文件
+    """
+    if _same_filesystem(os.path.dirname(source), os.path.dirname(destination)):
+        os.replace(source, destination)
+        return
+    tmp_path = f'{destination}.part'
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, destination)
+    os.remove(source)
+
+
+def move_to_save_path(result, save_path):
+    """把暂存目录中的最终文件移到保存目录,并更新结果中的文件路径"""
+    save_path = os.path.abspath(save_path)
+    for info in downloaded_files(result):
+        source = info.get('filepath')
+        if not source or not os.path.exists(source):
+            continue
+        if os.path.dirname(os.path.abspath(source)) == save_path:
+            continue
+        destination = os.path.join(save_path, os.path.basename(source))
+        move_file(source, destination)
+        logger.debug(f"移动文件: {source} -> {destination}")
+        info['filepath'] = destination
+    if result.get('requested_downloads') and result.get('filepath'):
+        result['filepath'] = downloaded_files(result)[0].get('filepath')
+    return result
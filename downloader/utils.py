@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import functools
+
+
+def app_data_dir():
+    """程序数据目录(缓存、任务记录等)"""
+    path = os.path.join(os.path.expanduser("~"), ".youtube_downloader")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def open_sqlite(path):
+    """打开SQLite数据库,启用WAL以支持多线程读写"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+@functools.lru_cache(maxsize=4096)
+def canonical_id(url):
+    """不发请求,仅根据URL匹配提取器得到规范的视频ID
+
+    格式与yt-dlp下载存档一致,如 "youtube dQw4w9WgXcQ";无法识别时返回None
+    """
+    from yt_dlp.extractor import gen_extractor_classes
+    from yt_dlp.utils import make_archive_id
+
+    for ie in gen_extractor_classes():
+        if not ie.suitable(url):
+            continue
+        temp_id = ie.get_temp_id(url)
+        return make_archive_id(ie, temp_id) if temp_id else None
+    return None
+
+
+def info_id(info):
+    """根据已提取的视频信息得到规范的视频ID"""
+    from yt_dlp.utils import make_archive_id
+
+    if not info or not info.get('id') or not info.get('extractor_key'):
+        return None
+    return make_archive_id(info['extractor_key'], info['id'])
@@ -0,0 +1,411 @@
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+
+from .utils import app_data_dir, open_sqlite
+from .job_journal import QUEUED, DOWNLOADING, FINISHED, FAILED
+
+try:
+    import redis
+except ImportError:  # 可选依赖,只有使用 Redis 队列时才需要
+    redis = None
+
+# 租约的默认时长(秒): 工作进程在这段时间内没有续租,任务就会被其他进程领取
+LEASE_SECONDS = 60
+# 同一任务最多被领取的次数(含工作进程失联后重新分配),超过后标记为失败
+MAX_ATTEMPTS = 5
+
+
+def worker_name():
+    """默认的工作进程名: 主机名:进程号"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class Lease:
+    """领取到的任务
+
+    token 每次领取都不同,完成、失败、续租时都要带上: 租约过期后任务被其他
+    进程领走,原来的进程再提交结果会被忽略
+    """
+    __slots__ = ('url', 'token', 'attempts', 'options')
+
+    def __init__(self, url, token, attempts, options=None):
+        self.url = url
+        self.token = token
+        self.attempts = attempts
+        self.options = options or {}
+
+    def __repr__(self):
+        return f'Lease({self.url!r}, attempts={self.attempts})'
+
+
+class SqliteWorkQueue:
+    """多个进程共用的任务队列(SQLite,WAL模式)
+
+    同一台机器上的多个工作进程从这里领取任务。WAL 模式依赖同一台机器上的
+    共享内存,数据库文件不能放在网络文件系统上给多台机器共用,多台机器请
+    使用 RedisWorkQueue。领取的任务带有租约,
+    工作进程定时续租(heartbeat);进程崩溃或失联、租约过期后,任务由
+    下一个领取的进程重新分配
+    """
+
+    def __init__(self, path=None, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS, clock=time.time):
+        self.path = path or os.path.join(app_data_dir(), 'work_queue.sqlite3')
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # 当前时间(秒),所有进程的时钟需要一致
+        self.clock = clock
+        self.logger = logging.getLogger('youtube_downloader.work_queue')
+        self._lock = threading.Lock()
+        self._conn = open_sqlite(self.path)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS queue ('
+                ' url TEXT PRIMARY KEY,'
+                ' position INTEGER NOT NULL,'
+                ' state TEXT NOT NULL,'
+                ' options TEXT,'
+                ' worker TEXT,'
+                ' token TEXT,'
+                ' lease_until REAL,'
+                ' available_at REAL NOT NULL DEFAULT 0,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' output_path TEXT,'
+                ' error TEXT,'
+                ' updated_at REAL NOT NULL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS queue_state ON queue (state, position)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS queue_token ON queue (token)')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS workers ('
+                ' worker TEXT PRIMARY KEY,'
+                ' started_at REAL NOT NULL,'
+                ' heartbeat_at REAL NOT NULL,'
+                ' done INTEGER NOT NULL DEFAULT 0,'
+                ' failed INTEGER NOT NULL DEFAULT 0)')
+
+    def put(self, url, options=None):
+        """加入队列,已存在的任务保持原状态;返回是否新加入"""
+        return self.put_many([url], options) == 1
+
+    def put_many(self, urls, options=None):
+        """批量加入队列(一个事务),返回新加入的数量"""
+        options = json.dumps(options) if options else None
+        added = 0
+        with self._lock, self._conn:
+            for url in urls:
+                # 位置在同一条语句中计算,多个进程同时加入时也不会重复
+                cursor = self._conn.execute(
+                    'INSERT OR IGNORE INTO queue (url, position, state, options, updated_at)'
+                    ' SELECT ?, COALESCE(MAX(position), 0) + 1, ?, ?, ? FROM queue',
+                    (url, QUEUED, options, self.clock()))
+                added += cursor.rowcount
+        return added
+
+    def claim(self, worker):
+        """领取排在最前面的可用任务,没有时返回None"""
+        now = self.clock()
+        token = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._reap(now)
+            # 选取和标记在同一条 UPDATE 中完成,多个进程不会领到同一个任务
+            cursor = self._conn.execute(
+                'UPDATE queue SET state = ?, worker = ?, token = ?, lease_until = ?,'
+                ' attempts = attempts + 1, updated_at = ?'
+                ' WHERE url = (SELECT url FROM queue WHERE state = ? AND available_at <= ?'
+                ' ORDER BY position LIMIT 1)',
+                (DOWNLOADING, worker, token, now + self.lease_seconds, now, QUEUED, now))
+            if not cursor.rowcount:
+                return None
+            url, attempts, options = self._conn.execute(
+                'SELECT url, attempts, options FROM queue WHERE token = ?', (token,)).fetchone()
+        return Lease(url, token, attempts, json.loads(options) if options else None)
+
+    def _reap(self, now):
+        """租约过期的任务重新排队;被领取次数过多的(可能每次都导致进程崩溃)标记为失败"""
+        failed = self._conn.execute(
+            'UPDATE queue SET state = ?, error = ?, token = NULL, updated_at = ?'
+            ' WHERE state = ? AND lease_until < ? AND attempts >= ?',
+            (FAILED, '工作进程多次失联', now, DOWNLOADING, now, self.max_attempts)).rowcount
+        requeued = self._conn.execute(
+            'UPDATE queue SET state = ?, token = NULL, updated_at = ?'
+            ' WHERE state = ? AND lease_until < ?',
+            (QUEUED, now, DOWNLOADING, now)).rowcount
+        if failed or requeued:
+            self.logger.warning(f"租约过期: {requeued} 个任务重新排队, {failed} 个任务标记为失败")
+
+    def heartbeat(self, worker, leases=()):
+        """续租并记录工作进程的心跳,返回已经失去的租约(被重新分配的任务)"""
+        now = self.clock()
+        lost = []
+        with self._lock, self._conn:
+            for lease in leases:
+                cursor = self._conn.execute(
+                    'UPDATE queue SET lease_until = ? WHERE token = ? AND state = ?',
+                    (now + self.lease_seconds, lease.token, DOWNLOADING))
+                if not cursor.rowcount:
+                    lost.append(lease)
+            self._conn.execute(
+                'INSERT INTO workers (worker, started_at, heartbeat_at) VALUES (?, ?, ?)'
+                ' ON CONFLICT(worker) DO UPDATE SET heartbeat_at = excluded.heartbeat_at',
+                (worker, now, now))
+        return lost
+
+    def complete(self, lease, worker, output_path=None):
+        """任务完成;租约已经失效时返回False"""
+        return self._finish(lease, worker, FINISHED, output_path=output_path)
+
+    def fail(self, lease, worker, error, retry_delay=None):
+        """任务失败: retry_delay 不为None时过这么多秒后重新排队,否则标记为失败"""
+        if retry_delay is not None and lease.attempts < self.max_attempts:
+            return self._finish(lease, worker, QUEUED, error=error, delay=retry_delay)
+        return self._finish(lease, worker, FAILED, error=error)
+
+    def release(self, lease, worker):
+        """放弃任务(如工作进程退出),立即重新排队,不计入领取次数"""
+        return self._finish(lease, worker, QUEUED, release=True)
+
+    def _finish(self, lease, worker, state, output_path=None, error=None, delay=0.0, release=False):
+        now = self.clock()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'UPDATE queue SET state = ?, token = NULL, lease_until = NULL,'
+                ' output_path = COALESCE(?, output_path), error = ?, available_at = ?,'
+                ' attempts = attempts - ?, updated_at = ? WHERE token = ?',
+                (state, output_path, error, now + delay, int(release), now, lease.token))
+            if not cursor.rowcount:
+                self.logger.warning(f"租约已失效,忽略结果: {lease.url}")
+                return False
+            if state in (FINISHED, FAILED):
+                column = 'done' if state == FINISHED else 'failed'
+                self._conn.execute(f'UPDATE workers SET {column} = {column} + 1 WHERE worker = ?', (worker,))
+        return True
+
+    def pending(self):
+        """排队中(含等待重试)和下载中的任务数"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM queue WHERE state IN (?, ?)', (QUEUED, DOWNLOADING)).fetchone()[0]
+
+    def stats(self):
+        """各状态的任务数和工作进程(心跳超过一个租约时长的视为失联)"""
+        now = self.clock()
+        with self._lock:
+            states = dict(self._conn.execute('SELECT state, COUNT(*) FROM queue GROUP BY state').fetchall())
+            workers = [
+                {'worker': worker, 'alive': now - heartbeat_at < self.lease_seconds,
+                 'heartbeat_age': round(now - heartbeat_at, 1), 'done': done, 'failed': failed}
+                for worker, heartbeat_at, done, failed in self._conn.execute(
+                    'SELECT worker, heartbeat_at, done, failed FROM workers ORDER BY started_at')
+            ]
+        return {'states': states, 'workers': workers}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# 领取任务的 Lua 脚本: 过期租约重新排队(次数过多的标记失败),再从队首领取一个
+# KEYS: pending(list) delayed(zset) leases(zset) jobs(hash)
+# ARGV: now worker token lease_seconds max_attempts
+_CLAIM_SCRIPT = """
+local now = tonumber(ARGV[1])
+for _, url in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now)) do
+    redis.call('ZREM', KEYS[3], url)
+    local job = cjson.decode(redis.call('HGET', KEYS[4], url))
+    job.token = false
+    if job.attempts >= tonumber(ARGV[5]) then
+        job.state = 'failed'
+        job.error = '工作进程多次失联'
+    else
+        job.state = 'queued'
+        redis.call('LPUSH', KEYS[1], url)
+    end
+    redis.call('HSET', KEYS[4], url, cjson.encode(job))
+end
+for _, url in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)) do
+    redis.call('ZREM', KEYS[2], url)
+    redis.call('RPUSH', KEYS[1], url)
+end
+local url = redis.call('LPOP', KEYS[1])
+if not url then
+    return false
+end
+local job = cjson.decode(redis.call('HGET', KEYS[4], url))
+job.state = 'downloading'
+job.worker = ARGV[2]
+job.token = ARGV[3]
+job.attempts = job.attempts + 1
+redis.call('HSET', KEYS[4], url, cjson.encode(job))
+redis.call('ZADD', KEYS[3], now + tonumber(ARGV[4]), url)
+return cjson.encode({url, job.attempts, job.options})
+"""
+
+# 加入任务的 Lua 脚本: 任务记录和排队在同一个脚本中完成,中途出错或同时加入时不会只写了一半或重复排队
+# KEYS: pending jobs
+# ARGV: 任务记录(JSON) url...
+_PUT_SCRIPT = """
+local added = 0
+for i = 2, #ARGV do
+    if redis.call('HSETNX', KEYS[2], ARGV[i], ARGV[1]) == 1 then
+        redis.call('RPUSH', KEYS[1], ARGV[i])
+        added = added + 1
+    end
+end
+return added
+"""
+
+# 提交结果的 Lua 脚本: token 不匹配(租约已失效)时返回0
+# KEYS: pending delayed leases jobs
+# ARGV: url token state output_path error available_at release
+_FINISH_SCRIPT = """
+local raw = redis.call('HGET', KEYS[4], ARGV[1])
+if not raw then
+    return 0
+end
+local job = cjson.decode(raw)
+if job.token ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[3], ARGV[1])
+job.state = ARGV[3]
+job.token = false
+if ARGV[4] ~= '' then
+    job.output_path = ARGV[4]
+end
+job.error = ARGV[5]
+if ARGV[7] == '1' then
+    job.attempts = job.attempts - 1
+end
+if job.state == 'queued' then
+    if tonumber(ARGV[6]) > 0 then
+        redis.call('ZADD', KEYS[2], ARGV[6], ARGV[1])
+    else
+        redis.call('LPUSH', KEYS[1], ARGV[1])
+    end
+end
+redis.call('HSET', KEYS[4], ARGV[1], cjson.encode(job))
+return 1
+"""
+
+
+class RedisWorkQueue:
+    """与 SqliteWorkQueue 接口相同的 Redis 队列(需要安装 redis 包)
+
+    适合多台机器共用队列;Valkey、KeyDB 等兼容 Redis 协议且支持 Lua 脚本的
+    服务都可以使用。加入、领取和提交结果都在 Lua 脚本中原子地完成。
+    client 为已有的客户端(decode_responses=True),不指定时按 url 连接
+    """
+
+    # 每次加入任务的脚本最多处理的URL数,大批量加入时不会长时间阻塞服务器
+    PUT_BATCH = 500
+
+    def __init__(self, url='redis://localhost:6379/0', name='ytdl', lease_seconds=LEASE_SECONDS,
+                 max_attempts=MAX_ATTEMPTS, client=None, clock=time.time):
+        if client is None and redis is None:
+            raise RuntimeError('使用 Redis 队列需要先安装 redis: pip install redis')
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.logger = logging.getLogger('youtube_downloader.work_queue')
+        self._client = client or redis.Redis.from_url(url, decode_responses=True)
+        self._keys = [f'{name}:{key}' for key in ('pending', 'delayed', 'leases', 'jobs')]
+        self._workers = f'{name}:workers'
+        self._put = self._client.register_script(_PUT_SCRIPT)
+        self._claim = self._client.register_script(_CLAIM_SCRIPT)
+        self._finish_script = self._client.register_script(_FINISH_SCRIPT)
+
+    def put(self, url, options=None):
+        return self.put_many([url], options) == 1
+
+    def put_many(self, urls, options=None):
+        job = json.dumps({'state': QUEUED, 'attempts': 0, 'options': options or {}, 'token': False})
+        urls = list(urls)
+        added = 0
+        for i in range(0, len(urls), self.PUT_BATCH):
+            added += self._put(keys=[self._keys[0], self._keys[3]], args=[job] + urls[i:i + self.PUT_BATCH])
+        return added
+
+    def claim(self, worker):
+        token = uuid.uuid4().hex
+        raw = self._claim(keys=self._keys,
+                          args=[self.clock(), worker, token, self.lease_seconds, self.max_attempts])
+        if not raw:
+            return None
+        url, attempts, options = json.loads(raw)
+        return Lease(url, token, attempts, options or None)
+
+    def heartbeat(self, worker, leases=()):
+        now = self.clock()
+        lost = []
+        jobs = self._keys[3]
+        for lease in leases:
+            raw = self._client.hget(jobs, lease.url)
+            if not raw or json.loads(raw).get('token') != lease.token:
+                lost.append(lease)
+                continue
+            # 只更新已有的租约: 任务刚好完成时不会把它重新加回去
+            self._client.zadd(self._keys[2], {lease.url: now + self.lease_seconds}, xx=True)
+        record = self._client.hget(self._workers, worker)
+        record = json.loads(record) if record else {'started_at': now, 'done': 0, 'failed': 0}
+        record['heartbeat_at'] = now
+        self._client.hset(self._workers, worker, json.dumps(record))
+        return lost
+
+    def complete(self, lease, worker, output_path=None):
+        return self._finish(lease, worker, FINISHED, output_path=output_path)
+
+    def fail(self, lease, worker, error, retry_delay=None):
+        if retry_delay is not None and lease.attempts < self.max_attempts:
+            return self._finish(lease, worker, QUEUED, error=error, delay=retry_delay)
+        return self._finish(lease, worker, FAILED, error=error)
+
+    def release(self, lease, worker):
+        return self._finish(lease, worker, QUEUED, release=True)
+
+    def _finish(self, lease, worker, state, output_path=None, error=None, delay=0.0, release=False):
+        available_at = self.clock() + delay if delay else 0
+        ok = self._finish_script(keys=self._keys, args=[
+            lease.url, lease.token, state, output_path or '', error or '', available_at, int(release)])
+        if not ok:
+            self.logger.warning(f"租约已失效,忽略结果: {lease.url}")
+            return False
+        if state in (FINISHED, FAILED):
+            record = self._client.hget(self._workers, worker)
+            if record:
+                record = json.loads(record)
+                key = 'done' if state == FINISHED else 'failed'
+                record[key] = record.get(key, 0) + 1
+                self._client.hset(self._workers, worker, json.dumps(record))
+        return True
+
+    def pending(self):
+        pending, delayed, leases = self._keys[:3]
+        return self._client.llen(pending) + self._client.zcard(delayed) + self._client.zcard(leases)
+
+    def stats(self):
+        now = self.clock()
+        states = {}
+        for raw in self._client.hvals(self._keys[3]):
+            state = json.loads(raw)['state']
+            states[state] = states.get(state, 0) + 1
+        workers = []
+        for worker, raw in self._client.hgetall(self._workers).items():
+            record = json.loads(raw)
+            workers.append({'worker': worker, 'alive': now - record['heartbeat_at'] < self.lease_seconds,
+                            'heartbeat_age': round(now - record['heartbeat_at'], 1),
+                            'done': record.get('done', 0), 'failed': record.get('failed', 0)})
+        return {'states': states, 'workers': workers}
+
+    def close(self):
+        self._client.close()
+
+
+def open_work_queue(location=None, **kwargs):
+    """按位置打开队列: redis:// 或 rediss:// 开头的为 Redis,否则为 SQLite 数据库文件"""
+    if location and location.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisWorkQueue(location, **kwargs)
+    return SqliteWorkQueue(location, **kwargs)
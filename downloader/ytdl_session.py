@@ -0,0 +1,109 @@
+import json
+import logging
+import threading
+
+import yt_dlp
+
+# 每个任务不同、在复用的实例上按任务替换的选项
+PER_JOB_KEYS = ('outtmpl', 'progress_hooks', 'postprocessor_hooks', 'logger')
+HOOK_KEYS = ('progress_hooks', 'postprocessor_hooks')
+
+
+class _HookDispatcher:
+    """固定注册在YoutubeDL上的回调,转发给当前任务的回调"""
+
+    def __init__(self):
+        self.hooks = ()
+
+    def __call__(self, d):
+        for hook in self.hooks:
+            hook(d)
+
+
+class YoutubeDLSession:
+    """在一批任务之间复用 YoutubeDL 实例
+
+    每次构造 YoutubeDL 都要重新解析选项、创建HTTP处理器,keep-alive 连接和
+    提取器状态也随之丢弃。这里按除 PER_JOB_KEYS 以外的选项分组缓存空闲实例,
+    取出时只替换输出模板、回调和日志。一个实例同一时间只借给一个任务。
+    """
+
+    def __init__(self, max_idle=4):
+        # 每组选项最多保留的空闲实例数
+        self.max_idle = max_idle
+        self.logger = logging.getLogger('youtube_downloader.ytdl_session')
+        self._lock = threading.Lock()
+        self._idle = {}  # 选项 -> [YoutubeDL]
+        self._leases = {}  # id(YoutubeDL) -> (选项, {回调选项: _HookDispatcher})
+        self.created = 0
+        self.reused = 0
+
+    def checkout(self, params):
+        """取出一个按 params 配置好的 YoutubeDL,用完后调用 release"""
+        shared = {k: v for k, v in params.items() if k not in PER_JOB_KEYS}
+        key = json.dumps(shared, sort_keys=True, default=repr)
+
+        with self._lock:
+            idle = self._idle.get(key)
+            ydl = idle.pop() if idle else None
+            if ydl is not None:
+                self.reused += 1
+
+        if ydl is None:
+            dispatchers = {hook_key: _HookDispatcher() for hook_key in HOOK_KEYS}
+            # 构造时就带上日志,verbose 的调试信息头也经日志输出
+            ydl = yt_dlp.YoutubeDL(dict(shared, logger=params.get('logger'),
+                                        **{k: [d] for k, d in dispatchers.items()}))
+            with self._lock:
+                self._leases[id(ydl)] = (key, dispatchers)
+                self.created += 1
+
+        for hook_key, dispatcher in self._leases[id(ydl)][1].items():
+            dispatcher.hooks = tuple(params.get(hook_key) or ())
+        self._set_outtmpl(ydl, params.get('outtmpl'))
+        ydl.params['logger'] = params.get('logger')
+        return ydl
+
+    def _set_outtmpl(self, ydl, outtmpl):
+        if isinstance(outtmpl, str):
+            outtmpl = {'default': outtmpl}
+        current = ydl.params.get('outtmpl')
+        if isinstance(current, dict):
+            # 保留yt-dlp补全的其他模板(缩略图、字幕等)
+            current.update(outtmpl or {'default': yt_dlp.utils.DEFAULT_OUTTMPL['default']})
+        else:
+            ydl.params['outtmpl'] = outtmpl or {}
+
+    def release(self, ydl):
+        """归还实例;空闲实例过多时直接关闭"""
+        with self._lock:
+            key, dispatchers = self._leases[id(ydl)]
+            for dispatcher in dispatchers.values():
+                dispatcher.hooks = ()
+            ydl.params['logger'] = None
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(ydl)
+                return
+            del self._leases[id(ydl)]
+        self._close(ydl)
+
+    def close(self):
+        """关闭所有空闲实例"""
+        with self._lock:
+            idle = [ydl for instances in self._idle.values() for ydl in instances]
+            self._idle = {}
+            for ydl in idle:
+                del self._leases[id(ydl)]
+        for ydl in idle:
+            self._close(ydl)
+
+    def stats(self):
+        """新建和复用的实例数量"""
+        return {'created': self.created, 'reused': self.reused}
+
+    def _close(self, ydl):
+        try:
+            ydl.close()
+        except Exception as e:
+            self.logger.debug(f"关闭YoutubeDL失败: {e}")
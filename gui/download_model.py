@@ -0,0 +1,134 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+
+
+class DownloadJob:
+    """下载列表中的一条任务记录"""
+    __slots__ = ('url', 'progress', 'speed', 'total_bytes', 'status')
+
+    def __init__(self, url, progress=0.0, status='等待下载'):
+        self.url = url
+        self.progress = progress
+        self.speed = 0.0
+        self.total_bytes = 0.0
+        self.status = status
+
+
+class DownloadTableModel(QAbstractTableModel):
+    """下载任务表格模型
+
+    用 URL→行号 的索引定位任务,每次更新只通知变化的单元格,
+    上万条任务时滚动和刷新也不会卡顿
+    """
+    COLUMNS = ('链接', '进度', '速度', '大小', '状态')
+    COL_URL, COL_PROGRESS, COL_SPEED, COL_SIZE, COL_STATUS = range(5)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._jobs = []
+        self._rows = {}  # url -> 行号
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._jobs)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return QVariant()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        job = self._jobs[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == self.COL_URL:
+                return job.url
+            if column == self.COL_PROGRESS:
+                return f"{job.progress:.1f}%"
+            if column == self.COL_SPEED:
+                return f"{job.speed / 1024 / 1024:.1f}MB/s" if job.speed else ''
+            if column == self.COL_SIZE:
+                return f"{job.total_bytes / 1024 / 1024:.1f}MB" if job.total_bytes else ''
+            if column == self.COL_STATUS:
+                return job.status
+        elif role == Qt.TextAlignmentRole:
+            if column in (self.COL_PROGRESS, self.COL_SPEED, self.COL_SIZE):
+                return Qt.AlignRight | Qt.AlignVCenter
+        elif role == Qt.ToolTipRole and column in (self.COL_URL, self.COL_STATUS):
+            return job.url if column == self.COL_URL else job.status
+        elif role == Qt.UserRole:
+            return job
+        return QVariant()
+
+    def contains(self, url):
+        """URL是否已在列表中"""
+        return url in self._rows
+
+    def urls(self):
+        """按顺序返回所有URL"""
+        return [job.url for job in self._jobs]
+
+    def add_jobs(self, jobs):
+        """批量添加任务,跳过重复的URL,返回实际添加的数量"""
+        new_jobs = []
+        for job in jobs:
+            if job.url and job.url not in self._rows:
+                self._rows[job.url] = len(self._jobs) + len(new_jobs)
+                new_jobs.append(job)
+        if new_jobs:
+            first = len(self._jobs)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_jobs) - 1)
+            self._jobs.extend(new_jobs)
+            self.endInsertRows()
+        return len(new_jobs)
+
+    def add_urls(self, urls):
+        """批量添加URL,返回实际添加的URL"""
+        jobs = [DownloadJob(url) for url in dict.fromkeys(urls) if url and url not in self._rows]
+        self.add_jobs(jobs)
+        return [job.url for job in jobs]
+
+    def reset_jobs(self, status='等待下载'):
+        """开始新一轮下载前重置速度和状态"""
+        for job in self._jobs:
+            job.speed = 0.0
+            job.status = status
+        if self._jobs:
+            self.dataChanged.emit(self.index(0, self.COL_SPEED),
+                                  self.index(len(self._jobs) - 1, self.COL_STATUS))
+
+    def update_progress(self, url, progress):
+        """更新进度"""
+        row = self._rows.get(url)
+        if row is not None:
+            self._jobs[row].progress = progress
+            self._cell_changed(row, self.COL_PROGRESS)
+
+    def update_stats(self, url, speed, total_bytes):
+        """更新速度和文件大小"""
+        row = self._rows.get(url)
+        if row is not None:
+            job = self._jobs[row]
+            job.speed = speed
+            if total_bytes:
+                job.total_bytes = total_bytes
+            self.dataChanged.emit(self.index(row, self.COL_SPEED), self.index(row, self.COL_SIZE))
+
+    def update_status(self, url, status):
+        """更新状态"""
+        row = self._rows.get(url)
+        if row is not None:
+            job = self._jobs[row]
+            job.status = status
+            if '完成' in status:
+                job.speed = 0.0
+                self._cell_changed(row, self.COL_SPEED)
+            self._cell_changed(row, self.COL_STATUS)
+
+    def _cell_changed(self, row, column):
+        index = self.index(row, column)
+        self.dataChanged.emit(index, index)
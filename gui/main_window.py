@@ -1,9 +1,12 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLineEdit, QPushButton, QComboBox, QFileDialog,
-                             QListWidget, QProgressBar, QLabel, QMessageBox,
-                             QListWidgetItem)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from downloader import DownloadWorker
+                             QTableView, QHeaderView, QAbstractItemView,
+                             QProgressBar, QLabel, QMessageBox, QDoubleSpinBox, QCheckBox)
+from PyQt5.QtCore import QTimer
+import downloader
+from downloader import JobJournal
+from downloader.bandwidth import get_bandwidth_scheduler
+from .download_model import DownloadTableModel, DownloadJob
 import os
 
 class MainWindow(QMainWindow):
@@ -15,6 +18,9 @@ class MainWindow(QMainWindow):
         # 下载工作线程
         self.download_worker = None
         
+        # 持久化的任务记录,程序重启后恢复未完成的下载
+        self.journal = JobJournal()
+        
         # 创建中心部件
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -35,9 +41,20 @@ class MainWindow(QMainWindow):
         url_layout.addWidget(add_url_btn)
         main_layout.addLayout(url_layout)
         
-        # URL列表
-        self.url_list = QListWidget()
-        main_layout.addWidget(self.url_list)
+        # 下载任务列表
+        self.job_model = DownloadTableModel(self)
+        self.job_view = QTableView()
+        self.job_view.setModel(self.job_model)
+        self.job_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.job_view.setWordWrap(False)
+        # 固定行高,大列表滚动时不需要逐行计算尺寸
+        self.job_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.job_view.verticalHeader().setDefaultSectionSize(22)
+        header = self.job_view.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setSectionResizeMode(DownloadTableModel.COL_URL, QHeaderView.Stretch)
+        header.resizeSection(DownloadTableModel.COL_STATUS, 200)
+        main_layout.addWidget(self.job_view)
         
         # 下载选项区域
         options_layout = QHBoxLayout()
@@ -58,8 +75,49 @@ class MainWindow(QMainWindow):
         browse_btn.clicked.connect(self.choose_save_path)
         options_layout.addWidget(browse_btn)
         
+        # 总下载限速,下载过程中修改立即生效
+        self.rate_limit_input = QDoubleSpinBox()
+        self.rate_limit_input.setRange(0, 1000)
+        self.rate_limit_input.setDecimals(1)
+        self.rate_limit_input.setSuffix(" MB/s")
+        self.rate_limit_input.setSpecialValueText("不限速")
+        self.rate_limit_input.valueChanged.connect(self.set_rate_limit)
+        options_layout.addWidget(QLabel("限速:"))
+        options_layout.addWidget(self.rate_limit_input)
+        
         main_layout.addLayout(options_layout)
         
+        extra_layout = QHBoxLayout()
+        
+        # 暂存目录(可选): 在本地磁盘下载和处理,完成后才移到保存路径
+        self.staging_input = QLineEdit()
+        self.staging_input.setReadOnly(True)
+        self.staging_input.setPlaceholderText("不使用")
+        extra_layout.addWidget(QLabel("暂存目录:"))
+        extra_layout.addWidget(self.staging_input)
+        
+        staging_btn = QPushButton("浏览")
+        staging_btn.clicked.connect(self.choose_staging_dir)
+        extra_layout.addWidget(staging_btn)
+        
+        clear_staging_btn = QPushButton("清除")
+        clear_staging_btn.clicked.connect(self.staging_input.clear)
+        extra_layout.addWidget(clear_staging_btn)
+        
+        # 音频模式的选项,只在选择"仅音频"时可用
+        self.audio_format_combo = QComboBox()
+        self.audio_format_combo.addItems(["原格式", "m4a", "opus"])
+        self.loudnorm_check = QCheckBox("响度标准化")
+        self.audio_metadata_check = QCheckBox("写入元数据")
+        extra_layout.addWidget(QLabel("音频格式:"))
+        extra_layout.addWidget(self.audio_format_combo)
+        extra_layout.addWidget(self.loudnorm_check)
+        extra_layout.addWidget(self.audio_metadata_check)
+        self.quality_combo.currentTextChanged.connect(self.update_audio_options)
+        self.update_audio_options(self.quality_combo.currentText())
+        
+        main_layout.addLayout(extra_layout)
+        
         # 下载按钮
         self.download_btn = QPushButton("开始下载")
         self.download_btn.clicked.connect(self.start_download)
@@ -77,8 +135,19 @@ class MainWindow(QMainWindow):
         default_path = os.path.join(os.path.expanduser("~"), "Downloads", "YouTubeDownloader")
         self.path_input.setText(default_path)
         
-        # 显示免责声明
-        self.show_disclaimer()
+        # 恢复上次未完成的任务
+        self.restore_jobs()
+        
+        # 窗口第一次显示后再弹出免责声明、在后台导入yt-dlp,不阻塞启动
+        self._shown = False
+    
+    def showEvent(self, event):
+        """窗口第一次显示后再做耗时的初始化"""
+        super().showEvent(event)
+        if not self._shown:
+            self._shown = True
+            QTimer.singleShot(0, self.show_disclaimer)
+            downloader.preload()
     
     def show_disclaimer(self):
         """显示免责声明"""
@@ -88,22 +157,66 @@ class MainWindow(QMainWindow):
                      "3. 使用本工具产生的一切法律责任由用户自行承担")
         QMessageBox.information(self, "免责声明", disclaimer)
     
+    def restore_jobs(self):
+        """从任务记录恢复上次未完成的下载"""
+        resumable = self.journal.reset_interrupted()
+        jobs = self.journal.jobs(include_finished=False)
+        restored = []
+        for job in jobs:
+            progress = 0.0
+            if job['total_bytes']:
+                progress = job['downloaded_bytes'] / job['total_bytes'] * 100
+            restored_job = DownloadJob(job['url'], progress=progress)
+            restored_job.total_bytes = float(job['total_bytes'])
+            restored.append(restored_job)
+        self.job_model.add_jobs(restored)
+        
+        if jobs:
+            self.status_label.setText(f"已恢复 {len(jobs)} 个未完成的任务,其中 {resumable} 个可断点续传")
+    
     def add_url(self):
         """添加URL到列表"""
-        urls = self.url_input.text().strip().split('\n')
-        for url in urls:
-            if url and url not in [self.url_list.item(i).text().split(' - ')[0] for i in range(self.url_list.count())]:
-                item = QListWidgetItem(url)
-                item.setData(Qt.UserRole, {'progress': 0, 'status': '等待下载'})
-                self.url_list.addItem(item)
+        urls = [url.strip() for url in self.url_input.text().strip().split('\n')]
+        for url in self.job_model.add_urls(urls):
+            self.journal.add(url)
         self.url_input.clear()
     
+    def add_playlist_entry(self, playlist_url, url):
+        """播放列表展开得到的视频加入列表"""
+        if self.job_model.add_urls([url]):
+            self.journal.add(url)
+    
     def choose_save_path(self):
         """选择保存路径"""
         path = QFileDialog.getExistingDirectory(self, "选择保存路径", self.path_input.text())
         if path:
             self.path_input.setText(path)
     
+    def choose_staging_dir(self):
+        """选择暂存目录"""
+        path = QFileDialog.getExistingDirectory(self, "选择暂存目录", self.staging_input.text())
+        if path:
+            self.staging_input.setText(path)
+    
+    def update_audio_options(self, quality):
+        """音频选项只在选择"仅音频"时可用"""
+        enabled = quality == "仅音频"
+        for widget in (self.audio_format_combo, self.loudnorm_check, self.audio_metadata_check):
+            widget.setEnabled(enabled)
+    
+    def get_audio_options(self):
+        """音频模式的选项(见 downloader.audio.audio_specs)"""
+        container = self.audio_format_combo.currentText()
+        return {
+            'container': None if container == "原格式" else container,
+            'loudnorm': self.loudnorm_check.isChecked(),
+            'metadata': self.audio_metadata_check.isChecked(),
+        }
+    
+    def set_rate_limit(self, value):
+        """调整所有下载任务合计的最大速度,0 表示不限速"""
+        get_bandwidth_scheduler().set_rate(value * 1024 * 1024)
+    
     def get_quality_format(self):
         """获取选择的清晰度对应的格式"""
         quality_map = {
@@ -112,13 +225,14 @@ class MainWindow(QMainWindow):
             "720p": "bestvideo[height<=720]+bestaudio/best[height<=720]",
             "480p": "bestvideo[height<=480]+bestaudio/best[height<=480]",
             "360p": "bestvideo[height<=360]+bestaudio/best[height<=360]",
-            "仅音频": "bestaudio/best"
+            # 音频模式(downloader.audio.AUDIO): 只下载音频流,不合并、不转换视频容器
+            "仅音频": "audio"
         }
         return quality_map[self.quality_combo.currentText()]
     
     def start_download(self):
         """开始下载"""
-        if not self.url_list.count():
+        if not self.job_model.rowCount():
             QMessageBox.warning(self, "警告", "请先添加下载链接")
             return
         
@@ -135,24 +249,26 @@ class MainWindow(QMainWindow):
             return
         
         # 获取所有URL
-        urls = []
-        for i in range(self.url_list.count()):
-            item = self.url_list.item(i)
-            url = item.text().split(' - ')[0]  # 去掉可能存在的进度信息
-            urls.append(url)
-            item.setText(url)  # 重置显示文本
-        
-        # 创建下载工作线程
+        urls = self.job_model.urls()
+        self.job_model.reset_jobs()
+        
+        # 创建下载工作线程(yt-dlp 在这里才需要,一般已由后台预加载)
+        from downloader import DownloadWorker
         self.download_worker = DownloadWorker(
             urls=urls,
             save_path=self.path_input.text(),
-            quality=self.get_quality_format()
+            quality=self.get_quality_format(),
+            journal=self.journal,
+            staging_dir=self.staging_input.text() or None,
+            audio_options=self.get_audio_options(),
         )
         
         # 连接信号
         self.download_worker.progress_updated.connect(self.update_progress)
         self.download_worker.status_updated.connect(self.update_status)
         self.download_worker.error_occurred.connect(self.handle_error)
+        self.download_worker.stats_updated.connect(self.job_model.update_stats)
+        self.download_worker.entry_added.connect(self.add_playlist_entry)
         self.download_worker.download_finished.connect(self.handle_download_finished)
         
         # 开始下载
@@ -167,42 +283,22 @@ class MainWindow(QMainWindow):
         self.progress_bar.setValue(int(progress))
         
         # 更新列表项进度
-        for i in range(self.url_list.count()):
-            item = self.url_list.item(i)
-            if url in item.text().split(' - ')[0]:
-                data = item.data(Qt.UserRole)
-                data['progress'] = progress
-                item.setData(Qt.UserRole, data)
-                item.setText(f"{url} - {progress:.1f}%")
-                break
+        self.job_model.update_progress(url, progress)
     
     def update_status(self, url, status):
         """更新状态"""
         self.status_label.setText(status)
         
         # 更新列表项状态
-        for i in range(self.url_list.count()):
-            item = self.url_list.item(i)
-            if url in item.text().split(' - ')[0]:
-                data = item.data(Qt.UserRole)
-                data['status'] = status
-                item.setData(Qt.UserRole, data)
-                # 如果是完成状态,更新显示
-                if '完成' in status:
-                    item.setText(f"{url} - 已完成")
-                break
+        self.job_model.update_status(url, status)
     
     def handle_error(self, url, error):
         """处理错误"""
         self.status_label.setText(f"错误: {error}")
         
         # 更新列表项状态
-        for i in range(self.url_list.count()):
-            item = self.url_list.item(i)
-            if url in item.text().split(' - ')[0]:
-                item.setText(f"{url} - 下载失败")
-                break
-                
+        self.job_model.update_status(url, '下载失败')
+        
         QMessageBox.warning(self, "下载错误", f"下载视频时发生错误:\n{error}")
     
     def handle_download_finished(self):
@@ -210,9 +306,12 @@ class MainWindow(QMainWindow):
         self.download_btn.setText("开始下载")
         self.status_label.setText("下载完成")
         
-        # 检查是否所有文件都已下载
+        # 按本轮任务的结果提示,不再遍历保存目录
         save_path = self.path_input.text()
-        if os.path.exists(save_path) and os.listdir(save_path):
+        worker = self.download_worker
+        if worker.total_count and worker.success_count == worker.total_count:
             QMessageBox.information(self, "完成", f"所有视频下载完成!\n保存在: {save_path}")
         else:
-            QMessageBox.warning(self, "警告", f"下载可能未成功。\n请检查保存路径: {save_path}")
\ No newline at end of file
+            QMessageBox.warning(self, "警告",
+                                f"部分视频下载失败 ({worker.success_count}/{worker.total_count})。\n"
+                                f"请检查保存路径: {save_path}")
\ No newline at end of file
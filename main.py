@@ -1,8 +1,10 @@
 import sys
 from PyQt5.QtWidgets import QApplication
 from gui.main_window import MainWindow
+from downloader.log_setup import DEFAULT_LOG_FILE, setup_logging
 
 def main():
+    setup_logging(log_file=DEFAULT_LOG_FILE)
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
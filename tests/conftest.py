@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# 与 benchmarks 相同: 直接从仓库根目录导入 downloader
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    """可以手动拨动的时钟,代替 time.time / time.monotonic"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
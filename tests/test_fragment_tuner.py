@@ -0,0 +1,94 @@
+import pytest
+
+from downloader.fragment_tuner import FragmentTuner, PROBE_INTERVAL, media_host
+
+MB = 1024 * 1024
+HOST = 'googlevideo.com'
+
+
+@pytest.fixture
+def tuner(tmp_path):
+    return FragmentTuner(str(tmp_path / 'tuner.sqlite3'), minimum=1, maximum=16, initial=4)
+
+
+def transfer(tuner, rate_of):
+    """用当前并发数下载一个任务,rate_of(并发数) 为吞吐量(MB/s),返回使用的并发数"""
+    concurrency = tuner.concurrency(HOST)
+    tuner.report(HOST, concurrency, 16 * MB, 16 / rate_of(concurrency))
+    return concurrency
+
+
+def plateau(limit):
+    """并发数超过 limit 后吞吐量不再增加"""
+    return lambda c: min(c, limit)
+
+
+def test_slow_start_doubles_while_throughput_grows(tuner):
+    assert [transfer(tuner, plateau(100)) for _ in range(3)] == [4, 8, 16]
+    assert tuner.concurrency(HOST) == 16
+
+
+def test_settles_on_best_concurrency_when_gain_stops(tuner):
+    assert [transfer(tuner, plateau(6)) for _ in range(3)] == [4, 8, 16]
+    # 16 比 8 没有提升: 回到吞吐量最高的并发数并停在那里
+    assert tuner.concurrency(HOST) == 8
+    used = [transfer(tuner, plateau(6)) for _ in range(PROBE_INTERVAL - 3)]
+    assert set(used) == {8}
+
+
+def test_reprobes_after_interval_then_returns(tuner):
+    for _ in range(PROBE_INTERVAL):
+        transfer(tuner, plateau(6))
+    # 第 PROBE_INTERVAL 个无错误的任务之后加1试探,没有提升又回到 8
+    assert transfer(tuner, plateau(6)) == 9
+    assert tuner.concurrency(HOST) == 8
+
+
+def test_error_halves_and_caps_below_failing_concurrency(tuner):
+    transfer(tuner, plateau(100))
+    assert tuner.concurrency(HOST) == 8
+    tuner.report(HOST, 8, 0, 0, error='http_403')
+    assert tuner.stats()[HOST]['concurrency'] == 4
+    assert tuner.stats()[HOST]['limit'] == 7
+    # 之后不再翻倍,加性增加到上限为止
+    used = [transfer(tuner, plateau(100)) for _ in range(4)]
+    assert used == [4, 5, 6, 7]
+    assert tuner.concurrency(HOST) == 7
+
+
+def test_retries_count_as_errors(tuner):
+    tuner.report(HOST, 4, 16 * MB, 4.0, retries=2)
+    assert tuner.concurrency(HOST) == 2
+    assert tuner.stats()[HOST]['limit'] == 3
+
+
+def test_limit_relaxed_after_clean_interval(tuner):
+    tuner.report(HOST, 4, 0, 0, error='DownloadError')
+    assert tuner.stats()[HOST]['limit'] == 3
+    for _ in range(PROBE_INTERVAL):
+        transfer(tuner, plateau(100))
+    assert tuner.stats()[HOST]['limit'] == 4
+
+
+def test_small_samples_ignored(tuner):
+    tuner.report(HOST, 4, MB, 0.1)
+    tuner.report(HOST, 4, 100 * MB, 0.1)
+    assert tuner.concurrency(HOST) == 4
+    assert tuner.stats()[HOST]['rates'] == {}
+
+
+def test_state_persists_across_instances(tmp_path):
+    path = str(tmp_path / 'tuner.sqlite3')
+    first = FragmentTuner(path)
+    first.report(HOST, 4, 0, 0, error='http_403')
+    assert FragmentTuner(path).concurrency(HOST) == 2
+
+
+def test_media_host_groups_cdn_mirrors():
+    hls = {'protocol': 'm3u8_native', 'url': 'https://rr3---sn-abc.googlevideo.com/v/index.m3u8'}
+    assert media_host(hls) == HOST
+    assert media_host({'requested_formats': [
+        {'protocol': 'https', 'url': 'https://a.example.com/v.mp4'},
+        {'protocol': 'http_dash_segments', 'fragment_base_url': 'http://127.0.0.1:8080/dash/'},
+    ]}) == '127.0.0.1:8080'
+    assert media_host({'protocol': 'https', 'url': 'https://a.example.com/v.mp4'}) is None
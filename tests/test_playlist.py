@@ -0,0 +1,79 @@
+import pytest
+
+from downloader.playlist import is_playlist_url, iter_playlist_entries, flat_extract, is_playlist_info
+
+
+@pytest.mark.parametrize('url', [
+    'https://www.youtube.com/playlist?list=PLBCF2DAC6FFB574DE',
+    'https://www.youtube.com/@YouTube',
+    'https://www.youtube.com/@YouTube/videos',
+    'https://www.youtube.com/channel/UCBR8-60-B28hp2BmDPdntcQ',
+    'https://www.youtube.com/c/YouTube',
+    'https://www.youtube.com/user/YouTube',
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLBCF2DAC6FFB574DE',
+])
+def test_youtube_playlists_and_channels(url):
+    assert is_playlist_url(url) is True
+
+
+@pytest.mark.parametrize('url', [
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://youtu.be/dQw4w9WgXcQ',
+    'https://www.youtube.com/shorts/dQw4w9WgXcQ',
+    'https://vimeo.com/76979871',
+    # 通用提取器(直链)不发请求探测
+    'http://127.0.0.1:8000/video.mp4',
+])
+def test_single_videos(url):
+    assert is_playlist_url(url) is False
+
+
+def test_ambiguous_url_needs_probe():
+    # bilibili 的视频链接可能是分P合集,只能提取后判断
+    assert is_playlist_url('https://www.bilibili.com/video/BV1xx411c7mD') is None
+
+
+class FlatYDL:
+    """按链接返回预先准备好的平铺提取结果"""
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def extract_info(self, url, download=False, process=True):
+        assert process is False
+        self.calls.append(url)
+        return self.results[url]
+
+
+CHANNEL = 'https://www.youtube.com/@YouTube'
+VIDEOS_TAB = 'https://www.youtube.com/@YouTube/videos'
+
+
+def video(video_id):
+    return {'_type': 'url', 'url': f'https://www.youtube.com/watch?v={video_id}'}
+
+
+def test_channel_tabs_are_expanded():
+    ydl = FlatYDL({
+        CHANNEL: {'_type': 'playlist', 'entries': [{'_type': 'url', 'url': VIDEOS_TAB}]},
+        VIDEOS_TAB: {'_type': 'playlist', 'entries': [video('a'), None, video('b')]},
+    })
+    assert list(iter_playlist_entries(ydl, CHANNEL)) == [
+        'https://www.youtube.com/watch?v=a', 'https://www.youtube.com/watch?v=b']
+
+
+def test_flat_extract_follows_redirects():
+    ydl = FlatYDL({
+        'https://example.com/p': {'_type': 'url', 'url': 'https://example.com/list'},
+        'https://example.com/list': {'_type': 'playlist', 'entries': []},
+    })
+    info, depth = flat_extract(ydl, 'https://example.com/p')
+    assert is_playlist_info(info) and depth == 2
+
+
+def test_single_video_probe():
+    ydl = FlatYDL({'https://example.com/v': {'id': 'v', 'webpage_url': 'https://example.com/v'}})
+    info, _ = flat_extract(ydl, 'https://example.com/v')
+    assert not is_playlist_info(info)
+    assert list(iter_playlist_entries(ydl, 'https://example.com/v', info=info)) == ['https://example.com/v']
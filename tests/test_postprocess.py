@@ -0,0 +1,42 @@
+import pytest
+
+from downloader.postprocess import plan_container, downloaded_info
+
+REMUX = {'key': 'FFmpegVideoRemuxer', 'preferedformat': 'mp4'}
+CONVERT = {'key': 'FFmpegVideoConvertor', 'preferedformat': 'mp4'}
+REMUX_OR_CONVERT = dict(REMUX, fallback=CONVERT)
+
+
+@pytest.mark.parametrize('info, expected', [
+    # 已经是 mp4 / 纯音频: 不处理
+    ({'ext': 'mp4', 'vcodec': 'vp9', 'acodec': 'opus'}, []),
+    ({'ext': 'webm', 'vcodec': 'none', 'acodec': 'opus'}, []),
+    # 编码能直接放进 mp4: 只做流复制
+    ({'ext': 'mkv', 'vcodec': 'avc1.64001F', 'acodec': 'mp4a.40.2'}, [REMUX]),
+    ({'ext': 'webm', 'vcodec': 'av01.0.08M.08', 'acodec': 'mp4a.40.2'}, [REMUX]),
+    ({'ext': 'mkv', 'vcodec': 'hev1', 'acodec': 'none'}, [REMUX]),
+    # 编码不兼容: 重新编码
+    ({'ext': 'webm', 'vcodec': 'vp9', 'acodec': 'opus'}, [CONVERT]),
+    ({'ext': 'mkv', 'vcodec': 'avc1', 'acodec': 'opus'}, [CONVERT]),
+    # 编码未知: 先尝试 remux,失败再重新编码
+    ({'ext': 'flv'}, [REMUX_OR_CONVERT]),
+    ({'ext': 'mkv', 'vcodec': 'avc1'}, [REMUX_OR_CONVERT]),
+])
+def test_plan_container_mp4(info, expected):
+    assert plan_container(info, 'mp4') == expected
+
+
+def test_plan_container_other_target_always_tries_remux_first():
+    plan = plan_container({'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a'}, 'mkv')
+    assert plan == [{'key': 'FFmpegVideoRemuxer', 'preferedformat': 'mkv',
+                     'fallback': {'key': 'FFmpegVideoConvertor', 'preferedformat': 'mkv'}}]
+
+
+def test_downloaded_info_merges_partial_entries():
+    result = {'id': 'x', 'title': 'T', 'ext': 'webm', 'vcodec': 'vp9', 'acodec': 'opus',
+              'requested_downloads': [{'filepath': '/tmp/T.webm'}]}
+    (info,) = downloaded_info(result)
+    assert info['filepath'] == '/tmp/T.webm'
+    assert (info['ext'], info['vcodec'], info['title']) == ('webm', 'vp9', 'T')
+    assert 'requested_downloads' not in info
+    assert downloaded_info({'ext': 'mp4'}) == [{'ext': 'mp4'}]
@@ -0,0 +1,165 @@
+import io
+import sys
+
+import pytest
+from yt_dlp.networking import Response
+from yt_dlp.networking.exceptions import HTTPError
+from yt_dlp.utils import DownloadError, ExtractorError, UnsupportedError
+
+from downloader.metrics import error_class
+from downloader.retry_policy import CircuitBreaker, RetryPolicy
+
+FORBIDDEN = DownloadError('ERROR: unable to download video data: HTTP Error 403: Forbidden')
+AGE_GATE = DownloadError('ERROR: [youtube] abc: Sign in to confirm your age')
+NETWORK = DownloadError('ERROR: Connection reset by peer')
+
+
+def wrapped(inner):
+    """与 YoutubeDL.report_error 相同: 原始异常放在 DownloadError 的 exc_info 中"""
+    try:
+        raise inner
+    except Exception:
+        return DownloadError(f'ERROR: {inner}', sys.exc_info())
+
+
+def http_error(status):
+    response = Response(io.BytesIO(), 'https://example.com/v.mp4', {}, status=status)
+    return wrapped(ExtractorError('Unable to download webpage', cause=HTTPError(response)))
+
+
+def test_error_class_only_counts_http_403():
+    assert error_class(FORBIDDEN) == 'http_403'
+    assert error_class(DownloadError('ERROR: [youtube] x403yz: Video unavailable')) == 'unavailable'
+    assert error_class(DownloadError('ERROR: got 4030 bytes, expected 8192')) == 'DownloadError'
+    assert error_class(AGE_GATE) == 'age_gate'
+    assert error_class(None) is None
+
+
+@pytest.mark.parametrize('error, expected', [
+    (http_error(404), 'http_404'),
+    (http_error(410), 'http_410'),
+    (http_error(403), 'http_403'),
+    # 超时和限流是暂时的,按一般下载错误处理
+    (http_error(408), 'DownloadError'),
+    (http_error(429), 'DownloadError'),
+    (http_error(503), 'DownloadError'),
+    (wrapped(UnsupportedError('https://example.com/page')), 'UnsupportedError'),
+    (wrapped(ExtractorError('Private video. Sign in if you have been granted access', expected=True)),
+     'ExtractorError'),
+    (wrapped(ExtractorError('Requested format is not available', expected=True)), 'ExtractorError'),
+    # 非预期的提取错误(如网络问题)仍然重试
+    (wrapped(ExtractorError('Unable to download API page: Connection reset')), 'DownloadError'),
+])
+def test_error_class_chain(error, expected):
+    assert error_class(error) == expected
+
+
+@pytest.mark.parametrize('error', [
+    http_error(404),
+    wrapped(UnsupportedError('https://example.com/page')),
+    wrapped(ExtractorError('Private video', expected=True)),
+    wrapped(ExtractorError('Requested format is not available', expected=True)),
+])
+def test_hopeless_errors_are_not_retried(clock, error):
+    policy = RetryPolicy(clock=clock)
+    assert policy.max_retries(error) == 0
+    assert policy.on_failure(error, 0) is None
+
+
+@pytest.mark.parametrize('status', [408, 429, 500])
+def test_transient_http_errors_are_retried(clock, status):
+    assert RetryPolicy(clock=clock).on_failure(http_error(status), 0) is not None
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=60, clock=clock)
+    assert breaker.record_failure() is False
+    assert breaker.record_failure() is False
+    assert breaker.record_failure() is True
+    assert breaker.remaining() == 60
+    # 打开期间的失败不再重新计时
+    clock.advance(20)
+    assert breaker.record_failure() is False
+    assert breaker.remaining() == 40
+
+
+def test_breaker_half_open_failure_doubles_cooldown(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=60, max_cooldown=200, clock=clock)
+    breaker.record_failure()
+    clock.advance(60)
+    assert breaker.remaining() == 0
+    # 半开状态下再失败: 立即重新打开,时长加倍,但不超过上限
+    assert breaker.record_failure() is True
+    assert breaker.remaining() == 120
+    clock.advance(120)
+    breaker.record_failure()
+    assert breaker.remaining() == 200
+    assert breaker.trips == 3
+
+
+def test_breaker_success_closes_and_resets(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=60, clock=clock)
+    breaker.record_failure()
+    clock.advance(60)
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.remaining() == 0
+    assert breaker.cooldown == 60
+    assert breaker.record_failure() is True
+    assert breaker.remaining() == 60
+
+
+@pytest.mark.parametrize('attempts', [0, 1, 2])
+def test_backoff_doubles_with_jitter(clock, attempts):
+    policy = RetryPolicy(base_delay=4, max_delay=100, clock=clock)
+    full = 4 * 2 ** attempts
+    for _ in range(20):
+        assert full / 2 <= policy.on_failure(NETWORK, attempts) <= full
+
+
+def test_backoff_capped_and_retries_exhausted(clock):
+    policy = RetryPolicy(base_delay=4, max_delay=10, clock=clock)
+    assert policy.on_failure(NETWORK, 2) <= 10
+    assert policy.on_failure(NETWORK, 3) is None
+    # 未列出的错误不重试
+    assert policy.on_failure(RuntimeError('file missing'), 0) is None
+
+
+def test_403_breaker_pauses_new_jobs_until_success(clock):
+    policy = RetryPolicy(base_delay=1, clock=clock)
+    policy.on_failure(FORBIDDEN, 0)
+    policy.on_failure(FORBIDDEN, 0)
+    assert policy.pause_remaining() == 0
+    delay = policy.on_failure(FORBIDDEN, 0)
+    assert policy.pause_remaining() == 60
+    # 重试不早于熔断结束
+    assert delay >= 60
+    clock.advance(30)
+    assert policy.pause_remaining() == 30
+    policy.on_success()
+    assert policy.pause_remaining() == 0
+
+
+def test_403_pause_expires_with_clock(clock):
+    policy = RetryPolicy(clock=clock)
+    for _ in range(3):
+        policy.on_failure(FORBIDDEN, 0)
+    clock.advance(61)
+    assert policy.pause_remaining() == 0
+    assert policy.stats()['http_403']['trips'] == 1
+
+
+def test_skip_breaker_stops_retrying_that_class_only(clock):
+    policy = RetryPolicy(base_delay=1, clock=clock)
+    assert policy.on_failure(AGE_GATE, 0) is not None
+    # 第二次连续失败打开熔断: 这一类错误不再重试,也不暂停其他任务
+    assert policy.on_failure(AGE_GATE, 0) is None
+    assert policy.pause_remaining() == 0
+    assert policy.on_failure(NETWORK, 0) is not None
+    # 其他视频成功不关闭不再重试的熔断器
+    policy.on_success()
+    assert policy.on_failure(AGE_GATE, 0) is None
+    clock.advance(601)
+    # 半开状态下又失败: 重新打开,仍然不重试
+    assert policy.on_failure(AGE_GATE, 0) is None
+    assert policy.stats()['age_gate']['open'] == 1200
@@ -0,0 +1,116 @@
+import os
+import threading
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+import pytest
+
+from downloader import side_artifacts
+from downloader.metrics import MetricsCollector
+from downloader.side_artifacts import ArtifactLane
+from downloader.ytdl_session import YoutubeDLSession
+
+
+def fake_postprocessors(calls):
+    """代替 apply_postprocessors: FFmpegMetadata 像ffmpeg一样写临时文件再替换,
+    EmbedThumbnail 像 mutagen 一样直接修改文件"""
+    def apply(params, info, specs):
+        path = info['filepath']
+        for spec in specs:
+            calls.append((spec['key'], path))
+            if spec['key'] == 'FFmpegMetadata':
+                with open(path, 'rb') as f:
+                    data = f.read()
+                with open(path + '.temp', 'wb') as f:
+                    f.write(data + b'+meta')
+                os.replace(path + '.temp', path)
+            else:
+                with open(path, 'ab') as f:
+                    f.write(b'+thumb')
+        return dict(info), {}
+    return apply
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / 'v.mp4'
+    path.write_bytes(b'video')
+    return path
+
+
+@pytest.fixture
+def lane(monkeypatch):
+    calls = []
+    monkeypatch.setattr(side_artifacts, 'apply_postprocessors', fake_postprocessors(calls))
+    lane = ArtifactLane(session=None, metrics=None)
+    lane.calls = calls
+    return lane
+
+
+def leftovers(path):
+    return [name for name in os.listdir(path.parent) if name.startswith('.artifacts-')]
+
+
+def test_ffmpeg_only_runs_on_final_file(lane, video):
+    info = {'filepath': str(video), 'ext': 'mkv'}
+    lane._rewrite({}, info, [{'key': 'FFmpegMetadata'}, {'key': 'EmbedThumbnail'}])
+    assert [path for _, path in lane.calls] == [str(video)] * 2
+    assert video.read_bytes() == b'video+meta+thumb'
+
+
+def test_mutagen_after_ffmpeg_needs_no_copy(lane, video, monkeypatch):
+    copies = []
+    monkeypatch.setattr(side_artifacts.shutil, 'copyfile', lambda *args: copies.append(args))
+    inode = video.stat().st_ino
+    lane._rewrite({}, {'filepath': str(video), 'ext': 'mp4'},
+                  [{'key': 'FFmpegMetadata'}, {'key': 'EmbedThumbnail'}])
+    assert video.read_bytes() == b'video+meta+thumb'
+    assert video.stat().st_ino != inode
+    assert copies == [] and leftovers(video) == []
+
+
+def test_mutagen_alone_edits_a_copy(lane, video):
+    link = video.parent / 'link.mp4'
+    os.link(video, link)
+    lane._rewrite({}, {'filepath': str(video), 'ext': 'mp4'}, [{'key': 'EmbedThumbnail'}])
+    assert video.read_bytes() == b'video+thumb'
+    # 原来的文件(inode)没有被直接修改
+    assert link.read_bytes() == b'video'
+    assert leftovers(video) == []
+
+
+def test_failed_rewrite_keeps_final_file(lane, video, monkeypatch):
+    def fail(params, info, specs):
+        with open(info['filepath'], 'r+b') as f:
+            f.write(b'XX')
+        raise RuntimeError('embed failed')
+    monkeypatch.setattr(side_artifacts, 'apply_postprocessors', fail)
+    with pytest.raises(RuntimeError):
+        lane._rewrite({}, {'filepath': str(video), 'ext': 'm4a'}, [{'key': 'EmbedThumbnail'}])
+    assert video.read_bytes() == b'video'
+    assert leftovers(video) == []
+
+
+@pytest.fixture
+def thumbnail_server(tmp_path):
+    root = tmp_path / 'www'
+    root.mkdir()
+    (root / 'thumb.jpg').write_bytes(b'\xff\xd8\xff\xe0jpeg')
+    server = HTTPServer(('127.0.0.1', 0), partial(SimpleHTTPRequestHandler, directory=str(root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+
+def test_thumbnail_saved_next_to_video(tmp_path, thumbnail_server):
+    video = tmp_path / '100% v.mp4'
+    video.write_bytes(b'video')
+    info = {'id': 'v', 'title': 'v', 'ext': 'mp4', 'filepath': str(video),
+            'webpage_url': 'https://example.com/v',
+            'thumbnails': [{'url': f'{thumbnail_server}/thumb.jpg', 'id': '0'}]}
+    lane = ArtifactLane(YoutubeDLSession(), MetricsCollector())
+    lane.submit('https://example.com/v', info, ['thumbnail'])
+    assert lane.wait(10)
+    assert lane.stats()['done'] == {'thumbnail': 1}
+    assert (tmp_path / '100% v.jpg').read_bytes().startswith(b'\xff\xd8')
+    assert video.read_bytes() == b'video'
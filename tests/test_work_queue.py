@@ -0,0 +1,139 @@
+import pytest
+
+from downloader.work_queue import SqliteWorkQueue, RedisWorkQueue
+
+LEASE = 30
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def make_queue(request, tmp_path, clock):
+    """按参数创建 SQLite 或 Redis(fakeredis,在进程内执行Lua脚本)队列"""
+    queues = []
+
+    def make(**kwargs):
+        kwargs.setdefault('lease_seconds', LEASE)
+        if request.param == 'sqlite':
+            queue = SqliteWorkQueue(str(tmp_path / f'queue{len(queues)}.sqlite3'), clock=clock, **kwargs)
+        else:
+            fakeredis = pytest.importorskip('fakeredis')
+            pytest.importorskip('lupa')
+            client = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+            queue = RedisWorkQueue(client=client, clock=clock, **kwargs)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.close()
+
+
+def states(queue):
+    return queue.stats()['states']
+
+
+def test_put_many_skips_existing_urls(make_queue):
+    queue = make_queue()
+    assert queue.put_many(['a', 'b']) == 2
+    assert queue.put_many(['b', 'c', 'c']) == 1
+    assert queue.put('a') is False
+    assert states(queue) == {'queued': 3}
+    assert queue.pending() == 3
+
+
+def test_claim_in_order_with_options(make_queue):
+    queue = make_queue()
+    queue.put_many(['a', 'b'], {'quality': 'audio'})
+    first, second = queue.claim('w1'), queue.claim('w2')
+    assert (first.url, second.url) == ('a', 'b')
+    assert first.attempts == 1
+    assert first.options == {'quality': 'audio'}
+    assert first.token != second.token
+    assert queue.claim('w3') is None
+
+
+def test_complete_finishes_job(make_queue):
+    queue = make_queue()
+    queue.put('a')
+    queue.heartbeat('w1')
+    lease = queue.claim('w1')
+    assert queue.complete(lease, 'w1', '/videos/a.mp4') is True
+    assert states(queue) == {'finished': 1}
+    assert queue.pending() == 0
+    assert queue.stats()['workers'][0]['done'] == 1
+
+
+def test_expired_lease_is_reassigned_and_old_token_fenced(make_queue, clock):
+    queue = make_queue()
+    queue.put('a')
+    old = queue.claim('w1')
+    clock.advance(LEASE + 1)
+
+    new = queue.claim('w2')
+    assert new.url == 'a'
+    assert new.attempts == 2
+    # 原来的进程失联期间任务已被重新分配: 续租报告丢失,提交结果被忽略
+    assert queue.heartbeat('w1', [old]) == [old]
+    assert queue.complete(old, 'w1') is False
+    assert queue.fail(old, 'w1', 'boom') is False
+    assert states(queue) == {'downloading': 1}
+    assert queue.complete(new, 'w2') is True
+
+
+def test_heartbeat_extends_lease(make_queue, clock):
+    queue = make_queue()
+    queue.put('a')
+    lease = queue.claim('w1')
+    for _ in range(3):
+        clock.advance(LEASE - 1)
+        assert queue.heartbeat('w1', [lease]) == []
+    assert queue.claim('w2') is None
+    clock.advance(LEASE + 1)
+    assert queue.claim('w2').url == 'a'
+
+
+def test_too_many_claims_marks_failed(make_queue, clock):
+    queue = make_queue(max_attempts=2)
+    queue.put('a')
+    queue.claim('w1')
+    clock.advance(LEASE + 1)
+    assert queue.claim('w2').attempts == 2
+    clock.advance(LEASE + 1)
+    # 第二个租约也过期: 次数用完,标记为失败,不再分配
+    assert queue.claim('w3') is None
+    assert states(queue) == {'failed': 1}
+    assert queue.pending() == 0
+
+
+def test_fail_with_delay_requeues_after_delay(make_queue, clock):
+    queue = make_queue()
+    queue.put('a')
+    lease = queue.claim('w1')
+    assert queue.fail(lease, 'w1', 'HTTP Error 503', retry_delay=10) is True
+    assert queue.claim('w1') is None
+    assert queue.pending() == 1
+    clock.advance(11)
+    retry = queue.claim('w2')
+    assert retry.url == 'a'
+    assert retry.attempts == 2
+
+
+def test_fail_without_delay_or_attempts_left_is_final(make_queue):
+    queue = make_queue(max_attempts=1)
+    queue.put_many(['a', 'b'])
+    a = queue.claim('w1')
+    assert queue.fail(a, 'w1', 'unsupported') is True
+    b = queue.claim('w1')
+    # 还想重试,但领取次数已经用完
+    assert queue.fail(b, 'w1', 'timeout', retry_delay=5) is True
+    assert states(queue) == {'failed': 2}
+
+
+def test_release_requeues_without_counting_attempt(make_queue):
+    queue = make_queue()
+    queue.put('a')
+    lease = queue.claim('w1')
+    assert queue.release(lease, 'w1') is True
+    again = queue.claim('w2')
+    assert again.url == 'a'
+    assert again.attempts == 1
+    assert queue.release(lease, 'w1') is False
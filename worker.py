@@ -0,0 +1,90 @@
+"""多进程/多机下载: 共享任务队列和独立的工作进程,不依赖PyQt5
+
+任务队列默认为SQLite数据库(WAL模式,同一台机器的多个进程共用),
+也可以是 redis:// 地址(多台机器共用,需要安装 redis 包)。
+工作进程领取任务时得到租约并定时续租,进程崩溃后任务自动分配给其他进程。
+结果以 JSON Lines 格式输出到标准输出,日志输出到标准错误。
+
+用法:
+    python worker.py add urls.txt --queue jobs.sqlite3
+    python worker.py run --queue jobs.sqlite3 -o ~/Downloads/YouTubeDownloader -j 2
+    python worker.py run --queue redis://nas:6379/0 -o /mnt/share/videos --exit-when-empty
+    python worker.py status --queue jobs.sqlite3
+"""
+import os
+import sys
+import json
+import signal
+import argparse
+
+from cli import JsonLinesReporter, read_urls
+from downloader.log_setup import setup_logging
+from downloader.work_queue import open_work_queue, LEASE_SECONDS
+
+
+def parse_args(argv=None):
+    default_path = os.path.join(os.path.expanduser("~"), "Downloads", "YouTubeDownloader")
+    parser = argparse.ArgumentParser(description='共享任务队列的下载工作进程')
+    parser.add_argument('--queue', metavar='PATH|URL', default=None,
+                        help='任务队列: SQLite数据库文件或 redis:// 地址,默认为程序数据目录中的数据库')
+    parser.add_argument('--lease', type=float, default=LEASE_SECONDS,
+                        help='租约时长(秒),工作进程失联超过这个时间后任务重新分配')
+    parser.add_argument('--log-file', metavar='PATH', help='同时把日志写入文件')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='把URL加入队列')
+    add.add_argument('source', nargs='?', default='-', help="URL列表文件,'-' 表示标准输入(默认)")
+    add.add_argument('-f', '--format', default=None, help='这批任务使用的格式,默认由工作进程决定')
+
+    run = commands.add_parser('run', help='运行工作进程')
+    run.add_argument('-o', '--output', default=default_path, help='保存路径')
+    run.add_argument('-f', '--format', default='best', help='yt-dlp 格式选择,默认 best;audio 表示音频模式')
+    run.add_argument('-j', '--jobs', type=int, default=1, help='本进程同时下载的任务数')
+    run.add_argument('--name', help='工作进程名,默认为 主机名:进程号')
+    run.add_argument('--staging', metavar='DIR', help='暂存目录,下载和后处理在这里进行,完成后移到保存路径')
+    run.add_argument('--exit-when-empty', action='store_true', help='队列中的任务全部结束后退出')
+
+    commands.add_parser('status', help='查看队列和工作进程')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging(log_file=args.log_file)
+    queue = open_work_queue(args.queue, lease_seconds=args.lease)
+    reporter = JsonLinesReporter()
+    try:
+        if args.command == 'add':
+            urls = read_urls(args.source)
+            added = queue.put_many(urls, {'quality': args.format} if args.format else None)
+            reporter.emit('added', added=added, total=len(urls))
+            return 0
+        if args.command == 'status':
+            print(json.dumps(queue.stats(), ensure_ascii=False, indent=2))
+            return 0
+
+        from downloader.queue_worker import QueueWorker, QueueWorkerCore
+
+        core = QueueWorkerCore(
+            staging_dir=args.staging,
+            on_status=reporter.on_status,
+            on_error=reporter.on_error,
+        )
+
+        def on_result(lease, ok, elapsed):
+            reporter.emit('result', url=lease.url, ok=ok, attempts=lease.attempts, elapsed=round(elapsed, 3))
+
+        worker = QueueWorker(queue, args.output, args.format, jobs=args.jobs, name=args.name, core=core,
+                             exit_when_empty=args.exit_when_empty, on_result=on_result)
+        # Ctrl+C / kill: 正在下载的任务放回队列,由其他进程续传
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: worker.stop())
+        done = worker.run()
+        reporter.emit('summary', worker=worker.name, done=done, failed=worker.failed)
+        return 0 if not worker.failed else 1
+    finally:
+        queue.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())